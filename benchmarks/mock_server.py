@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地模拟站点
+同时模拟杭州市规划局（JSON 列表 API、详情页、设计图）与余杭区规划局
+（search.jsp 列表、详情页、ZIP/RAR/PDF 附件），支持注入延迟与错误率，
+供基准测试离线衡量爬取吞吐量
+"""
+
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+
+HANGZHOU_API_PATH = '/api-gateway/jpaas-publish-server/front/page/build/unit'
+HANGZHOU_ART_PREFIX = '/col/col1228968050/art/'
+YUHANG_SEARCH_PATH = '/module/xxgk/search.jsp'
+YUHANG_ART_PREFIX = '/art/yh/'
+YUHANG_DOWNLOAD_PATH = '/module/download/downfile.jsp'
+
+RAR_SIGNATURE = b'Rar!\x1a\x07\x00'
+
+
+class MockOptions:
+    """模拟站点参数"""
+
+    def __init__(self, projects: int = 50, page_size_cap: int = 50, yuhang_page_size: int = 15,
+                 jpg_kb: int = 200, zip_kb: int = 512, rar_kb: int = 256, pdf_kb: int = 256,
+                 latency_ms: float = 0, error_rate: float = 0.0, seed: int = 0):
+        self.projects = projects
+        self.page_size_cap = page_size_cap        # 杭州 API 实际生效的最大 pageSize
+        self.yuhang_page_size = yuhang_page_size  # 余杭每页条数
+        self.jpg_kb = jpg_kb
+        self.zip_kb = zip_kb
+        self.rar_kb = rar_kb
+        self.pdf_kb = pdf_kb
+        self.latency_ms = latency_ms              # 每个请求的固定延迟
+        self.error_rate = error_rate              # 返回 503 的概率
+        self.seed = seed
+
+
+class MockStats:
+    """服务端统计（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+
+    def record(self, size: int, error: bool = False):
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += size
+            if error:
+                self.errors += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {'requests': self.requests, 'errors': self.errors, 'bytes_sent': self.bytes_sent}
+
+
+class _QuietServer(ThreadingHTTPServer):
+    """客户端提前断开（如详情页读到正文结束即关闭）是正常行为，不打印异常"""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class MockSiteServer:
+    """在后台线程运行的模拟站点服务器"""
+
+    def __init__(self, options: MockOptions = None, host: str = '127.0.0.1', port: int = 0):
+        self.options = options or MockOptions()
+        self.stats = MockStats()
+        self._random = random.Random(self.options.seed)
+        self._payloads = _build_payloads(self.options)
+        self._server = _QuietServer((host, port), self._handler_class())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'MockSiteServer':
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread.is_alive():  # 未启动时 shutdown 会一直等待
+            self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # ---------- 页面生成 ----------
+
+    def hangzhou_list(self, page: int, page_size: int) -> bytes:
+        size = min(page_size, self.options.page_size_cap)
+        start = (page - 1) * size
+        items = range(start, min(start + size, self.options.projects))
+        html = ''.join(
+            f'<li><a href="{HANGZHOU_ART_PREFIX}{i}.html" target="_blank">杭州模拟项目{i}</a>'
+            f'<span>2025-01-01</span></li>'
+            for i in items
+        )
+        return json.dumps({'success': True, 'data': {'html': f'<ul>{html}</ul>'}}).encode('utf-8')
+
+    def hangzhou_detail(self, project_id: str) -> bytes:
+        return _article_page(
+            f'<p>杭州模拟项目{project_id} 批前公示</p>'
+            f'<p><a href="/cms_files/filemanager/{project_id}.jpg">'
+            f'<img src="/cms_files/filemanager/{project_id}.jpg"></a></p>'
+        )
+
+    def yuhang_list(self, page: int) -> bytes:
+        size = self.options.yuhang_page_size
+        start = (page - 1) * size
+        items = range(start, min(start + size, self.options.projects))
+        rows = ''.join(
+            f'<tr><td><a title="余杭模拟项目{i}" target="_blank" '
+            f'href="{self.base_url}{YUHANG_ART_PREFIX}{i}.html">余杭模拟项目{i}</a></td>'
+            f'<td>2025-01-{i % 28 + 1:02d}</td></tr>'
+            for i in items
+        )
+        return f'<table>{rows}</table>'.encode('utf-8')
+
+    def yuhang_detail(self, project_id: str) -> bytes:
+        links = ''.join(
+            f'<p><a href="{YUHANG_DOWNLOAD_PATH}?fileid={project_id}{suffix}&filename={name}.{suffix}">'
+            f'{name}.{suffix}</a></p>'
+            for name, suffix in (('总平面图', 'zip'), ('效果图', 'rar'), ('公示说明', 'pdf'))
+        )
+        return _article_page(f'<p>余杭模拟项目{project_id} 规划公示</p>{links}')
+
+    def payload(self, suffix: str) -> bytes:
+        return self._payloads[suffix]
+
+    def should_fail(self) -> bool:
+        return self.options.error_rate > 0 and self._random.random() < self.options.error_rate
+
+    # ---------- 请求处理 ----------
+
+    def _handler_class(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self._dispatch('GET')
+
+            def do_HEAD(self):
+                self._dispatch('HEAD')
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                if length:
+                    self.rfile.read(length)
+                self._dispatch('POST')
+
+            def _dispatch(self, method: str):
+                if site.options.latency_ms:
+                    time.sleep(site.options.latency_ms / 1000)
+                if site.should_fail():
+                    self._send(b'Service Unavailable', 'text/plain', status=503, error=True)
+                    return
+
+                url = urlsplit(self.path)
+                query = parse_qs(url.query)
+                path = url.path
+
+                if path == HANGZHOU_API_PATH:
+                    param = json.loads(query.get('paramJson', ['{}'])[0])
+                    body = site.hangzhou_list(int(param.get('pageNo', 1)),
+                                              int(param.get('pageSize', 15)))
+                    self._send(body, 'application/json;charset=UTF-8')
+                elif path.startswith(HANGZHOU_ART_PREFIX):
+                    self._send(site.hangzhou_detail(_stem(path)), 'text/html;charset=UTF-8')
+                elif path.startswith('/cms_files/filemanager/'):
+                    self._send_file(site.payload('jpg'), 'image/jpeg', method)
+                elif path == YUHANG_SEARCH_PATH:
+                    self._send(site.yuhang_list(int(query.get('currpage', ['1'])[0])),
+                               'text/html;charset=UTF-8')
+                elif path.startswith(YUHANG_ART_PREFIX):
+                    self._send(site.yuhang_detail(_stem(path)), 'text/html;charset=UTF-8')
+                elif path == YUHANG_DOWNLOAD_PATH:
+                    suffix = query.get('filename', ['x.pdf'])[0].rsplit('.', 1)[-1].lower()
+                    self._send_file(site.payload(suffix), 'application/octet-stream', method)
+                else:
+                    self._send(b'Not Found', 'text/plain', status=404, error=True)
+
+            def _send_file(self, body: bytes, content_type: str, method: str):
+                """静态文件：支持 ETag 条件请求和单段 Range"""
+                etag = f'"{len(body):x}"'
+                if self.headers.get('If-None-Match') == etag:
+                    self._send(b'', content_type, status=304, extra={'ETag': etag})
+                    return
+
+                extra = {'ETag': etag, 'Accept-Ranges': 'bytes'}
+                range_header = self.headers.get('Range', '')
+                if range_header.startswith('bytes=') and self.headers.get('If-Range', etag) == etag:
+                    start_text, _, end_text = range_header[6:].partition('-')
+                    start = int(start_text or 0)
+                    end = min(int(end_text) if end_text else len(body) - 1, len(body) - 1)
+                    if start >= len(body):
+                        extra['Content-Range'] = f'bytes */{len(body)}'
+                        self._send(b'', content_type, status=416, extra=extra)
+                        return
+                    extra['Content-Range'] = f'bytes {start}-{end}/{len(body)}'
+                    self._send(body[start:end + 1], content_type, status=206, extra=extra,
+                               head=method == 'HEAD')
+                    return
+
+                self._send(body, content_type, extra=extra, head=method == 'HEAD')
+
+            def _send(self, body: bytes, content_type: str, status: int = 200,
+                      extra: Optional[Dict[str, str]] = None, error: bool = False,
+                      head: bool = False):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for key, value in (extra or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                if not head and status not in (204, 304):
+                    self.wfile.write(body)
+                    site.stats.record(len(body), error)
+                else:
+                    site.stats.record(0, error)
+
+        return Handler
+
+
+def _stem(path: str) -> str:
+    return os.path.splitext(path.rsplit('/', 1)[-1])[0]
+
+
+def _article_page(content: str) -> bytes:
+    """带正文起止标记的详情页，正文后附一段无关内容模拟真实页面体积"""
+    filler = '<div class="footer">' + '相关链接 ' * 2000 + '</div>'
+    return (
+        '<html><head><meta charset="utf-8"><title>模拟公示</title></head><body>'
+        '<div class="nav">' + '导航 ' * 500 + '</div>'
+        f'<meta name="ContentStart">{content}<meta name="ContentEnd">'
+        f'{filler}</body></html>'
+    ).encode('utf-8')
+
+
+def _build_payloads(options: MockOptions) -> Dict[str, bytes]:
+    """生成各类附件的合成内容（同一次运行内内容固定，便于观察去重效果）"""
+    rng = random.Random(options.seed)
+
+    def noise(kb: int) -> bytes:
+        return bytes(rng.getrandbits(8) for _ in range(256)) * (kb * 4)
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('总平面图.dwg', noise(max(1, options.zip_kb // 2)))
+        zf.writestr('说明/设计说明.txt', '模拟设计说明\n' * (options.zip_kb * 32))
+
+    return {
+        'jpg': b'\xff\xd8\xff\xe0' + noise(options.jpg_kb),
+        'zip': archive.getvalue(),
+        'rar': RAR_SIGNATURE + noise(options.rar_kb),
+        'pdf': b'%PDF-1.4\n' + noise(options.pdf_kb),
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='启动本地模拟站点')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--projects', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = MockSiteServer(
+        MockOptions(projects=args.projects, latency_ms=args.latency_ms, error_rate=args.error_rate),
+        port=args.port
+    )
+    print(f'模拟站点运行于 {server.base_url}（Ctrl+C 退出）')
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
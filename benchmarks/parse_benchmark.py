@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+页面解析微基准
+对一组页面语料测量 extraction.py 各提取函数、各可用后端的单页耗时，
+并与原先的实现对比；同时校验各后端的结果与原实现一致
+
+语料来自页面快照（--snapshots，默认 ./snapshots），没有快照时用模拟站点生成
+
+用法:
+    python benchmarks/parse_benchmark.py --repeat 200
+    python benchmarks/parse_benchmark.py --synthetic --list-rows 500
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import extraction  # noqa: E402
+import snapshot  # noqa: E402
+from mock_server import MockOptions, MockSiteServer  # noqa: E402
+
+
+# ---------- 原实现（对照组，输出与 extraction.py 相同） ----------
+
+def legacy_hangzhou_image_path(html: str) -> Optional[str]:
+    for pattern in (r'href="(/cms_files/filemanager/[^"]+\.jpg)"',
+                    r'src="(/cms_files/filemanager/[^"]+\.jpg)"'):
+        matches = re.findall(pattern, html)
+        if matches:
+            return matches[0]
+    return None
+
+
+def legacy_hangzhou_project_links(html: str):
+    pattern = r'<a[^>]*href="(/col/col1228968050/art/[^"]+)"[^>]*>([^<]+)</a>'
+    return [(url, name.strip()) for url, name in re.findall(pattern, html)]
+
+
+def legacy_yuhang_project_rows(html: str):
+    pattern = r'<a title=\"([\d\D]*?)\" target=\"([\d\D]*?)\" href=\"([\d\D]*?)\">'
+    matches = list(re.finditer(pattern, html, re.MULTILINE))
+    rows = []
+    for i, match in enumerate(matches):
+        row_end = matches[i + 1].start() if i + 1 < len(matches) else len(html)
+        date_match = re.search(r'(\d{4})-(\d{1,2})-(\d{1,2})', html[match.end():row_end])
+        posted = None
+        if date_match:
+            year, month, day = date_match.groups()
+            posted = f"{year}-{int(month):02d}-{int(day):02d}"
+        rows.append((match.group(1).strip(), match.group(3).strip(), posted))
+    return rows
+
+
+def legacy_yuhang_file_links(html: str):
+    pattern = r'<a href=\"(\/module\/download[^\"]*?\.(zip|rar|pdf))\"'
+    return [(m.group(1), m.group(2).lower())
+            for m in re.finditer(pattern, html, re.MULTILINE | re.IGNORECASE)]
+
+
+# 每类页面对应的 (提取函数, 对照实现)
+EXTRACTORS: Dict[str, List] = {
+    'hangzhou_list': [('hangzhou_project_links', extraction.hangzhou_project_links,
+                       legacy_hangzhou_project_links)],
+    'hangzhou_detail': [('hangzhou_image_path', extraction.hangzhou_image_path,
+                         legacy_hangzhou_image_path)],
+    'yuhang_list': [('yuhang_project_rows', extraction.yuhang_project_rows,
+                     legacy_yuhang_project_rows)],
+    'yuhang_detail': [('yuhang_file_links', extraction.yuhang_file_links,
+                       legacy_yuhang_file_links)],
+}
+
+
+def load_corpus(snapshot_dir: str, synthetic: bool, list_rows: int) -> Dict[str, List[str]]:
+    """按页面类别加载语料：详情页优先取快照，列表页由模拟站点生成"""
+    corpus: Dict[str, List[str]] = {kind: [] for kind in EXTRACTORS}
+    if not synthetic:
+        for site in ('hangzhou', 'yuhang'):
+            for record in snapshot.latest_records(site, snapshot_dir):
+                _, body = snapshot.read_record(snapshot_dir, record['segment'],
+                                               record['offset'], record['length'])
+                corpus[f'{site}_detail'].append(body.decode('utf-8', errors='replace'))
+
+    server = MockSiteServer(MockOptions(projects=list_rows, page_size_cap=list_rows,
+                                        yuhang_page_size=list_rows))
+    try:
+        import json
+        corpus['hangzhou_list'].append(json.loads(server.hangzhou_list(1, list_rows))['data']['html'])
+        corpus['yuhang_list'].append(server.yuhang_list(1).decode('utf-8'))
+        for i in range(20):
+            if len(corpus['hangzhou_detail']) < 20:
+                corpus['hangzhou_detail'].append(server.hangzhou_detail(str(i)).decode('utf-8'))
+            if len(corpus['yuhang_detail']) < 20:
+                corpus['yuhang_detail'].append(server.yuhang_detail(str(i)).decode('utf-8'))
+    finally:
+        server.stop()
+    return corpus
+
+
+def time_per_page(func: Callable, pages: List[str], repeat: int) -> float:
+    """单页平均耗时（微秒）"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            func(page)
+    return (time.perf_counter() - started) / (repeat * len(pages)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='测量页面链接提取的单页耗时')
+    parser.add_argument('--snapshots', default=snapshot.DEFAULT_DIR, help='页面快照目录')
+    parser.add_argument('--synthetic', action='store_true', help='只使用模拟站点生成的页面')
+    parser.add_argument('--list-rows', type=int, default=100, help='生成的列表页条数')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.snapshots, args.synthetic, args.list_rows)
+    backends = extraction.available_backends()
+
+    print(f"{'提取函数':<24}{'页数':>6}{'平均KB':>8}{'原实现(µs)':>12}"
+          + ''.join(f'{name + "(µs)":>16}' for name in backends))
+    print('-' * (50 + 16 * len(backends)))
+
+    mismatches = []
+    for kind, extractors in EXTRACTORS.items():
+        pages = corpus[kind]
+        if not pages:
+            continue
+        avg_kb = sum(len(p) for p in pages) / len(pages) / 1024
+        for name, func, legacy in extractors:
+            expected = [legacy(page) for page in pages]
+            row = [time_per_page(legacy, pages, args.repeat)]
+            for backend in backends:
+                extraction.use_backend(backend)
+                if [func(page) for page in pages] != expected:
+                    mismatches.append(f'{name} / {backend}')
+                row.append(time_per_page(func, pages, args.repeat))
+            print(f'{name:<24}{len(pages):>6}{avg_kb:>8.1f}{row[0]:>12.1f}'
+                  + ''.join(f'{value:>16.1f}' for value in row[1:]))
+    extraction.use_backend('re')
+
+    if mismatches:
+        print('\n⚠ 以下后端的结果与原实现不一致：' + '，'.join(mismatches))
+
+
+if __name__ == '__main__':
+    main()
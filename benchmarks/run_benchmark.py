@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬取吞吐量基准测试
+在本地模拟站点上运行 hangzhou Application.run 与 yuhang auto_mode，
+报告 projects/sec、bytes/sec、请求延迟 p50/p99 与峰值 RSS
+
+用法:
+    python benchmarks/run_benchmark.py --site all --projects 100 --latency-ms 30
+"""
+
+import argparse
+import builtins
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_server import HANGZHOU_API_PATH, MockOptions, MockSiteServer, YUHANG_SEARCH_PATH  # noqa: E402
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """最近秩法百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存（MB）"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _record_latencies() -> List[float]:
+    """包装 requests.Session.send，记录每个请求到响应头返回的耗时"""
+    import requests
+
+    latencies: List[float] = []
+    original_send = requests.Session.send
+
+    def timed_send(session, request, **kwargs):
+        started = time.perf_counter()
+        try:
+            return original_send(session, request, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    requests.Session.send = timed_send
+    return latencies
+
+
+def _run_hangzhou(base_url: str, options: MockOptions, unthrottled: bool):
+    import hangzhou
+
+    hangzhou.Config.BASE_URL = base_url
+    hangzhou.Config.API_URL = base_url + HANGZHOU_API_PATH
+    if unthrottled:
+        hangzhou.Config.RATE_LIMIT_PER_SECOND = 0
+    builtins.input = lambda *args: 'y'  # 跳过免责声明确认
+    hangzhou.Application().run()
+
+
+def _run_yuhang(base_url: str, options: MockOptions, unthrottled: bool):
+    import yuhang
+
+    yuhang.CONFIG['base_url'] = base_url
+    yuhang.CONFIG['search_url'] = base_url + YUHANG_SEARCH_PATH
+    if unthrottled:
+        yuhang.CONFIG['rate_limit'] = 0
+    pages = -(-options.projects // options.yuhang_page_size)
+    yuhang.auto_mode(start_page=1, end_page=pages)
+
+
+RUNNERS = {
+    'hangzhou': _run_hangzhou,
+    'yuhang': _run_yuhang,
+}
+
+
+def _worker(site: str, base_url: str, options: MockOptions, unthrottled: bool,
+            workdir: str, queue: multiprocessing.Queue):
+    """在独立子进程中运行爬虫，保证峰值 RSS 只反映本次运行"""
+    os.chdir(workdir)
+    latencies = _record_latencies()
+    with open(os.devnull, 'w', encoding='utf-8') as devnull:
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout = sys.stderr = devnull
+        started = time.perf_counter()
+        error = None
+        try:
+            RUNNERS[site](base_url, options, unthrottled)
+        except Exception as e:  # 基准测试只报告，不中断其他站点
+            error = repr(e)
+        finally:
+            elapsed = time.perf_counter() - started
+            sys.stdout, sys.stderr = stdout, stderr
+
+    queue.put({
+        'elapsed': elapsed,
+        'requests': len(latencies),
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'peak_rss_mb': peak_rss_mb(),
+        'error': error,
+    })
+
+
+def run_site(site: str, options: MockOptions, unthrottled: bool = False) -> Dict:
+    """启动模拟站点并在子进程中跑一次完整爬取"""
+    with MockSiteServer(options) as server, tempfile.TemporaryDirectory(prefix=f'bench_{site}_') as workdir:
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(
+            target=_worker, args=(site, server.base_url, options, unthrottled, workdir, queue)
+        )
+        process.start()
+        result = queue.get()
+        process.join()
+
+        stats = server.stats.snapshot()
+        elapsed = result['elapsed'] or 1e-9
+        result.update({
+            'site': site,
+            'projects': options.projects,
+            'projects_per_sec': options.projects / elapsed,
+            'bytes_sent': stats['bytes_sent'],
+            'bytes_per_sec': stats['bytes_sent'] / elapsed,
+            'server_requests': stats['requests'],
+            'server_errors': stats['errors'],
+        })
+        return result
+
+
+def print_report(results: List[Dict]):
+    print()
+    print(f"{'站点':<10}{'耗时(s)':>10}{'项目/s':>10}{'MB/s':>10}{'请求数':>8}"
+          f"{'p50(ms)':>10}{'p99(ms)':>10}{'峰值RSS(MB)':>14}")
+    print('-' * 82)
+    for r in results:
+        print(f"{r['site']:<10}{r['elapsed']:>10.2f}{r['projects_per_sec']:>10.2f}"
+              f"{r['bytes_per_sec'] / 1024 / 1024:>10.2f}{r['requests']:>8}"
+              f"{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['peak_rss_mb']:>14.1f}")
+        if r['error']:
+            print(f"  ✗ 运行出错: {r['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='在本地模拟站点上测量爬取吞吐量')
+    parser.add_argument('--site', choices=['hangzhou', 'yuhang', 'all'], default='all')
+    parser.add_argument('--projects', type=int, default=50, help='模拟项目数')
+    parser.add_argument('--latency-ms', type=float, default=20, help='每个请求注入的延迟')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回 503 的概率')
+    parser.add_argument('--jpg-kb', type=int, default=200)
+    parser.add_argument('--zip-kb', type=int, default=512)
+    parser.add_argument('--rar-kb', type=int, default=256)
+    parser.add_argument('--pdf-kb', type=int, default=256)
+    parser.add_argument('--unthrottled', action='store_true',
+                        help='关闭两个爬虫的自适应限流，只衡量引擎本身的吞吐量')
+    parser.add_argument('--json', metavar='PATH', help='同时把结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    options = MockOptions(
+        projects=args.projects, latency_ms=args.latency_ms, error_rate=args.error_rate,
+        jpg_kb=args.jpg_kb, zip_kb=args.zip_kb, rar_kb=args.rar_kb, pdf_kb=args.pdf_kb
+    )
+    sites = list(RUNNERS) if args.site == 'all' else [args.site]
+    results = [run_site(site, options, args.unthrottled) for site in sites]
+
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
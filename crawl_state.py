@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬取状态存储
+以 SQLite 持久化项目与文件的下载状态，供增量爬取跳过已完成的工作
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+DEFAULT_DB_PATH = './crawl_state.db'
+
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+STATUS_NO_FILES = 'no_files'
+
+# 同一附件可能被多个项目引用，文件记录按 (项目, URL) 区分
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    url         TEXT PRIMARY KEY,
+    site        TEXT NOT NULL,
+    name        TEXT,
+    status      TEXT NOT NULL,
+    detail      TEXT,
+    updated_at  TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS files (
+    url            TEXT NOT NULL,
+    project_url    TEXT NOT NULL,
+    path           TEXT,
+    size           INTEGER,
+    etag           TEXT,
+    last_modified  TEXT,
+    sha256         TEXT,
+    status         TEXT NOT NULL,
+    updated_at     TEXT NOT NULL,
+    PRIMARY KEY (project_url, url)
+);
+
+CREATE INDEX IF NOT EXISTS idx_files_url ON files (url);
+
+CREATE TABLE IF NOT EXISTS kv (
+    key         TEXT PRIMARY KEY,
+    value       TEXT NOT NULL,
+    updated_at  TEXT NOT NULL
+);
+"""
+
+
+class CrawlState:
+    """爬取状态索引 - 单一职责：记录项目/文件的下载状态（线程安全）"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(_SCHEMA)
+
+    # ---------- 项目 ----------
+
+    def get_project(self, url: str) -> Optional[Dict]:
+        """查询项目记录"""
+        return self._fetch_one('SELECT * FROM projects WHERE url = ?', (url,))
+
+    def mark_project(self, url: str, site: str, status: str,
+                     name: str = None, detail: str = None):
+        """写入项目状态（detail 保存站点相关的附加信息，如设计图 URL）"""
+        self._execute(
+            """
+            INSERT INTO projects (url, site, name, status, detail, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                site = excluded.site,
+                name = COALESCE(excluded.name, projects.name),
+                status = excluded.status,
+                detail = COALESCE(excluded.detail, projects.detail),
+                updated_at = excluded.updated_at
+            """,
+            (url, site, name, status, detail, _now())
+        )
+
+    def projects_with_status(self, site: str, status: str) -> List[Dict]:
+        """某个站点处于指定状态的所有项目"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT * FROM projects WHERE site = ? AND status = ? ORDER BY updated_at', (site, status)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def is_project_complete(self, url: str) -> bool:
+        """项目已完成且其所有文件仍在磁盘上"""
+        project = self.get_project(url)
+        if not project or project['status'] != STATUS_DONE:
+            return False
+
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT * FROM files WHERE project_url = ?', (url,)
+            ).fetchall()
+        return all(self._file_on_disk(dict(row)) for row in rows)
+
+    # ---------- 文件 ----------
+
+    def get_file(self, url: str, project_url: str = None) -> Optional[Dict]:
+        """
+        查询文件记录
+
+        不指定项目时返回该 URL 在任意项目中的记录（优先已完成、最近更新的），用于跨项目复用内容
+        """
+        if project_url is not None:
+            return self._fetch_one('SELECT * FROM files WHERE project_url = ? AND url = ?',
+                                   (project_url, url))
+        return self._fetch_one(
+            'SELECT * FROM files WHERE url = ? ORDER BY status = ? DESC, updated_at DESC LIMIT 1',
+            (url, STATUS_DONE)
+        )
+
+    def mark_file(self, url: str, project_url: str, status: str, path: str = None,
+                  size: int = None, etag: str = None, last_modified: str = None,
+                  sha256: str = None):
+        """写入文件状态"""
+        self._execute(
+            """
+            INSERT INTO files
+                (url, project_url, path, size, etag, last_modified, sha256, status, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(project_url, url) DO UPDATE SET
+                path = COALESCE(excluded.path, files.path),
+                size = COALESCE(excluded.size, files.size),
+                etag = COALESCE(excluded.etag, files.etag),
+                last_modified = COALESCE(excluded.last_modified, files.last_modified),
+                sha256 = COALESCE(excluded.sha256, files.sha256),
+                status = excluded.status,
+                updated_at = excluded.updated_at
+            """,
+            (url, project_url, path, size, etag, last_modified, sha256, status, _now())
+        )
+
+    def conditional_headers(self, url: str, project_url: str, path: str) -> Dict[str, str]:
+        """
+        为项目中已完成的文件生成条件请求头（If-None-Match / If-Modified-Since）
+
+        本地文件缺失或大小不符时返回空字典，即需要完整下载。
+        """
+        record = self.get_file(url, project_url)
+        if not record or record['status'] != STATUS_DONE or record['path'] != path:
+            return {}
+        if not self._file_on_disk(record):
+            return {}
+
+        headers = {}
+        if record['etag']:
+            headers['If-None-Match'] = record['etag']
+        if record['last_modified']:
+            headers['If-Modified-Since'] = record['last_modified']
+        return headers
+
+    # ---------- 键值（高水位、缓存的探测结果等） ----------
+
+    def get_value(self, key: str) -> Optional[str]:
+        """读取键值"""
+        row = self._fetch_one('SELECT value FROM kv WHERE key = ?', (key,))
+        return row['value'] if row else None
+
+    def set_value(self, key: str, value: str):
+        """写入键值"""
+        self._execute(
+            """
+            INSERT INTO kv (key, value, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+            """,
+            (key, value, _now())
+        )
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    # ---------- 内部方法 ----------
+
+    @staticmethod
+    def _file_on_disk(record: Dict) -> bool:
+        """记录的文件仍存在且大小一致"""
+        path = record.get('path')
+        if record.get('status') != STATUS_DONE or not path or not os.path.exists(path):
+            return False
+        return record.get('size') is None or os.path.getsize(path) == record['size']
+
+    def _fetch_one(self, sql: str, params: tuple) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(sql, params).fetchone()
+        return dict(row) if row else None
+
+    def _execute(self, sql: str, params: tuple):
+        with self._lock, self._conn:
+            self._conn.execute(sql, params)
+
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec='seconds')
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+统一爬取引擎
+在同一进程中同时爬取杭州与余杭两个站点：各站点以适配器接入，共用一个按主机分配预算的
+自适应限流器，总耗时约为较慢的那个站点，而不是两者之和
+"""
+
+import abc
+import argparse
+import math
+import multiprocessing
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import hangzhou
+import profiling
+import watch
+import yuhang
+from throttle import Throttle
+
+
+# 未登记的主机（如文件所在的其他域名）使用的预算
+DEFAULT_BUDGET = dict(rate=2.0, max_rate=10.0, concurrency=1, max_concurrency=4)
+
+
+class SiteAdapter(abc.ABC):
+    """站点适配器 - 把一个爬虫的爬取流程接入引擎"""
+
+    name = ''
+
+    @abc.abstractmethod
+    def budgets(self) -> Dict[str, Dict]:
+        """站点用到的主机及其限流预算（主机 -> Throttle 参数）"""
+
+    @abc.abstractmethod
+    def open(self, throttle: Throttle):
+        """使用共用限流器创建会话、状态库等资源（守护模式在各轮之间复用）"""
+
+    @abc.abstractmethod
+    def crawl(self, stop_at_known: bool = False):
+        """爬取一轮；stop_at_known 时遇到全部为已知项目的一页即停止翻页"""
+
+    @abc.abstractmethod
+    def stop(self):
+        """请求正在进行的爬取尽快结束：不再开始新项目（从其他线程调用，不等待）"""
+
+    @abc.abstractmethod
+    def close(self):
+        """释放 open 创建的资源（须在 crawl 返回后调用）"""
+
+
+class HangzhouAdapter(SiteAdapter):
+    """杭州：ProjectScraper 翻页与详情页解析 + 设计图下载（hangzhou.Application）"""
+
+    name = 'hangzhou'
+
+    def __init__(self):
+        self.app: Optional[hangzhou.Application] = None
+
+    def budgets(self) -> Dict[str, Dict]:
+        config = hangzhou.Config
+        use_async = config.HTTP_ENGINE == 'async' and hangzhou.HTTPX_AVAILABLE and not config.OFFLINE
+        options = hangzhou.throttle_options(config.MAX_CONNECTIONS_PER_HOST if use_async else config.MAX_WORKERS)
+        return {urlsplit(url).netloc: options for url in (config.BASE_URL, config.API_URL)}
+
+    def open(self, throttle: Throttle):
+        self.app = hangzhou.Application(throttle)
+
+    def crawl(self, stop_at_known: bool = False):
+        self.app.crawl(stop_at_known)
+
+    def stop(self):
+        if self.app is not None:
+            self.app.stop()
+
+    def close(self):
+        if self.app is not None:
+            self.app.close()
+            self.app = None
+
+
+class YuhangAdapter(SiteAdapter):
+    """余杭：列表页逐页解析 + 项目文件下载与解压（yuhang.crawl_pages）"""
+
+    name = 'yuhang'
+
+    def __init__(self, end_page: Optional[int] = 5):
+        """
+        Args:
+            end_page: 单次运行爬到第几页（None 表示一直翻到站点没有更多页面）
+        """
+        self.end_page = end_page
+        self.context: Optional[yuhang.CrawlContext] = None
+
+    def budgets(self) -> Dict[str, Dict]:
+        options = yuhang.throttle_options()
+        return {urlsplit(url).netloc: options
+                for url in (yuhang.CONFIG['base_url'], yuhang.CONFIG['search_url'])}
+
+    def open(self, throttle: Throttle):
+        yuhang.use_throttle(throttle)
+        self.context = yuhang.CrawlContext()
+
+    def crawl(self, stop_at_known: bool = False):
+        yuhang.crawl_pages(start_page=1, end_page=None if stop_at_known else self.end_page,
+                           stop_at_known=stop_at_known, context=self.context)
+
+    def stop(self):
+        if self.context is not None:
+            self.context.stop()
+
+    def close(self):
+        if self.context is not None:
+            self.context.close()
+            self.context = None
+
+
+ADAPTERS = {'hangzhou': HangzhouAdapter, 'yuhang': YuhangAdapter}
+
+
+class Engine:
+    """多站点爬取引擎 - 每个站点在独立线程中爬取，所有请求经过同一个限流器"""
+
+    def __init__(self, adapters: List[SiteAdapter], budgets: Dict[str, int] = None,
+                 profile: Optional[str] = None):
+        """
+        Args:
+            adapters: 参与爬取的站点
+            budgets: 覆盖主机的在途请求数上限（主机 -> 并发数）
+            profile: 剖析引擎（'auto'、'cprofile'、'pyinstrument' 或 'memory'，为空不剖析）
+        """
+        self.adapters = adapters
+        self.profile = profile
+        self.throttle = Throttle(**DEFAULT_BUDGET)
+        for host, options in self._host_budgets(adapters, budgets or {}).items():
+            self.throttle.configure(host, **options)
+
+        opened = []
+        try:
+            for adapter in adapters:
+                adapter.open(self.throttle)
+                opened.append(adapter)
+        except BaseException:
+            for adapter in opened:
+                adapter.close()
+            raise
+
+    def run(self, stop_at_known: bool = False) -> Dict[str, float]:
+        """
+        所有站点同时爬取一轮，单个站点出错不影响其他站点
+
+        Returns:
+            各站点耗时（秒）
+        """
+        started = time.monotonic()
+        with profiling.profiled('engine', self.profile is not None, profiling.DEFAULT_DIR,
+                                self.profile or 'auto'):
+            with ThreadPoolExecutor(max_workers=len(self.adapters), thread_name_prefix='site') as pool:
+                futures = [(adapter.name, pool.submit(self._crawl_site, adapter, stop_at_known))
+                           for adapter in self.adapters]
+                try:
+                    durations = {name: future.result() for name, future in futures}
+                except KeyboardInterrupt:
+                    # 离开 with 时等待站点线程结束，close() 不会在爬取进行中释放资源
+                    print("\n⚠ 正在停止：不再开始新项目，等待已开始的项目完成（再次 Ctrl+C 强制退出）")
+                    self.stop()
+                    raise
+
+        details = '，'.join(f"{name} {seconds:.1f} 秒" for name, seconds in durations.items())
+        print(f"\n引擎本轮完成：总耗时 {time.monotonic() - started:.1f} 秒（{details}）")
+        return durations
+
+    def watch(self, interval: float = watch.DEFAULT_INTERVAL):
+        """守护模式：每隔 interval 秒所有站点同时检查一次新项目，直到收到 SIGTERM 或 Ctrl+C"""
+        names = '、'.join(adapter.name for adapter in self.adapters)
+        print(f"守护模式：每 {interval:g} 秒检查一次 {names} 的新项目"
+              f"（SIGTERM 在本轮结束后退出，Ctrl+C 立即退出）")
+        watch.run_forever(lambda: self.run(stop_at_known=True), interval)
+
+    def stop(self):
+        """请求所有站点停止爬取（不等待）"""
+        for adapter in self.adapters:
+            adapter.stop()
+
+    def close(self):
+        for adapter in self.adapters:
+            adapter.close()
+
+    @staticmethod
+    def _crawl_site(adapter: SiteAdapter, stop_at_known: bool) -> float:
+        started = time.monotonic()
+        try:
+            adapter.crawl(stop_at_known)
+        except Exception as e:
+            print(f"\n✗ {adapter.name} 爬取出错: {e}")
+            traceback.print_exc()
+        return time.monotonic() - started
+
+    @staticmethod
+    def _host_budgets(adapters: List[SiteAdapter], overrides: Dict[str, int]) -> Dict[str, Dict]:
+        """汇总各站点的主机预算：多个站点访问同一主机时取更保守的参数，再应用命令行覆盖"""
+        hosts: Dict[str, Dict] = {}
+        for adapter in adapters:
+            for host, options in adapter.budgets().items():
+                current = hosts.setdefault(host, {})
+                for key, value in options.items():
+                    current[key] = _stricter(key, current[key], value) if key in current else value
+
+        for host, limit in overrides.items():
+            options = hosts.setdefault(host, dict(DEFAULT_BUDGET))
+            options['max_concurrency'] = limit
+            options['concurrency'] = min(options.get('concurrency', 1), limit)
+        return hosts
+
+
+def _stricter(key: str, a: float, b: float) -> float:
+    """两个预算参数中更保守的一个（rate <= 0 表示不限流，视为无穷大）"""
+    if key in ('rate', 'max_rate'):
+        return min(a, b, key=lambda value: value if value > 0 else math.inf)
+    return min(a, b)
+
+
+def _parse_budget(value: str):
+    """解析 --budget 的 HOST=N"""
+    host, sep, limit = value.rpartition('=')
+    if not sep or not host or not limit.isdigit() or int(limit) < 1:
+        raise argparse.ArgumentTypeError(f'应为 HOST=N（N 为正整数）: {value}')
+    return urlsplit(host).netloc or host, int(limit)
+
+
+def main():
+    """程序入口"""
+    parser = argparse.ArgumentParser(description='杭州、余杭两个站点同时爬取')
+    parser.add_argument('--sites', nargs='+', choices=list(ADAPTERS), default=list(ADAPTERS),
+                        help='参与爬取的站点（默认全部）')
+    parser.add_argument('--pages', type=int, default=5, metavar='N',
+                        help='余杭区单次运行爬取的页数（默认 5，0 表示翻到末页）')
+    parser.add_argument('--budget', type=_parse_budget, action='append', default=[], metavar='HOST=N',
+                        help='覆盖某个主机的在途请求数上限（可重复）')
+    parser.add_argument('--profile', nargs='?', const='auto', choices=profiling.ENGINES,
+                        help='按阶段剖析本次运行（两个站点写入同一份报告；memory 为单独一轮内存剖析），'
+                             '报告写入 ./profiles')
+    parser.add_argument('--log-json', action='store_true',
+                        help='余杭日志文件改为 JSON Lines 格式')
+    parser.add_argument('--watch', nargs='?', type=float, const=watch.DEFAULT_INTERVAL, metavar='SECONDS',
+                        help=f'守护模式：不需要交互，每隔 SECONDS 秒（默认 {watch.DEFAULT_INTERVAL}）检查新项目')
+    parser.add_argument('--yes', action='store_true',
+                        help='已阅读并同意免责声明（--watch 无人值守运行时必需）')
+    args = parser.parse_args()
+    if args.pages < 0:
+        parser.error('--pages 不能为负数')
+
+    if 'hangzhou' in args.sites and not args.yes:
+        if args.watch is not None:
+            parser.error('--watch 需要同时指定 --yes，表示已阅读并同意免责声明')
+        hangzhou.Application.show_disclaimer()
+
+    yuhang.setup_logging(json_lines=args.log_json or None)
+    # 链接提取后端是进程级设置，两个站点统一使用杭州 Config 中的选择
+    yuhang.CONFIG['parser_backend'] = hangzhou.Config.PARSER_BACKEND
+    if args.watch is not None:
+        hangzhou.Config.INCREMENTAL = True  # 依赖状态库判断哪些项目已完成
+
+    adapters = [YuhangAdapter(args.pages or None) if name == 'yuhang' else ADAPTERS[name]()
+                for name in dict.fromkeys(args.sites)]
+    engine = Engine(adapters, dict(args.budget), args.profile)
+    try:
+        if args.watch is not None:
+            engine.watch(args.watch)
+        else:
+            engine.run()
+    except KeyboardInterrupt:
+        print("\n⚠ 程序被用户中断")
+    finally:
+        engine.close()
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+页面链接提取
+两个爬虫共用的提取规则：正则在模块加载时编译一次，只需要第一个结果时找到即返回；
+安装 selectolax 或 lxml 时可切换到 DOM 解析（不依赖属性顺序，并解码 HTML 实体）；
+详情页可边下载边扫描，所需链接与正文结束标记都已出现时即可停止读取
+"""
+
+import re
+from typing import AsyncIterable, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    # selectolax 1.0 起只保留 lexbor 后端，旧版本回退到 modest
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser
+        SELECTOLAX_AVAILABLE = True
+    except ImportError:
+        SELECTOLAX_AVAILABLE = False
+
+try:
+    import lxml.html
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+
+HANGZHOU_ART_PREFIX = '/col/col1228968050/art/'
+HANGZHOU_IMAGE_PREFIX = '/cms_files/filemanager/'
+YUHANG_DOWNLOAD_PREFIX = '/module/download'
+
+# 杭州：列表中的项目链接（链接文本即项目名称）
+HANGZHOU_PROJECT_LINK = re.compile(
+    r'<a[^>]*href="(' + re.escape(HANGZHOU_ART_PREFIX) + r'[^"]+)"[^>]*>([^<]+)</a>'
+)
+# 杭州：详情页中的设计图（优先 href，其次 src）；以字面量开头，找到第一个即停止
+HANGZHOU_IMAGE_HREF = re.compile(r'href="(' + re.escape(HANGZHOU_IMAGE_PREFIX) + r'[^"]+\.jpg)"')
+HANGZHOU_IMAGE_SRC = re.compile(r'src="(' + re.escape(HANGZHOU_IMAGE_PREFIX) + r'[^"]+\.jpg)"')
+# 余杭：列表行的项目链接，属性值不跨引号，避免 [\d\D]*? 的大量回溯
+YUHANG_PROJECT_LINK = re.compile(r'<a title="([^"]*)" target="([^"]*)" href="([^"]*)">')
+YUHANG_DATE = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})')
+# 余杭：详情页中的附件下载链接
+YUHANG_FILE_LINK = re.compile(
+    r'<a href="(' + re.escape(YUHANG_DOWNLOAD_PREFIX) + r'[^"]*?\.(zip|rar|pdf))"', re.IGNORECASE
+)
+_FILE_SUFFIX = re.compile(r'\.(zip|rar|pdf)$', re.IGNORECASE)
+
+# 详情页正文结束标记（大汉 JCMS 文章页），之后只有页脚等无关内容
+CONTENT_END = re.compile(rb'<meta\s+name="?ContentEnd"?|<!--\s*ContentEnd\s*-->', re.IGNORECASE)
+
+# 流式读取详情页的停止条件（字节模式，任一匹配即停止）：
+# 杭州第一个 href 设计图即为结果，否则须读到正文结束以确认没有 href 再取 src
+HANGZHOU_DETAIL_STOP = (re.compile(HANGZHOU_IMAGE_HREF.pattern.encode('ascii')), CONTENT_END)
+# 余杭需要正文中全部附件链接
+YUHANG_DETAIL_STOP = (CONTENT_END,)
+# 需要写入页面缓存或快照时只在正文结束处停止：保存的前缀含完整正文，只省去页脚，
+# --reparse 与离线回放换用新的解析规则也能看到正文中的全部链接
+PERSIST_DETAIL_STOP = (CONTENT_END,)
+
+SCAN_OVERLAP = 2048  # 相邻两次扫描的重叠字节数，须不小于单个匹配的长度
+
+BACKENDS = ('re', 'selectolax', 'lxml')
+_backend = 're'
+
+
+def available_backends() -> List[str]:
+    """当前环境可用的解析后端"""
+    return ['re'] + [name for name, ok in (('selectolax', SELECTOLAX_AVAILABLE),
+                                           ('lxml', LXML_AVAILABLE)) if ok]
+
+
+def use_backend(name: str) -> str:
+    """
+    选择链接提取后端：'re'、'selectolax'、'lxml' 或 'auto'（优先 selectolax）
+
+    所选后端不可用时退回正则，返回实际使用的后端
+    """
+    global _backend
+    if name == 'auto':
+        name = (available_backends()[1:] or ['re'])[0]
+    _backend = name if name in available_backends() else 're'
+    return _backend
+
+
+def first_match(pattern: 're.Pattern', text: str, group: int = 1) -> Optional[str]:
+    """返回第一个匹配的分组，找到即停止扫描"""
+    match = pattern.search(text)
+    return match.group(group) if match else None
+
+
+def read_until(chunks: Iterable[bytes], stop: Sequence['re.Pattern'],
+               tail_bytes: int = 0, length: Optional[int] = None) -> Tuple[bytes, bool]:
+    """
+    逐块读取响应体，任一停止条件匹配后停止
+
+    每块到达后只扫描新数据（向前重叠 SCAN_OVERLAP 字节，跨块边界的匹配不会漏掉）。
+    已知响应体长度且剩余不超过 tail_bytes 时读完剩余部分，HTTP/1.1 连接可以复用。
+
+    Args:
+        chunks: 响应体分块（如 response.iter_content(...)）
+        stop: 字节模式的停止条件，为空时读完整个响应体
+        tail_bytes: 满足条件后仍读完剩余部分的长度上限
+        length: 响应体总长度（见 body_length，未知时为空）
+
+    Returns:
+        (已读取的内容, 是否未读完就停止)；未读完时调用方应关闭响应
+    """
+    buffer = bytearray()
+    chunks = iter(chunks)
+    for chunk in chunks:
+        scanned = len(buffer)
+        buffer += chunk
+        if _stop_found(buffer, scanned, stop):
+            break
+    else:
+        return bytes(buffer), False
+
+    if _skip_tail(len(buffer), length, tail_bytes):
+        return bytes(buffer), length is None or len(buffer) < length
+    for chunk in chunks:
+        buffer += chunk
+    return bytes(buffer), False
+
+
+async def aread_until(chunks: AsyncIterable[bytes], stop: Sequence['re.Pattern'],
+                      tail_bytes: int = 0, length: Optional[int] = None) -> Tuple[bytes, bool]:
+    """read_until 的协程版本（chunks 为异步迭代器，如 httpx 的 aiter_bytes）"""
+    buffer = bytearray()
+    chunks = chunks.__aiter__()
+    async for chunk in chunks:
+        scanned = len(buffer)
+        buffer += chunk
+        if _stop_found(buffer, scanned, stop):
+            break
+    else:
+        return bytes(buffer), False
+
+    if _skip_tail(len(buffer), length, tail_bytes):
+        return bytes(buffer), length is None or len(buffer) < length
+    async for chunk in chunks:
+        buffer += chunk
+    return bytes(buffer), False
+
+
+def body_length(headers) -> Optional[int]:
+    """响应体的字节数（有 Content-Length 且未压缩传输时），用于判断剩余部分是否值得读完"""
+    if headers.get('Content-Encoding', 'identity').lower() != 'identity':
+        return None
+    try:
+        return int(headers['Content-Length'])
+    except (KeyError, ValueError):
+        return None
+
+
+def decode_page(body: bytes, content_type: str = None) -> str:
+    """按 Content-Type 中的 charset（默认 UTF-8）解码页面，截断处不完整的字符被替换"""
+    charset = 'utf-8'
+    for param in (content_type or '').split(';')[1:]:
+        key, _, value = param.partition('=')
+        if key.strip().lower() == 'charset' and value.strip():
+            charset = value.strip().strip('"\'')
+    try:
+        return body.decode(charset, errors='replace')
+    except LookupError:
+        return body.decode('utf-8', errors='replace')
+
+
+# ---------- 杭州 ----------
+
+def hangzhou_project_links(html: str) -> List[Tuple[str, str]]:
+    """列表 HTML 中的 [(项目路径, 项目名称)]"""
+    if _backend == 'selectolax':
+        return [(node.attributes['href'], node.text(deep=True).strip())
+                for node in HTMLParser(html).css(f'a[href^="{HANGZHOU_ART_PREFIX}"]')
+                if node.text(deep=True).strip()]
+    if _backend == 'lxml':
+        return [(node.get('href'), node.text_content().strip())
+                for node in _lxml_root(html).xpath(f'//a[starts-with(@href, "{HANGZHOU_ART_PREFIX}")]')
+                if node.text_content().strip()]
+    return [(url, name.strip()) for url, name in HANGZHOU_PROJECT_LINK.findall(html)]
+
+
+def hangzhou_image_path(html: str) -> Optional[str]:
+    """详情页中的设计图路径：第一个 href 链接，没有时取第一个 src"""
+    if _backend == 'selectolax':
+        tree = HTMLParser(html)
+        for attr in ('href', 'src'):
+            node = tree.css_first(f'[{attr}^="{HANGZHOU_IMAGE_PREFIX}"][{attr}$=".jpg"]')
+            if node is not None:
+                return node.attributes[attr]
+        return None
+    if _backend == 'lxml':
+        root = _lxml_root(html)
+        for attr in ('href', 'src'):
+            values = root.xpath(
+                f'(//*[starts-with(@{attr}, "{HANGZHOU_IMAGE_PREFIX}") and '
+                f'substring(@{attr}, string-length(@{attr}) - 3) = ".jpg"])[1]/@{attr}'
+            )
+            if values:
+                return values[0]
+        return None
+    return first_match(HANGZHOU_IMAGE_HREF, html) or first_match(HANGZHOU_IMAGE_SRC, html)
+
+
+# ---------- 余杭 ----------
+
+def yuhang_project_rows(html: str) -> List[Tuple[str, str, Optional[str]]]:
+    """列表 HTML 中的 [(项目名称, 项目 URL, 发布日期 YYYY-MM-DD 或 None)]"""
+    matches = list(YUHANG_PROJECT_LINK.finditer(html))
+    rows = []
+    for i, match in enumerate(matches):
+        # 日期位于当前链接之后、下一个链接之前的同一行中
+        row_end = matches[i + 1].start() if i + 1 < len(matches) else len(html)
+        date_match = YUHANG_DATE.search(html, match.end(), row_end)
+        posted = None
+        if date_match:
+            year, month, day = date_match.groups()
+            posted = f"{year}-{int(month):02d}-{int(day):02d}"
+        rows.append((match.group(1).strip(), match.group(3).strip(), posted))
+    return rows
+
+
+def yuhang_file_links(html: str) -> List[Tuple[str, str]]:
+    """详情页中的 [(附件路径, 小写后缀)]"""
+    if _backend == 'selectolax':
+        hrefs = [node.attributes['href']
+                 for node in HTMLParser(html).css(f'a[href^="{YUHANG_DOWNLOAD_PREFIX}"]')]
+    elif _backend == 'lxml':
+        hrefs = _lxml_root(html).xpath(f'//a[starts-with(@href, "{YUHANG_DOWNLOAD_PREFIX}")]/@href')
+    else:
+        return [(path, suffix.lower()) for path, suffix in YUHANG_FILE_LINK.findall(html)]
+
+    links = []
+    for href in hrefs:
+        suffix = _FILE_SUFFIX.search(href)
+        if suffix:
+            links.append((href, suffix.group(1).lower()))
+    return links
+
+
+# ---------- 内部函数 ----------
+
+def _lxml_root(html: str):
+    return lxml.html.fromstring(html) if html.strip() else lxml.html.fromstring('<html></html>')
+
+
+def _stop_found(buffer: bytearray, scanned: int, stop: Sequence['re.Pattern']) -> bool:
+    """只扫描新到达的数据（向前重叠 SCAN_OVERLAP 字节，跨块边界的匹配不会漏掉）"""
+    start = max(0, scanned - SCAN_OVERLAP)
+    return any(pattern.search(buffer, start) for pattern in stop)
+
+
+def _skip_tail(size: int, length: Optional[int], tail_bytes: int) -> bool:
+    """满足停止条件后，剩余部分长度未知或超过 tail_bytes 时不再读取"""
+    return length is None or length - size > tail_bytes
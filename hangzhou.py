@@ -6,13 +6,44 @@
 
 import os
 import re
+import argparse
 import time
 import csv
+import json
+import asyncio
+import hashlib
+import tempfile
+import threading
+import multiprocessing
 import webbrowser
-from typing import List, Dict, Optional, Tuple
-from urllib.parse import urljoin
+from datetime import datetime, timedelta
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, List, Dict, Optional, Tuple, Iterable, Iterator
+from urllib.parse import urljoin, urlsplit
 import requests
 import urllib3
+from tqdm import tqdm
+
+import extraction
+import metrics
+import profiling
+import watch
+from crawl_state import CrawlState, STATUS_DONE, STATUS_FAILED, STATUS_NO_FILES
+from http_cache import CachingAdapter, HttpCache
+from snapshot import SnapshotWriter, reparse as reparse_snapshots
+from throttle import Throttle, ThrottledAdapter, parse_retry_after
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+try:
+    import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 # 禁用 SSL 警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -35,141 +66,625 @@ class Config:
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
     }
     OUTPUT_DIR = './jpg'
+    STATE_DB = './crawl_state.db'  # 增量爬取状态库（与余杭爬虫共用）
+    INCREMENTAL = True             # 跳过已下载且文件仍在的项目
     REQUEST_TIMEOUT = 15
     DOWNLOAD_TIMEOUT = 30
-    RATE_LIMIT_DELAY = 0.5
+    PAGE_SIZE = 15                 # 探测失败或列表过短时使用的每页条数
+    PAGE_SIZE_MAX = 200            # pageSize 探测上限（请求失败或返回空页时逐次减半）
+    PAGE_SIZE_CACHE_DAYS = 7       # 探测结果在状态库中的缓存天数
+    PAGE_PREFETCH_WINDOW = 4       # 列表页并发预取的窗口大小（1 表示逐页获取）
+    MAX_WORKERS = 4                # 详情页 + 图片下载的并发数
+    HTTP_ENGINE = 'requests'       # 'requests'（阻塞）或 'async'（httpx + asyncio，需安装 httpx）
+    MAX_CONNECTIONS_PER_HOST = 8   # 异步引擎每个主机的最大并发连接数
+    RATE_LIMIT_PER_SECOND = 2.0    # 每个主机的初始请求速率（<= 0 表示不限流）
+    RATE_LIMIT_MAX_PER_SECOND = 10.0  # 自适应限流的速率上限
+    RATE_LIMIT_BURST = 2           # 令牌桶容量：允许的瞬时突发请求数
+    DOWNLOAD_CHUNK_SIZE = 64 * 1024  # 流式下载的分块大小，即单个下载的内存上限
+    DOWNLOAD_PROGRESS = False        # 是否显示逐字节的下载进度条
+    DETAIL_EARLY_STOP = True         # 详情页边下载边扫描，读到设计图链接或正文结束即断开（保存页面时只在正文结束处断开）
+    DETAIL_CHUNK_SIZE = 8 * 1024     # 详情页的扫描分块大小
+    DETAIL_TAIL_BYTES = 16 * 1024    # 停止后剩余内容不超过该字节数时读完，以复用连接
     MAX_FILENAME_LENGTH = 100
+    HTTP_CACHE = True                 # 缓存列表页与详情页（压缩后存入 HTTP_CACHE_DB，与余杭爬虫共用）
+    HTTP_CACHE_DB = './http_cache.db'
+    HTTP_CACHE_TTL = 7 * 24 * 3600    # 详情页缓存的新鲜期（秒），过期后用 ETag/Last-Modified 校验
+    HTTP_CACHE_LIST_TTL = 0           # 列表接口的新鲜期（0 表示每次都请求，只为离线回放保存）
+    HTTP_CACHE_MAX_MB = 200           # 缓存容量上限，超出后淘汰最近最少使用的页面
+    OFFLINE = False                   # 离线回放：只从缓存读取页面，不访问网络
+    SNAPSHOTS = True                  # 详情页原文追加到 SNAPSHOT_DIR 的压缩归档，供 --reparse 使用
+    SNAPSHOT_DIR = './snapshots'      # 与余杭爬虫共用
+    REPARSE_WORKERS = os.cpu_count() or 1  # --reparse 的解析进程数
+    METRICS_EXPORT = True             # 每次运行结束写出 METRICS_DIR/hangzhou.prom 与 hangzhou_summary.json
+    METRICS_DIR = './metrics'         # 与余杭爬虫共用
+    PROFILE = None                    # 'auto'、'cprofile' 或 'pyinstrument' 时按阶段剖析，'memory' 时内存剖析（--profile）
+    PROFILE_DIR = './profiles'        # 剖析报告目录（每次运行一个子目录）
+    WATCH_INTERVAL = watch.DEFAULT_INTERVAL  # 守护模式（--watch）两轮检查的间隔（秒）
+    PARSER_BACKEND = 're'             # 链接提取：'re'、'selectolax'、'lxml' 或 'auto'（见 extraction.py）
+
+
+# 各阶段耗时、字节数与在途数量（与余杭爬虫共用注册表，按站点区分）
+METRICS = metrics.for_site('hangzhou')
+
+
+def throttle_options(max_concurrency: int) -> Dict:
+    """Config 中的限流参数：初始并发为上限的一半，响应健康时逐步放开"""
+    return dict(
+        rate=Config.RATE_LIMIT_PER_SECOND,
+        max_rate=Config.RATE_LIMIT_MAX_PER_SECOND,
+        burst=Config.RATE_LIMIT_BURST,
+        concurrency=max(1, max_concurrency // 2),
+        max_concurrency=max_concurrency,
+    )
+
+
+def create_throttle(max_concurrency: int) -> Throttle:
+    """按 Config 创建自适应限流器"""
+    return Throttle(**throttle_options(max_concurrency))
 
 
 class HttpClient:
     """HTTP 客户端 - 单一职责：统一管理所有网络请求"""
 
-    def __init__(self):
+    def __init__(self, throttle: Optional[Throttle] = None):
         os.environ['NO_PROXY'] = '*'
-        self._session = self._create_session()
+        self.throttle = throttle or create_throttle(Config.MAX_WORKERS)
+        self._session = self._create_session(self.throttle)
 
     @staticmethod
-    def _create_session() -> requests.Session:
-        """创建禁用代理的会话"""
+    def _create_session(throttle: Throttle) -> requests.Session:
+        """创建禁用代理的会话（连接池大小与并发数匹配，所有请求经过自适应限流与页面缓存）"""
         session = requests.Session()
         session.trust_env = False
+        adapter = ThrottledAdapter(throttle, pool_maxsize=Config.MAX_WORKERS * 2)
+        if Config.HTTP_CACHE or Config.OFFLINE:
+            adapter = CachingAdapter(
+                HttpCache(Config.HTTP_CACHE_DB, Config.HTTP_CACHE_MAX_MB * 1024 * 1024),
+                adapter,
+                ttl=lambda url: Config.HTTP_CACHE_LIST_TTL if url.startswith(Config.API_URL)
+                else Config.HTTP_CACHE_TTL,
+                offline=Config.OFFLINE,
+            )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
         return session
 
     def get(self, url: str, **kwargs) -> Optional[requests.Response]:
-        """统一的 GET 请求方法 - DRY 原则"""
+        """统一的 GET 请求方法 - DRY 原则（同一主机的请求共享自适应限流）"""
+        with METRICS.stage('request') as span:
+            try:
+                kwargs.setdefault('headers', Config.HEADERS)
+                kwargs.setdefault('timeout', Config.REQUEST_TIMEOUT)
+                response = self._session.get(url, **kwargs)
+                response.raise_for_status()
+                return response
+            except requests.RequestException as e:
+                print(f"  ✗ 请求失败: {e}")
+                span.fail()
+                return None
+
+    @property
+    def caching(self) -> bool:
+        """是否启用了页面缓存"""
+        return isinstance(self._session.get_adapter(Config.BASE_URL), CachingAdapter)
+
+    def store(self, response: requests.Response, body: bytes):
+        """把流式读取到的页面内容写入页面缓存（未启用缓存时忽略）"""
+        adapter = self._session.get_adapter(response.url)
+        if isinstance(adapter, CachingAdapter):
+            adapter.store(response, body)
+
+    def close(self):
+        """释放连接池（及页面缓存）"""
+        self._session.close()
+
+
+class AsyncResponse:
+    """异步响应适配器 - 向同步调用方提供与 requests.Response 一致的读取接口"""
+
+    def __init__(self, response: 'httpx.Response', loop: asyncio.AbstractEventLoop,
+                 on_close=None):
+        self._response = response
+        self._loop = loop
+        self._on_close = on_close
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+
+    @property
+    def content(self) -> bytes:
+        return self._response.content
+
+    @property
+    def text(self) -> str:
+        return self._response.text
+
+    def json(self):
+        return self._response.json()
+
+    def iter_content(self, chunk_size: int = Config.DOWNLOAD_CHUNK_SIZE) -> Iterator[bytes]:
+        """逐块读取流式响应体；网络错误转换为 requests 异常，保持调用方的错误处理不变"""
+        chunks = self._response.aiter_bytes(chunk_size)
+        while True:
+            future = asyncio.run_coroutine_threadsafe(self._next_chunk(chunks), self._loop)
+            try:
+                chunk = future.result()
+            except httpx.HTTPError as e:
+                raise requests.ConnectionError(str(e)) from e
+            if chunk is None:
+                return
+            yield chunk
+
+    @staticmethod
+    async def _next_chunk(chunks) -> Optional[bytes]:
         try:
-            kwargs.setdefault('headers', Config.HEADERS)
-            kwargs.setdefault('timeout', Config.REQUEST_TIMEOUT)
-            response = self._session.get(url, **kwargs)
-            response.raise_for_status()
+            return await chunks.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    async def aiter_content(self, chunk_size: int = Config.DOWNLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """iter_content 的协程版本（在事件循环线程上使用，网络错误以 httpx 异常抛出）"""
+        async for chunk in self._response.aiter_bytes(chunk_size):
+            yield chunk
+
+    def close(self):
+        """关闭响应并归还连接"""
+        if self._on_close:
+            asyncio.run_coroutine_threadsafe(self.aclose(), self._loop).result()
+
+    async def aclose(self):
+        """close 的协程版本"""
+        if self._on_close:
+            on_close, self._on_close = self._on_close, None
+            await on_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AsyncHttpClient:
+    """
+    异步 HTTP 客户端 - 与 HttpClient 相同的 get 契约（返回响应或 None）
+
+    所有请求在一个后台事件循环线程上复用 httpx 连接池（keep-alive，
+    可用时启用 HTTP/2），并按主机限制并发连接数。同步调用方通过 get
+    提交请求，协程调用方可以直接 await aget，或用 submit 把整个协程交给事件循环。
+    """
+
+    def __init__(self, throttle: Optional[Throttle] = None):
+        if not HTTPX_AVAILABLE:
+            raise RuntimeError("异步引擎需要 httpx，请运行 'pip install httpx[http2]' 安装")
+
+        os.environ['NO_PROXY'] = '*'
+        self.throttle = throttle or create_throttle(Config.MAX_CONNECTIONS_PER_HOST)
+        self._clients: Dict[bool, 'httpx.AsyncClient'] = {}
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def get(self, url: str, **kwargs) -> Optional[AsyncResponse]:
+        """同步 GET：在事件循环线程上执行并等待结果"""
+        with METRICS.stage('request') as span:
+            response = self.submit(self._send(url, **kwargs)).result()
+            if response is None:
+                span.fail()
+            return response
+
+    def submit(self, coro) -> Future:
+        """把协程交给事件循环线程执行，返回 concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def aget(self, url: str, **kwargs) -> Optional[AsyncResponse]:
+        """异步 GET 请求方法 - 参数与 requests 保持一致（在事件循环线程上 await）"""
+        # 协程交错执行，阶段计时不经过按线程切换的剖析器
+        METRICS.enter('request')
+        started = time.perf_counter()
+        response = None
+        try:
+            response = await self._send(url, **kwargs)
             return response
-        except requests.RequestException as e:
+        finally:
+            METRICS.exit('request', time.perf_counter() - started, error=response is None)
+
+    async def _send(self, url: str, params: Dict = None, headers: Dict = None,
+                    timeout: float = Config.REQUEST_TIMEOUT, verify: bool = True,
+                    stream: bool = False) -> Optional[AsyncResponse]:
+        host = self.throttle.host(url) if self.throttle.limited(url) else None
+        started = None
+        limit = self._host_limit(url)
+        acquired = False
+        response = None
+        result = None
+        try:
+            # 先拿连接名额再拿限流名额，等待连接的时间不计入限流器看到的响应延迟
+            await limit.acquire()
+            acquired = True
+            started = await host.aacquire() if host else None
+            client = self._client(verify)
+            request = client.build_request(
+                'GET', url, params=params, headers=headers or Config.HEADERS,
+                timeout=httpx.Timeout(timeout)
+            )
+            response = await client.send(request, stream=stream)
+            if host:
+                host.release(started, response.status_code,
+                             parse_retry_after(response.headers.get('Retry-After')))
+                host = None
+            response.raise_for_status()
+
+            if stream:
+                # 流式响应在调用方读取完并关闭后才释放主机并发名额
+                async def on_close():
+                    await response.aclose()
+                    limit.release()
+
+                result = AsyncResponse(response, self._loop, on_close)
+            else:
+                result = AsyncResponse(response, self._loop)
+            return result
+        except httpx.HTTPError as e:
             print(f"  ✗ 请求失败: {e}")
+            if host and started is not None:  # 未收到响应：超时或连接错误
+                host.release(started, error=True)
+                host = None
             return None
+        finally:
+            # 其他异常（如 InvalidURL、编码错误、任务取消）同样归还限流与并发名额
+            if host and started is not None:
+                host.cancel()
+            if acquired and not (result is not None and stream):
+                limit.release()
+            if result is None and response is not None:
+                await response.aclose()
+
+    caching = False  # 异步引擎不使用页面缓存
+
+    def store(self, response: AsyncResponse, body: bytes):
+        """异步引擎不使用页面缓存"""
+
+    def close(self):
+        """关闭所有连接并停止事件循环"""
+        async def shutdown():
+            for client in self._clients.values():
+                await client.aclose()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def _client(self, verify: bool) -> 'httpx.AsyncClient':
+        """按证书校验选项复用 AsyncClient（httpx 的 verify 是客户端级别的）"""
+        if verify not in self._clients:
+            self._clients[verify] = httpx.AsyncClient(
+                verify=verify,
+                http2=HTTP2_AVAILABLE,
+                trust_env=False,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=Config.MAX_CONNECTIONS_PER_HOST * 4,
+                    max_keepalive_connections=Config.MAX_CONNECTIONS_PER_HOST * 2
+                ),
+                timeout=httpx.Timeout(Config.REQUEST_TIMEOUT)
+            )
+        return self._clients[verify]
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        """每个主机一个信号量，限制同一主机的在途请求数"""
+        host = urlsplit(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(Config.MAX_CONNECTIONS_PER_HOST)
+        return self._host_limits[host]
 
 
 class ProjectParser:
-    """项目解析器 - 单一职责：解析 HTML/JSON 数据"""
+    """项目解析器 - 单一职责：解析 HTML/JSON 数据（提取规则见 extraction.py）"""
 
     @staticmethod
     def parse_project_list(html: str) -> List[Dict[str, str]]:
         """从 HTML 中提取项目列表"""
-        pattern = r'<a[^>]*href="(/col/col1228968050/art/[^"]+)"[^>]*>([^<]+)</a>'
-        matches = re.findall(pattern, html)
-
         return [
-            {'name': name.strip(), 'url': urljoin(Config.BASE_URL, url)}
-            for url, name in matches
+            {'name': name, 'url': urljoin(Config.BASE_URL, url)}
+            for url, name in extraction.hangzhou_project_links(html)
         ]
 
     @staticmethod
     def parse_image_url(html: str) -> Optional[str]:
-        """从 HTML 中提取设计图 URL - DRY 原则"""
-        patterns = [
-            r'href="(/cms_files/filemanager/[^"]+\.jpg)"',
-            r'src="(/cms_files/filemanager/[^"]+\.jpg)"'
-        ]
+        """从 HTML 中提取设计图 URL - 优先 href 链接，找到即停止扫描"""
+        path = extraction.hangzhou_image_path(html)
+        return urljoin(Config.BASE_URL, path) if path else None
 
-        for pattern in patterns:
-            matches = re.findall(pattern, html)
-            if matches:
-                return urljoin(Config.BASE_URL, matches[0])
 
-        return None
+class DetailFetchError(Exception):
+    """详情页获取失败（网络错误或非 200 响应），区别于页面中没有设计图"""
 
 
 class ProjectScraper:
     """项目爬虫 - 单一职责：协调爬取流程"""
 
-    def __init__(self, client: HttpClient, parser: ProjectParser):
+    PAGE_SIZE_KEY = 'hangzhou.page_size'
+
+    def __init__(self, client: HttpClient, parser: ProjectParser,
+                 state: Optional[CrawlState] = None, snapshots: Optional[SnapshotWriter] = None):
         self.client = client
         self.parser = parser
+        self.state = state  # 用于缓存探测到的 pageSize，可为空
+        self.snapshots = snapshots  # 详情页原文归档，可为空
+        self._known = set()  # 已确认完成的项目 URL，守护模式下跨轮保留，不必重复查询状态库
 
     def get_project_list(self) -> List[Dict[str, str]]:
-        """获取所有页面的项目列表（支持翻页）"""
+        """获取所有页面的项目列表（支持翻页，按窗口并发预取）"""
+        return list(self.iter_projects())
+
+    def iter_projects(self, stop_at_known: bool = False) -> Iterator[Dict[str, str]]:
+        """
+        逐页产出新项目 - 每解析完一页立即交给调用方，无需等待整个列表
+
+        stop_at_known 时跳过状态库中已完成的项目并逐页获取，某页全部为已完成项目即停止翻页
+        （列表按发布时间倒序，守护模式没有新项目时每轮只请求第 1 页）；
+        停止翻页后再产出此前失败、本次未翻到的项目，使其得到重试
+        """
         print("正在获取项目列表...")
-        all_projects = []
+        page_size, first_page = self._negotiate_page_size()
+        found = 0
         seen_urls = set()  # 用于检测重复项目
         page = 1
-        page_size = 15
-
+        last_page = 0
+        short_page = None  # 返回条数少于 page_size 的页（正常情况下只会是最后一页）
+        stopped_at_known = False
+        window = 1 if stop_at_known else max(1, Config.PAGE_PREFETCH_WINDOW)
+
+        def fetch(current: int) -> Optional[List[Dict[str, str]]]:
+            # 探测时已取得的第 1 页直接复用
+            if current == 1 and first_page is not None:
+                return first_page
+            return self._fetch_page(current, page_size)
+
+        with ThreadPoolExecutor(max_workers=window) as pool:
+            while True:
+                pages = list(range(page, page + window))
+                print(f"  正在获取第 {pages[0]}-{pages[-1]} 页..." if len(pages) > 1
+                      else f"  正在获取第 {pages[0]} 页...")
+
+                # 投机预取整个窗口，再按页码顺序判断在哪一页停止
+                done = False
+                for current, projects in zip(pages, pool.map(fetch, pages)):
+                    if projects is None:
+                        done = True
+                        break
+
+                    if not projects:
+                        print(f"  ✓ 第 {current} 页无数据，已获取所有页面")
+                        done = True
+                        break
+
+                    # 检查是否有新项目（去重）
+                    new_projects = []
+                    for project in projects:
+                        if project['url'] not in seen_urls:
+                            new_projects.append(project)
+                            seen_urls.add(project['url'])
+
+                    if not new_projects:
+                        print(f"  ✓ 第 {current} 页无新项目，已获取所有页面")
+                        done = True
+                        break
+
+                    # 短页之后仍有数据：接口不再接受当前 pageSize，缓存实际条数供下次使用
+                    if short_page is not None:
+                        print(f"  ⚠ 接口只返回 {short_page} 条/页，下次运行改用更小的分页")
+                        self._save_page_size(short_page)
+                        short_page = None
+                    if len(projects) < page_size:
+                        short_page = len(projects)
+
+                    if stop_at_known:
+                        new_projects = [p for p in new_projects if not self._is_known(p['url'])]
+                        if not new_projects:
+                            print(f"  ✓ 第 {current} 页均为已完成项目，停止翻页")
+                            done = stopped_at_known = True
+                            break
+
+                    print(f"  ✓ 第 {current} 页找到 {len(new_projects)} 个新项目")
+                    found += len(new_projects)
+                    last_page = current
+                    yield from new_projects
+
+                if done:
+                    break
+                page += window
+
+        print(f"\n✓ 总共找到 {found} 个项目（跨 {last_page} 页，每页 {page_size} 条）\n")
+        if stopped_at_known:
+            yield from self._failed_projects(seen_urls)
+
+    def _failed_projects(self, seen: set) -> Iterator[Dict[str, str]]:
+        """此前失败、本次未翻到的项目（名称取自状态库）"""
+        failed = [{'name': project['name'], 'url': project['url']}
+                  for project in self.state.projects_with_status('hangzhou', STATUS_FAILED)
+                  if project['url'] not in seen and project['name']]
+        if failed:
+            print(f"重试 {len(failed)} 个此前失败的项目\n")
+        yield from failed
+
+    def _is_known(self, url: str) -> bool:
+        """项目已完成（设计图已下载或确认没有设计图）"""
+        if url in self._known:
+            return True
+        if not self.state:
+            return False
+        project = self.state.get_project(url)
+        if project and (project['status'] == STATUS_NO_FILES or self.state.is_project_complete(url)):
+            self._known.add(url)
+            return True
+        return False
+
+    def _negotiate_page_size(self) -> Tuple[int, Optional[List[Dict[str, str]]]]:
+        """
+        确定列表请求的 pageSize - 返回 (pageSize, 探测时取得的第 1 页)
+
+        优先使用状态库中未过期的探测结果（第 1 页请求失败或为空时重新探测）；否则从
+        PAGE_SIZE_MAX 开始请求第 1 页，失败或返回 0 条（有的服务端对过大的 pageSize
+        静默返回空列表）则减半重试，直到 Config.PAGE_SIZE 仍为空才认为列表为空。
+        返回条数少于请求值时，以实际条数作为之后各页的 pageSize，与服务端实际使用的分页偏移保持一致。
+        """
+        cached = self._cached_page_size()
+        if cached:
+            projects = self._fetch_page(1, cached)
+            if projects:
+                print(f"  使用缓存的 pageSize={cached}")
+                return cached, projects
+
+        size = max(Config.PAGE_SIZE_MAX, Config.PAGE_SIZE)
         while True:
-            print(f"  正在获取第 {page} 页...")
-
-            # 使用正确的分页参数格式
-            params = Config.API_PARAMS.copy()
-            params['paramJson'] = f'{{"pageNo":{page},"pageSize":"{page_size}"}}'
-
+            projects = self._fetch_page(1, size)
+            if projects:
+                break
+            if size <= Config.PAGE_SIZE:
+                return Config.PAGE_SIZE, projects
+            size = max(Config.PAGE_SIZE, size // 2)
+            print(f"  ⚠ 改用 pageSize={size} 重试")
+
+        honored = min(size, len(projects))
+        if honored >= Config.PAGE_SIZE:
+            self._save_page_size(honored)
+        print(f"  ✓ 探测到 pageSize={honored}")
+        return honored, projects
+
+    def _cached_page_size(self) -> Optional[int]:
+        """读取未过期的 pageSize 缓存"""
+        if not self.state:
+            return None
+        value = self.state.get_value(self.PAGE_SIZE_KEY)
+        if not value:
+            return None
+        try:
+            cached = json.loads(value)
+            probed_at = datetime.fromisoformat(cached['probed_at'])
+            size = int(cached['size'])
+        except (ValueError, KeyError, TypeError):
+            return None
+        if datetime.now() - probed_at > timedelta(days=Config.PAGE_SIZE_CACHE_DAYS):
+            return None
+        return size if size > 0 else None
+
+    def _save_page_size(self, size: int):
+        """缓存 pageSize 探测结果"""
+        if self.state:
+            self.state.set_value(self.PAGE_SIZE_KEY, json.dumps({
+                'size': size,
+                'probed_at': datetime.now().isoformat(timespec='seconds'),
+            }))
+
+    def _fetch_page(self, page: int, page_size: int = Config.PAGE_SIZE) -> Optional[List[Dict[str, str]]]:
+        """获取并解析单页项目列表 - 失败返回 None，无数据返回空列表"""
+        params = Config.API_PARAMS.copy()
+        params['paramJson'] = f'{{"pageNo":{page},"pageSize":"{page_size}"}}'
+
+        with METRICS.stage('listing') as span:
             response = self.client.get(Config.API_URL, params=params)
             if not response:
                 print(f"  ✗ 第 {page} 页获取失败")
-                break
+                span.fail()
+                return None
 
+            METRICS.add_bytes('listing', len(response.content))
             data = response.json()
             if not data.get('success'):
                 print(f"  ✗ 第 {page} 页 API 返回失败: {data.get('message', '未知错误')}")
-                break
-
-            projects = self.parser.parse_project_list(data['data']['html'])
-
-            if not projects:
-                print(f"  ✓ 第 {page} 页无数据，已获取所有页面")
-                break
-
-            # 检查是否有新项目（去重）
-            new_projects = []
-            for project in projects:
-                if project['url'] not in seen_urls:
-                    new_projects.append(project)
-                    seen_urls.add(project['url'])
-
-            if not new_projects:
-                print(f"  ✓ 第 {page} 页无新项目，已获取所有页面")
-                break
-            else:
-                print(f"  ✓ 第 {page} 页找到 {len(new_projects)} 个新项目")
-                all_projects.extend(new_projects)
-
-            page += 1
-
-            # 短暂延迟，避免请求过快
-            time.sleep(0.5)
-
-        print(f"\n✓ 总共找到 {len(all_projects)} 个项目（跨 {page-1} 页）\n")
-        return all_projects
-
-    def get_image_url(self, project_url: str) -> Optional[str]:
-        """获取项目设计图 URL"""
-        response = self.client.get(project_url)
-        return self.parser.parse_image_url(response.text) if response else None
+                span.fail()
+                return None
+
+            with METRICS.stage('parse'):
+                return self.parser.parse_project_list(data['data']['html'])
+
+    def get_image_url(self, project_url: str, project_name: str = None) -> Optional[str]:
+        """
+        获取项目设计图 URL（详情页原文同时写入页面缓存与快照归档）
+
+        页面中没有设计图时返回 None，详情页获取失败时抛出 DetailFetchError。
+        详情页流式读取：出现 href 设计图链接或正文结束标记后即关闭连接，
+        不再下载页脚等无关内容；需要写入缓存或快照时读到正文结束
+        （不在第一个设计图处停止），--reparse 与离线回放能用新的解析规则看到完整正文
+        """
+        with METRICS.stage('detail') as span:
+            response = self.client.get(project_url, stream=True)
+            if not response:
+                raise DetailFetchError(project_url)
+            persist, stop = self._detail_stop(response)
+            try:
+                body, truncated = extraction.read_until(
+                    response.iter_content(Config.DETAIL_CHUNK_SIZE), stop, Config.DETAIL_TAIL_BYTES,
+                    extraction.body_length(response.headers)
+                )
+            except requests.RequestException as e:
+                print(f"  ✗ 请求失败: {e}")
+                raise DetailFetchError(project_url) from e
+            finally:
+                response.close()
+            METRICS.add_bytes('detail', len(body))
+
+        return self._parse_detail(project_url, project_name, response, body, truncated, persist)
+
+    async def aget_image_url(self, project_url: str, project_name: str = None) -> Optional[str]:
+        """get_image_url 的协程版本（异步引擎在事件循环上直接调用，不占用线程）"""
+        METRICS.enter('detail')
+        started = time.perf_counter()
+        body = None
+        try:
+            response = await self.client.aget(project_url, stream=True)
+            if not response:
+                raise DetailFetchError(project_url)
+            persist, stop = self._detail_stop(response)
+            try:
+                body, truncated = await extraction.aread_until(
+                    response.aiter_content(Config.DETAIL_CHUNK_SIZE), stop, Config.DETAIL_TAIL_BYTES,
+                    extraction.body_length(response.headers)
+                )
+            except httpx.HTTPError as e:
+                print(f"  ✗ 请求失败: {e}")
+                raise DetailFetchError(project_url) from e
+            finally:
+                await response.aclose()
+            METRICS.add_bytes('detail', len(body))
+        finally:
+            METRICS.exit('detail', time.perf_counter() - started, error=body is None)
+
+        return self._parse_detail(project_url, project_name, response, body, truncated, persist)
+
+    def _detail_stop(self, response) -> Tuple[bool, tuple]:
+        """返回 (是否需要保存页面, 停止条件)：需要写入缓存或快照时读到正文结束，不在第一个设计图处停止"""
+        # 来自页面缓存的响应此前已保存、归档过
+        persist = response.headers.get('X-Cache') is None and (
+            self.client.caching or self.snapshots is not None)
+        if not Config.DETAIL_EARLY_STOP:
+            return persist, ()
+        return persist, extraction.PERSIST_DETAIL_STOP if persist else extraction.HANGZHOU_DETAIL_STOP
+
+    def _parse_detail(self, project_url: str, project_name: Optional[str], response,
+                      body: bytes, truncated: bool, persist: bool) -> Optional[str]:
+        """保存详情页（省去页脚的前缀在快照中标记为截断）并解析设计图 URL"""
+        if persist:
+            self.client.store(response, body)
+            if self.snapshots:
+                self.snapshots.append(project_url, body, project_name, truncated=truncated)
+        with METRICS.stage('parse'):
+            return self.parser.parse_image_url(
+                extraction.decode_page(body, response.headers.get('Content-Type'))
+            )
 
 
 class ImageDownloader:
     """图片下载器 - 单一职责：下载和保存图片"""
 
-    def __init__(self, client: HttpClient, output_dir: str = Config.OUTPUT_DIR):
+    def __init__(self, client: HttpClient, output_dir: str = Config.OUTPUT_DIR,
+                 show_progress: bool = Config.DOWNLOAD_PROGRESS):
         self.client = client
         self.output_dir = output_dir
+        self.show_progress = show_progress
         self._ensure_output_dir()
 
     def _ensure_output_dir(self):
@@ -178,26 +693,110 @@ class ImageDownloader:
             os.makedirs(self.output_dir)
             print(f"✓ 创建输出目录: {self.output_dir}\n")
 
-    def download(self, img_url: str, project_name: str) -> bool:
-        """下载图片到本地"""
+    def download(self, img_url: str, project_name: str) -> Optional[Dict]:
+        """
+        流式下载图片到本地：分块写入临时文件，完成后原子替换
+
+        返回文件信息 (path, size, sha256, etag, last_modified)，失败返回 None
+        """
         file_path = self._get_safe_file_path(project_name)
 
         response = self.client.get(
             img_url,
             timeout=Config.DOWNLOAD_TIMEOUT,
-            verify=False
+            verify=False,
+            stream=True
         )
 
         if not response:
-            return False
+            return None
+
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.output_dir, suffix='.tmp')
+        with METRICS.stage('download') as span:
+            try:
+                with response, os.fdopen(fd, 'wb') as f, self._progress_bar(response, file_path) as bar:
+                    for chunk in response.iter_content(chunk_size=Config.DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+                        digest.update(chunk)
+                        size += len(chunk)
+                        bar.update(len(chunk))
+                os.replace(tmp_path, file_path)
+            except (IOError, requests.RequestException) as e:
+                print(f"  ✗ 写入文件失败: {e}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                span.fail()
+                return None
+            finally:
+                METRICS.add_bytes('download', size)
+
+        return self._file_info(file_path, size, digest, response)
+
+    async def adownload(self, img_url: str, project_name: str) -> Optional[Dict]:
+        """download 的协程版本（异步引擎；分块写文件在事件循环线程上进行，每块至多 DOWNLOAD_CHUNK_SIZE）"""
+        file_path = self._get_safe_file_path(project_name)
+
+        response = await self.client.aget(
+            img_url,
+            timeout=Config.DOWNLOAD_TIMEOUT,
+            verify=False,
+            stream=True
+        )
 
+        if not response:
+            return None
+
+        digest = hashlib.sha256()
+        size = 0
+        done = False
+        fd, tmp_path = tempfile.mkstemp(dir=self.output_dir, suffix='.tmp')
+        METRICS.enter('download')
+        started = time.perf_counter()
         try:
-            with open(file_path, 'wb') as f:
-                f.write(response.content)
-            return True
-        except IOError as e:
+            with os.fdopen(fd, 'wb') as f, self._progress_bar(response, file_path) as bar:
+                async for chunk in response.aiter_content(Config.DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+                    bar.update(len(chunk))
+            os.replace(tmp_path, file_path)
+            done = True
+        except (IOError, httpx.HTTPError) as e:
             print(f"  ✗ 写入文件失败: {e}")
-            return False
+            return None
+        finally:
+            await response.aclose()
+            if not done and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            METRICS.add_bytes('download', size)
+            METRICS.exit('download', time.perf_counter() - started, error=not done)
+
+        return self._file_info(file_path, size, digest, response)
+
+    @staticmethod
+    def _file_info(file_path: str, size: int, digest: 'hashlib._Hash', response) -> Dict:
+        return {
+            'path': file_path,
+            'size': size,
+            'sha256': digest.hexdigest(),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+
+    def _progress_bar(self, response: requests.Response, file_path: str) -> tqdm:
+        """创建字节级进度条（未开启时为空操作）"""
+        total = int(response.headers.get('Content-Length', 0)) or None
+        return tqdm(
+            total=total,
+            desc=os.path.basename(file_path),
+            unit='B',
+            unit_scale=True,
+            unit_divisor=1024,
+            leave=False,
+            disable=not self.show_progress
+        )
 
     def _get_safe_file_path(self, project_name: str) -> str:
         """生成安全的文件路径 - 清理非法字符"""
@@ -212,78 +811,298 @@ class CSVExporter:
     @staticmethod
     def save(data: List[List[str]], filename: str):
         """保存数据到 CSV 文件"""
-        try:
-            with open(filename, 'w', encoding='utf-8-sig', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(['项目名称', '项目URL', '设计图URL'])
-                writer.writerows(data)
-            print(f"\n✓ 数据已保存到: {filename}")
-        except IOError as e:
-            print(f"\n✗ 保存 CSV 失败: {e}")
+        with METRICS.stage('export') as span:
+            try:
+                with open(filename, 'w', encoding='utf-8-sig', newline='') as f:
+                    writer = csv.writer(f)
+                    writer.writerow(['项目名称', '项目URL', '设计图URL'])
+                    writer.writerows(data)
+                print(f"\n✓ 数据已保存到: {filename}")
+            except IOError as e:
+                print(f"\n✗ 保存 CSV 失败: {e}")
+                span.fail()
 
 
 class Application:
     """应用程序主类 - 协调所有组件"""
 
-    def __init__(self):
+    def __init__(self, throttle: Optional[Throttle] = None):
+        """
+        Args:
+            throttle: 与其他站点共用的限流器（为空时按 Config 新建，见 engine.py）
+        """
+        extraction.use_backend(Config.PARSER_BACKEND)
+
         # 依赖注入 - 依赖倒置原则 (SOLID-D)
-        self.client = HttpClient()
+        self.client = self._create_client(throttle)
         self.parser = ProjectParser()
-        self.scraper = ProjectScraper(self.client, self.parser)
+        self.state = CrawlState(Config.STATE_DB) if Config.INCREMENTAL else None
+        self.snapshots = SnapshotWriter('hangzhou', Config.SNAPSHOT_DIR) \
+            if Config.SNAPSHOTS and not Config.OFFLINE else None
+        self.scraper = ProjectScraper(self.client, self.parser, self.state, self.snapshots)
         self.downloader = ImageDownloader(self.client)
         self.exporter = CSVExporter()
+        self._print_lock = threading.Lock()
+        self._stopping = threading.Event()
 
     def run(self):
         """运行主程序"""
         self._print_header()
-        self._show_disclaimer()
+        self.show_disclaimer()
+        try:
+            with profiling.profiled('hangzhou', Config.PROFILE is not None, Config.PROFILE_DIR,
+                                    Config.PROFILE or 'auto'):
+                self.crawl()
+        finally:
+            self.close()
+
+    def watch(self, interval: float = Config.WATCH_INTERVAL):
+        """
+        守护模式：不需要交互，每隔 interval 秒检查一次新项目，直到收到 SIGTERM 或 Ctrl+C
+
+        HTTP 连接池、限流状态、状态库与已完成项目集合在各轮之间复用，
+        没有新项目时每轮只请求一个列表页
+        """
+        self._print_header()
+        print(f"守护模式：每 {interval:g} 秒检查一次新项目（SIGTERM 在本轮结束后退出，Ctrl+C 立即退出）")
+        try:
+            watch.run_forever(self._watch_cycle, interval)
+        finally:
+            self.close()
 
-        # 获取项目列表
-        projects = self.scraper.get_project_list()
-        if not projects:
-            print("没有找到项目，程序退出")
-            return
+    def _watch_cycle(self):
+        with profiling.profiled('hangzhou', Config.PROFILE is not None, Config.PROFILE_DIR,
+                                Config.PROFILE or 'auto'):
+            self.crawl(stop_at_known=True)
 
-        # 处理每个项目
-        results = self._process_projects(projects)
+    def crawl(self, stop_at_known: bool = False):
+        """爬取、保存结果并打印总结（--profile 时整个过程在剖析下运行）"""
+        METRICS.start_run()
+
+        # 边获取项目列表边处理：每解析完一页，其中的项目立即进入处理线程池
+        results = self._process_projects(self.scraper.iter_projects(stop_at_known))
+
+        if not results:
+            print("没有新项目" if stop_at_known else "没有找到项目，程序退出")
+            self._export_metrics(results)
+            return
 
         # 保存结果
         self._save_results(results)
 
         # 打印总结
         self._print_summary(results)
+        self._export_metrics(results)
+
+    def reparse(self):
+        """从详情页快照重新解析设计图 URL 并重建 CSV（多进程，不访问网络）"""
+        print(f"正在从 {Config.SNAPSHOT_DIR} 重新解析详情页快照...")
+        try:
+            records = reparse_snapshots('hangzhou', ProjectParser.parse_image_url,
+                                        Config.SNAPSHOT_DIR, Config.REPARSE_WORKERS,
+                                        extraction.use_backend, (Config.PARSER_BACKEND,))
+        finally:
+            self.close()
+
+        if not records:
+            print("没有找到页面快照，请先正常运行一次")
+            return
+
+        results = [
+            ({'name': record['name'] or '', 'url': record['url']}, img_url, img_url is not None)
+            for record, img_url in records
+        ]
+        self._save_results(results)
+
+        found = sum(1 for _, img_url, _ in results if img_url)
+        print(f"✓ 从 {len(results)} 个快照中解析出 {found} 个设计图 URL")
+
+    def stop(self):
+        """请求停止爬取：不再取新的项目，已开始的项目处理完后 crawl 返回（可从其他线程调用）"""
+        self._stopping.set()
+
+    def close(self):
+        """释放 HTTP 客户端、状态库与快照归档"""
+        self.client.close()
+        if self.state:
+            self.state.close()
+        if self.snapshots:
+            self.snapshots.close()
+
+    @staticmethod
+    def _create_client(throttle: Optional[Throttle] = None):
+        """按 Config.HTTP_ENGINE 选择 HTTP 引擎（离线回放只支持 requests 引擎的页面缓存）"""
+        if Config.HTTP_ENGINE == 'async' and not Config.OFFLINE:
+            if HTTPX_AVAILABLE:
+                return AsyncHttpClient(throttle)
+            print("⚠ 未安装 httpx，回退到 requests 引擎\n")
+        return HttpClient(throttle)
 
     def _process_projects(
-        self, projects: List[Dict[str, str]]
+        self, projects: Iterable[Dict[str, str]]
     ) -> List[Tuple[Dict, Optional[str], bool]]:
-        """处理所有项目 - 返回 (项目, 图片URL, 是否成功)"""
-        results = []
-        total = len(projects)
+        """
+        并发处理所有项目 - 返回 (项目, 图片URL, 是否成功)，顺序与输入一致
+
+        projects 可以是列表，也可以是边爬取边产出的迭代器（此时总数未知）
+        """
+        total = len(projects) if isinstance(projects, list) else None
+        projects = self._until_stopped(projects)
+        if isinstance(self.client, AsyncHttpClient):
+            return self._process_projects_async(projects, total)
+
+        print(f"开始处理项目（并发数 {Config.MAX_WORKERS}）...\n")
+
+        # 每个项目的详情页请求与其他项目的图片下载相互重叠，
+        # 速率由 HttpClient 的全局令牌桶统一控制
+        with ThreadPoolExecutor(max_workers=Config.MAX_WORKERS) as pool:
+            futures = [
+                pool.submit(self._process_project, i, total, project)
+                for i, project in enumerate(projects, 1)
+            ]
+            # 按提交顺序收集结果，保证 CSV 顺序不变；请求停止时尚未开始的项目不计入
+            results = (future.result() for future in futures)
+            return [result for result in results if result is not None]
 
-        print(f"开始处理 {total} 个项目...\n")
+    def _process_projects_async(
+        self, projects: Iterable[Dict[str, str]], total: Optional[int]
+    ) -> List[Tuple[Dict, Optional[str], bool]]:
+        """
+        异步引擎：每个项目作为协程在事件循环上处理，不为每个请求占用线程
+
+        列表页仍在当前线程上逐页获取，项目边产出边提交；在途项目数有上限，
+        列表不会远远跑在处理前面，在途请求数由限流器与每主机连接数控制
+        """
+        slots = threading.BoundedSemaphore(Config.MAX_CONNECTIONS_PER_HOST)
+        print(f"开始处理项目（异步引擎，每个主机至多 {Config.MAX_CONNECTIONS_PER_HOST} 个连接）...\n")
 
+        futures = []
         for i, project in enumerate(projects, 1):
-            print(f"[{i}/{total}] {project['name']}")
-
-            # 获取设计图 URL
-            img_url = self.scraper.get_image_url(project['url'])
-            success = False
-
-            if img_url:
-                print("  ✓ 找到设计图")
-                # 下载设计图
-                if self.downloader.download(img_url, project['name']):
-                    print("  ✓ 下载成功")
-                    success = True
-            else:
-                print("  ✗ 未找到设计图")
+            slots.acquire()
+            future = self.client.submit(self._aprocess_project(i, total, project))
+            future.add_done_callback(lambda _: slots.release())
+            futures.append(future)
+        # 按提交顺序收集结果，保证 CSV 顺序不变
+        return [future.result() for future in futures]
+
+    def _until_stopped(self, projects: Iterable[Dict[str, str]]) -> Iterator[Dict[str, str]]:
+        """逐个产出项目，请求停止后不再取下一个（也不再请求后续列表页）"""
+        for project in projects:
+            if self._stopping.is_set():
+                print("⚠ 已请求停止，不再处理新项目")
+                return
+            yield project
+
+    def _process_project(
+        self, index: int, total: Optional[int], project: Dict[str, str]
+    ) -> Optional[Tuple[Dict, Optional[str], bool]]:
+        """处理单个项目：获取设计图 URL 并下载（增量模式下跳过已完成项目；请求停止后返回 None）"""
+        if self._stopping.is_set():  # 列表已全部提交时，线程池队列中的项目同样不再开始
+            return None
+        lines = self._project_lines(index, total, project)
 
-            results.append((project, img_url, success))
+        if Config.OFFLINE:
+            return self._replay_project(lines, project)
 
-            # 限流
-            time.sleep(Config.RATE_LIMIT_DELAY)
+        skipped = self._skip_completed(lines, project)
+        if skipped:
+            return skipped
 
-        return results
+        try:
+            img_url = self.scraper.get_image_url(project['url'], project['name'])
+        except DetailFetchError:
+            return self._finish_project(lines, project, None, None, fetched=False)
+        info = self.downloader.download(img_url, project['name']) if img_url else None
+        return self._finish_project(lines, project, img_url, info)
+
+    async def _aprocess_project(
+        self, index: int, total: Optional[int], project: Dict[str, str]
+    ) -> Tuple[Dict, Optional[str], bool]:
+        """_process_project 的协程版本（状态库与快照的调用很短，直接在事件循环上执行）"""
+        lines = self._project_lines(index, total, project)
+
+        skipped = self._skip_completed(lines, project)
+        if skipped:
+            return skipped
+
+        try:
+            img_url = await self.scraper.aget_image_url(project['url'], project['name'])
+        except DetailFetchError:
+            return self._finish_project(lines, project, None, None, fetched=False)
+        info = await self.downloader.adownload(img_url, project['name']) if img_url else None
+        return self._finish_project(lines, project, img_url, info)
+
+    @staticmethod
+    def _project_lines(index: int, total: Optional[int], project: Dict[str, str]) -> List[str]:
+        progress = f"{index}/{total}" if total else f"{index}"
+        return [f"[{progress}] {project['name']}"]
+
+    def _skip_completed(self, lines: List[str], project: Dict[str, str]
+                        ) -> Optional[Tuple[Dict, Optional[str], bool]]:
+        """增量模式下已完成的项目直接返回结果，否则返回 None"""
+        if not (self.state and self.state.is_project_complete(project['url'])):
+            return None
+        record = self.state.get_project(project['url'])
+        lines.append("  ⊙ 已下载，跳过")
+        self._print_lines(lines)
+        return project, record['detail'], True
+
+    def _finish_project(self, lines: List[str], project: Dict[str, str], img_url: Optional[str],
+                        info: Optional[Dict], fetched: bool = True) -> Tuple[Dict, Optional[str], bool]:
+        """记录状态并输出单个项目的处理结果（fetched 为 False 表示详情页获取失败）"""
+        if not fetched:
+            lines.append("  ✗ 详情页获取失败")
+        elif img_url:
+            lines.append("  ✓ 找到设计图")
+            if info:
+                lines.append("  ✓ 下载成功")
+        else:
+            lines.append("  ✗ 未找到设计图")
+        self._record_state(project, img_url, info, fetched)
+        self._print_lines(lines)
+        return project, img_url, info is not None
+
+    def _replay_project(self, lines: List[str], project: Dict[str, str]
+                        ) -> Tuple[Dict, Optional[str], bool]:
+        """离线回放：只从缓存重新解析设计图 URL，不下载也不改写状态库"""
+        try:
+            img_url = self.scraper.get_image_url(project['url'], project['name'])
+        except DetailFetchError:
+            lines.append("  ✗ 缓存中没有详情页")
+            self._print_lines(lines)
+            return project, None, False
+        lines.append("  ✓ 找到设计图（离线回放）" if img_url else "  ✗ 未找到设计图")
+        self._print_lines(lines)
+        return project, img_url, img_url is not None
+
+    def _record_state(self, project: Dict[str, str], img_url: Optional[str],
+                      info: Optional[Dict], fetched: bool = True):
+        """把项目与设计图的下载结果写入增量状态库（详情页获取失败记为失败，下次重试）"""
+        if not self.state:
+            return
+
+        if not fetched:
+            status = STATUS_FAILED
+        elif not img_url:
+            status = STATUS_NO_FILES
+        elif info:
+            status = STATUS_DONE
+            self.state.mark_file(
+                img_url, project['url'], STATUS_DONE,
+                path=info['path'], size=info['size'], etag=info['etag'],
+                last_modified=info['last_modified'], sha256=info['sha256']
+            )
+        else:
+            status = STATUS_FAILED
+
+        self.state.mark_project(
+            project['url'], 'hangzhou', status, name=project['name'], detail=img_url
+        )
+
+    def _print_lines(self, lines: List[str]):
+        """多线程下整块输出，避免不同项目的日志交错"""
+        with self._print_lock:
+            print('\n'.join(lines))
 
     def _save_results(self, results: List[Tuple[Dict, Optional[str], bool]]):
         """保存结果到 CSV"""
@@ -308,6 +1127,19 @@ class Application:
         print(f"处理完成！成功下载 {success}/{total} 个设计图")
         print("=" * 50)
 
+    @staticmethod
+    def _export_metrics(results: List[Tuple[Dict, Optional[str], bool]]):
+        """写出本次运行的各阶段指标（Prometheus 文本格式与 JSON 汇总）"""
+        if not Config.METRICS_EXPORT:
+            return
+        success = sum(1 for _, _, s in results if s)
+        prom_path, json_path = METRICS.write(Config.METRICS_DIR, {
+            'projects': len(results),
+            'succeeded': success,
+            'failed': len(results) - success,
+        })
+        print(f"✓ 运行指标已写入: {prom_path}、{json_path}")
+
     @staticmethod
     def _print_header():
         """打印程序头部"""
@@ -326,7 +1158,7 @@ class Application:
         print()
 
     @staticmethod
-    def _show_disclaimer():
+    def show_disclaimer():
         """显示免责声明并要求用户确认"""
         print("⚠️  重要免责声明")
         print("=" * 50)
@@ -351,6 +1183,33 @@ class Application:
 
 def main():
     """程序入口"""
+    parser = argparse.ArgumentParser(description='杭州市规划和自然资源局项目爬虫')
+    parser.add_argument('--reparse', action='store_true',
+                        help='从详情页快照重新解析并生成 CSV，不访问网络')
+    parser.add_argument('--profile', nargs='?', const='auto', choices=profiling.ENGINES,
+                        help='按阶段剖析本次运行（默认 auto：安装了 pyinstrument 时采样剖析，否则 cProfile；'
+                             'memory：单独一轮内存剖析），报告写入 ./profiles')
+    parser.add_argument('--watch', nargs='?', type=float, const=Config.WATCH_INTERVAL, metavar='SECONDS',
+                        help=f'守护模式：不需要交互，每隔 SECONDS 秒（默认 {Config.WATCH_INTERVAL}）检查新项目')
+    parser.add_argument('--yes', action='store_true',
+                        help='已阅读并同意免责声明（--watch 无人值守运行时必需）')
+    args = parser.parse_args()
+    Config.PROFILE = args.profile
+
+    if args.reparse:
+        Application().reparse()
+        return
+
+    if args.watch is not None:
+        if not args.yes:
+            parser.error('--watch 需要同时指定 --yes，表示已阅读并同意免责声明')
+        Config.INCREMENTAL = True  # 依赖状态库判断哪些项目已完成
+        try:
+            Application().watch(args.watch)
+        except KeyboardInterrupt:
+            print("\n⚠ 守护模式已停止")
+        return
+
     try:
         app = Application()
         app.run()
@@ -368,4 +1227,5 @@ def main():
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # PyInstaller 打包后 --reparse 使用进程池所需
     main()
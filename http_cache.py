@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP 响应缓存
+以 SQLite 保存压缩后的页面（列表页、详情页），按 TTL 与 ETag/Last-Modified 判断新鲜度，
+超出容量时淘汰最近最少使用的条目；离线模式只从缓存回放，不访问网络
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Callable, Dict, Optional
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+
+DEFAULT_DB_PATH = './http_cache.db'
+
+# 只缓存页面类响应；设计图、附件等二进制文件由断点续传和去重存储负责
+CACHEABLE_TYPES = ('text/', 'application/json', 'application/xhtml+xml')
+MAX_ENTRY_BYTES = 8 * 1024 * 1024
+
+# 响应体已由 requests 解码，回放时不能再带这些头
+_DROPPED_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding', 'connection')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key          TEXT PRIMARY KEY,
+    url          TEXT NOT NULL,
+    status       INTEGER NOT NULL,
+    headers      TEXT NOT NULL,
+    codec        TEXT NOT NULL,
+    body         BLOB NOT NULL,
+    size         INTEGER NOT NULL,
+    stored_at    REAL NOT NULL,
+    accessed_at  REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at);
+"""
+
+
+class CacheMiss(requests.RequestException):
+    """离线模式下请求的页面不在缓存中（重试没有意义）"""
+
+
+class HttpCache:
+    """压缩页面缓存 - 单一职责：存取响应并按容量淘汰（线程安全）"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, max_bytes: int = 200 * 1024 * 1024):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(_SCHEMA)
+            self._total = self._conn.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM responses'
+            ).fetchone()[0]
+
+    @staticmethod
+    def key(method: str, url: str, body=None) -> str:
+        """请求的缓存键（POST 表单参与计算）"""
+        digest = hashlib.sha256(f'{method} {url}'.encode('utf-8'))
+        if body:
+            digest.update(body if isinstance(body, bytes) else str(body).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """读取缓存条目并更新访问时间，返回 {url, status, headers, body, stored_at}"""
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            with self._conn:
+                self._conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?',
+                                   (time.time(), key))
+
+        body = _decompress(row['codec'], row['body'])
+        if body is None:
+            return None
+        return {
+            'url': row['url'],
+            'status': row['status'],
+            'headers': json.loads(row['headers']),
+            'body': body,
+            'stored_at': row['stored_at'],
+        }
+
+    def put(self, key: str, url: str, status: int, headers: Dict[str, str], body: bytes):
+        """写入缓存条目，超出容量时按最近最少使用淘汰"""
+        codec, data = _compress(body)
+        now = time.time()
+        with self._lock, self._conn:
+            old = self._conn.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO responses
+                    (key, url, status, headers, codec, body, size, stored_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (key, url, status, json.dumps(headers, ensure_ascii=False), codec, data,
+                 len(data), now, now)
+            )
+            self._total += len(data) - (old['size'] if old else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def refresh(self, key: str):
+        """服务器确认未变更（304）后重新计算新鲜度"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute('UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?',
+                               (now, now, key))
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def _evict(self):
+        # 淘汰到容量的 90%，避免每次写入都触发淘汰
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute('SELECT key, size FROM responses ORDER BY accessed_at').fetchall()
+        for row in rows:
+            if self._total <= target:
+                break
+            self._conn.execute('DELETE FROM responses WHERE key = ?', (row['key'],))
+            self._total -= row['size']
+
+
+class CachingAdapter(BaseAdapter):
+    """
+    带缓存的 requests 传输适配器，包在实际传输适配器（如 ThrottledAdapter）之外
+
+    - 新鲜的缓存直接返回，不经过限流和网络
+    - 过期但有 ETag / Last-Modified 的条目发送条件请求，304 时沿用缓存
+    - 离线模式只回放缓存，未命中时抛出 CacheMiss
+    - 流式请求同样可以命中缓存，但响应体由调用方读取，需要时调用 store 保存
+    - 带条件头或 Range 的请求（断点续传、文件校验）不经过缓存
+    """
+
+    def __init__(self, cache: HttpCache, adapter: BaseAdapter,
+                 ttl: Callable[[str], float], offline: bool = False):
+        super().__init__()
+        self.cache = cache
+        self.adapter = adapter
+        self.ttl = ttl
+        self.offline = offline
+
+    def send(self, request, stream=False, **kwargs):
+        if request.method not in ('GET', 'POST') or _has_validators(request.headers):
+            if self.offline:
+                raise CacheMiss(f"离线模式不下载文件: {request.url}", request=request)
+            return self.adapter.send(request, stream=stream, **kwargs)
+
+        key = self.cache.key(request.method, request.url, request.body)
+        entry = self.cache.get(key)
+        if entry and (self.offline or time.time() - entry['stored_at'] < self.ttl(request.url)):
+            return self._replay(request, entry, 'HIT')
+        if self.offline:
+            raise CacheMiss(f"离线缓存未命中: {request.url}", request=request)
+
+        if entry:
+            request = request.copy()
+            headers = CaseInsensitiveDict(entry['headers'])
+            if headers.get('ETag'):
+                request.headers['If-None-Match'] = headers['ETag']
+            if headers.get('Last-Modified'):
+                request.headers['If-Modified-Since'] = headers['Last-Modified']
+
+        response = self.adapter.send(request, stream=stream, **kwargs)
+        if entry and response.status_code == 304:
+            response.close()
+            self.cache.refresh(key)
+            return self._replay(request, entry, 'REVALIDATED')
+
+        if not stream:
+            self.store(response, response.content)
+        return response
+
+    def store(self, response: requests.Response, body: bytes):
+        """
+        保存响应体；流式读取的调用方读完（或读到所需位置）后调用
+
+        body 可以只是响应体的前缀（如读到正文结束即停止的详情页），
+        之后命中或离线回放时返回的也是这段前缀
+        """
+        if response.status_code != 200 or not _is_cacheable(response.headers, len(body)):
+            return
+        request = response.request
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in _DROPPED_HEADERS}
+        self.cache.put(self.cache.key(request.method, request.url, request.body),
+                       request.url, response.status_code, headers, body)
+
+    def close(self):
+        self.adapter.close()
+        self.cache.close()
+
+    def _replay(self, request, entry: Dict, label: str) -> requests.Response:
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.reason = 'OK'
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.headers['X-Cache'] = label
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = entry['body']
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+
+def _has_validators(headers) -> bool:
+    return any(name in headers for name in ('If-None-Match', 'If-Modified-Since', 'If-Range', 'Range'))
+
+
+def _is_cacheable(headers, size: int) -> bool:
+    content_type = headers.get('Content-Type', '').lower()
+    return content_type.startswith(CACHEABLE_TYPES) and size <= MAX_ENTRY_BYTES
+
+
+def _compress(body: bytes):
+    if ZSTD_AVAILABLE:
+        return 'zstd', zstandard.ZstdCompressor(level=10).compress(body)
+    return 'zlib', zlib.compress(body, 6)
+
+
+def _decompress(codec: str, data: bytes) -> Optional[bytes]:
+    if codec == 'zlib':
+        return zlib.decompress(data)
+    if codec == 'zstd' and ZSTD_AVAILABLE:
+        return zstandard.ZstdDecompressor().decompress(data)
+    return None  # 写入时可用的压缩库现在不可用，按未命中处理
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标
+两个爬虫共用的轻量埋点：按 (站点, 阶段) 记录耗时直方图、成功/失败次数、字节数、
+重试次数与在途数量；每次运行结束写出 Prometheus 文本格式（可由 node_exporter 的
+textfile collector 采集）与 JSON 汇总
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+DEFAULT_DIR = './metrics'
+
+# 耗时直方图的桶上界（秒），覆盖从缓存命中到大文件下载的范围
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+class StageStats:
+    """单个 (站点, 阶段) 的累计统计（由 Metrics 加锁访问）"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)  # 最后一个桶为 +Inf
+        self.bytes = 0
+        self.retries = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def observe(self, seconds: float, error: bool):
+        self.count += 1
+        self.errors += int(error)
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """由直方图估算分位数（桶内线性插值，与 PromQL 的 histogram_quantile 一致）"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.buckets):
+            if n and cumulative + n >= rank:
+                lower = BUCKETS[i - 1] if i else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else self.max_seconds
+                return min(lower + (upper - lower) * (rank - cumulative) / n, self.max_seconds)
+            cumulative += n
+        return self.max_seconds
+
+    def summary(self) -> Dict:
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'seconds_total': round(self.seconds, 6),
+            'seconds_mean': round(self.seconds / self.count, 6) if self.count else None,
+            'seconds_p50': _round(self.quantile(0.5)),
+            'seconds_p95': _round(self.quantile(0.95)),
+            'seconds_p99': _round(self.quantile(0.99)),
+            'seconds_max': round(self.max_seconds, 6),
+            'bytes': self.bytes,
+            'retries': self.retries,
+            'in_flight_max': self.max_in_flight,
+        }
+
+
+class Span:
+    """stage() 产出的计时区间：操作以返回值表示失败时调用 fail()"""
+
+    __slots__ = ('error',)
+
+    def __init__(self):
+        self.error = False
+
+    def fail(self):
+        self.error = True
+
+
+class Metrics:
+    """按 (站点, 阶段) 分组的指标注册表 - 进程内共享，线程安全"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[Tuple[str, str], StageStats] = {}
+        self._runs: Dict[str, float] = {}  # 站点 -> 本次运行开始时间（Unix 时间戳）
+        self.profiler = None  # --profile 时由 profiling.profiled 设置，stage() 同时切换剖析阶段
+
+    def start_run(self, site: str):
+        """开始新一次运行：清空该站点的统计"""
+        with self._lock:
+            for key in [key for key in self._stages if key[0] == site]:
+                del self._stages[key]
+            self._runs[site] = time.time()
+
+    @contextmanager
+    def stage(self, site: str, stage: str) -> Iterator[Span]:
+        """记录一次操作的耗时与结果；抛出异常或调用 span.fail() 时计为失败"""
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.enter(site, stage)
+        self.enter(site, stage)
+        span = Span()
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException:
+            span.error = True
+            raise
+        finally:
+            self.exit(site, stage, time.perf_counter() - started, span.error)
+            if profiler is not None:
+                profiler.exit()
+
+    def enter(self, site: str, stage: str):
+        """操作开始（在途数加一）；与 exit 配对，用于在别处计时的操作"""
+        with self._lock:
+            stats = self._get(site, stage)
+            stats.in_flight += 1
+            stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+
+    def exit(self, site: str, stage: str, seconds: float, error: bool = False):
+        """操作结束：在途数减一并记录耗时"""
+        with self._lock:
+            stats = self._get(site, stage)
+            stats.in_flight -= 1
+            stats.observe(seconds, error)
+
+    def add_bytes(self, site: str, stage: str, size: int):
+        with self._lock:
+            self._get(site, stage).bytes += size
+
+    def add_retry(self, site: str, stage: str):
+        with self._lock:
+            self._get(site, stage).retries += 1
+
+    def summary(self, site: str, totals: Dict[str, int] = None) -> Dict:
+        """站点本次运行的 JSON 汇总"""
+        with self._lock:
+            started = self._runs.get(site, time.time())
+            stages = {stage: stats.summary()
+                      for (name, stage), stats in sorted(self._stages.items()) if name == site}
+        return {
+            'site': site,
+            'started_at': datetime.fromtimestamp(started).isoformat(timespec='seconds'),
+            'duration_seconds': round(time.time() - started, 3),
+            'totals': totals or {},
+            'stages': stages,
+        }
+
+    def prometheus(self, site: str, totals: Dict[str, int] = None) -> str:
+        """站点本次运行的 Prometheus 文本格式"""
+        with self._lock:
+            started = self._runs.get(site, time.time())
+            stages = [(stage, stats) for (name, stage), stats in sorted(self._stages.items())
+                      if name == site]
+            lines: List[str] = []
+
+            lines += ['# HELP crawler_stage_duration_seconds 各阶段单次操作耗时',
+                      '# TYPE crawler_stage_duration_seconds histogram']
+            for stage, stats in stages:
+                labels = f'site="{site}",stage="{stage}"'
+                cumulative = 0
+                for bound, n in zip(BUCKETS + ('+Inf',), stats.buckets):
+                    cumulative += n
+                    lines.append(f'crawler_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'crawler_stage_duration_seconds_sum{{{labels}}} {stats.seconds:.6f}')
+                lines.append(f'crawler_stage_duration_seconds_count{{{labels}}} {stats.count}')
+
+            for name, kind, help_text, attr in (
+                ('crawler_stage_errors_total', 'counter', '各阶段失败次数', 'errors'),
+                ('crawler_stage_bytes_total', 'counter', '各阶段传输或写入的字节数', 'bytes'),
+                ('crawler_stage_retries_total', 'counter', '各阶段的重试次数', 'retries'),
+                ('crawler_stage_in_flight', 'gauge', '各阶段当前在途数量', 'in_flight'),
+                ('crawler_stage_in_flight_max', 'gauge', '各阶段在途数量峰值', 'max_in_flight'),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+                lines += [f'{name}{{site="{site}",stage="{stage}"}} {getattr(stats, attr)}'
+                          for stage, stats in stages]
+
+        lines += ['# HELP crawler_run_start_timestamp_seconds 本次运行开始时间',
+                  '# TYPE crawler_run_start_timestamp_seconds gauge',
+                  f'crawler_run_start_timestamp_seconds{{site="{site}"}} {started:.3f}',
+                  '# HELP crawler_run_duration_seconds 本次运行耗时',
+                  '# TYPE crawler_run_duration_seconds gauge',
+                  f'crawler_run_duration_seconds{{site="{site}"}} {time.time() - started:.3f}']
+        if totals:
+            lines += ['# HELP crawler_run_items 本次运行的项目计数',
+                      '# TYPE crawler_run_items gauge']
+            lines += [f'crawler_run_items{{site="{site}",result="{key}"}} {value}'
+                      for key, value in totals.items()]
+        return '\n'.join(lines) + '\n'
+
+    def write(self, site: str, directory: str = DEFAULT_DIR,
+              totals: Dict[str, int] = None) -> Tuple[str, str]:
+        """
+        写出 <site>.prom 与 <site>_summary.json（先写临时文件再原子替换，采集方不会读到半个文件）
+
+        Returns:
+            (Prometheus 文件路径, JSON 汇总路径)
+        """
+        os.makedirs(directory, exist_ok=True)
+        prom_path = os.path.join(directory, f'{site}.prom')
+        json_path = os.path.join(directory, f'{site}_summary.json')
+        _write_atomic(prom_path, self.prometheus(site, totals))
+        _write_atomic(json_path, json.dumps(self.summary(site, totals), ensure_ascii=False, indent=2))
+        return prom_path, json_path
+
+    def _get(self, site: str, stage: str) -> StageStats:
+        key = (site, stage)
+        if key not in self._stages:
+            self._stages[key] = StageStats()
+        return self._stages[key]
+
+
+class SiteMetrics:
+    """绑定站点的指标视图，爬虫模块中以阶段名调用"""
+
+    def __init__(self, registry: Metrics, site: str):
+        self.registry = registry
+        self.site = site
+
+    def start_run(self):
+        self.registry.start_run(self.site)
+
+    def stage(self, stage: str):
+        return self.registry.stage(self.site, stage)
+
+    def enter(self, stage: str):
+        self.registry.enter(self.site, stage)
+
+    def exit(self, stage: str, seconds: float, error: bool = False):
+        self.registry.exit(self.site, stage, seconds, error)
+
+    def add_bytes(self, stage: str, size: int):
+        self.registry.add_bytes(self.site, stage, size)
+
+    def add_retry(self, stage: str):
+        self.registry.add_retry(self.site, stage)
+
+    def summary(self, totals: Dict[str, int] = None) -> Dict:
+        return self.registry.summary(self.site, totals)
+
+    def write(self, directory: str = DEFAULT_DIR, totals: Dict[str, int] = None) -> Tuple[str, str]:
+        return self.registry.write(self.site, directory, totals)
+
+
+REGISTRY = Metrics()
+
+
+def for_site(site: str) -> SiteMetrics:
+    """进程内共享注册表上的站点视图"""
+    return SiteMetrics(REGISTRY, site)
+
+
+# ---------- 内部函数 ----------
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 6) if value is not None else None
+
+
+def _write_atomic(path: str, text: str):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
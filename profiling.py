@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行剖析
+两个爬虫 --profile 选项的实现：按阶段（与 metrics.py 的阶段一致）分别剖析，
+每个 (阶段, 线程) 使用独立的剖析器，嵌套阶段进入时暂停外层阶段，结束时按阶段合并；
+安装 pyinstrument 时改用采样剖析并输出火焰图（HTML / speedscope），
+否则使用 cProfile（.prof 可用 snakeviz 等工具查看）；内存剖析（tracemalloc 报告内存峰值与主要分配位置）
+单独一轮运行，CPU 剖析结果不受 tracemalloc 的开销干扰
+
+Python 3.12 起 cProfile 基于 sys.monitoring，同一时刻只能有一个实例且覆盖所有线程，
+此时 cProfile 引擎不分阶段，只输出整个进程的剖析（阶段耗时仍照常统计）
+"""
+
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import shutil
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import metrics
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+    from pyinstrument.renderers import ConsoleRenderer, HTMLRenderer, SpeedscopeRenderer
+    from pyinstrument.session import Session
+    PYINSTRUMENT_AVAILABLE = True
+except ImportError:
+    PYINSTRUMENT_AVAILABLE = False
+
+
+DEFAULT_DIR = './profiles'
+ENGINES = ('auto', 'cprofile', 'pyinstrument', 'memory')
+
+SAMPLE_INTERVAL = 0.001       # pyinstrument 采样间隔（秒）
+TOP_FUNCTIONS = 40            # 文本报告列出的函数数
+TOP_ALLOCATIONS = 25          # 内存报告列出的分配位置数
+SNAPSHOT_GROWTH = 1.1         # 已跟踪内存比上次快照增长 10% 以上时重新快照
+SNAPSHOT_MIN_BYTES = 1 << 20  # 1MB 以下不快照
+MEMORY_POLL = 0.1             # 内存剖析检查已跟踪内存的间隔（秒）
+
+MAIN_STAGE = ('', 'main')     # 主线程上不属于任何阶段的代码
+PER_THREAD_CPROFILE = sys.version_info < (3, 12)
+
+_part_counter = itertools.count()
+
+
+def resolve_engine(name: str = 'auto') -> str:
+    """'auto' 在安装了 pyinstrument 时选择采样剖析，所选引擎不可用时退回 cProfile"""
+    if name == 'memory':
+        return name
+    if name in ('auto', 'pyinstrument') and PYINSTRUMENT_AVAILABLE:
+        return 'pyinstrument'
+    return 'cprofile'
+
+
+class Profiler:
+    """
+    按阶段剖析一次运行 - 线程安全
+
+    stage() 由 metrics.Metrics.stage 调用；同一线程上同一时刻只有一个剖析器在运行，
+    进入嵌套阶段时暂停外层阶段的剖析器，退出时恢复
+    """
+
+    def __init__(self, label: str, directory: str = DEFAULT_DIR, engine: str = 'auto'):
+        self.engine = resolve_engine(engine)
+        self.per_stage = self.engine == 'pyinstrument' or PER_THREAD_CPROFILE
+        self.output_dir = _output_dir(label, directory)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profiles: Dict[Tuple[Tuple[str, str], int], object] = {}
+        self._seconds: Dict[Tuple[str, str], float] = {}
+        self._started = None
+
+    @property
+    def parts_dir(self) -> str:
+        """子进程（如解压进程池）写入部分剖析结果的目录"""
+        return os.path.join(self.output_dir, 'parts')
+
+    def start(self):
+        os.makedirs(self.parts_dir, exist_ok=True)
+        self._started = time.perf_counter()
+        self.enter(*MAIN_STAGE)
+        if not self.per_stage:
+            self._resume((MAIN_STAGE, threading.get_ident()), force=True)
+
+    def stop(self) -> str:
+        """停止剖析并写出报告，返回报告目录"""
+        self.exit()
+        if not self.per_stage:
+            self._pause((MAIN_STAGE, threading.get_ident()), force=True)
+        elapsed = time.perf_counter() - self._started
+        self._write_profiles(elapsed)
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        return self.output_dir
+
+    @contextmanager
+    def stage(self, site: str, stage: str) -> Iterator[None]:
+        self.enter(site, stage)
+        try:
+            yield
+        finally:
+            self.exit()
+
+    def enter(self, site: str, stage: str):
+        stack = self._stack()
+        if stack:
+            self._pause(stack[-1][0])
+        key = ((site, stage), threading.get_ident())
+        stack.append((key, time.perf_counter()))
+        self._resume(key)
+
+    def exit(self):
+        stack = self._stack()
+        key, started = stack.pop()
+        self._pause(key)
+        with self._lock:
+            self._seconds[key[0]] = self._seconds.get(key[0], 0.0) + time.perf_counter() - started
+        if stack:
+            self._resume(stack[-1][0])
+
+    # ---------- 内部方法 ----------
+
+    def _stack(self) -> List:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _resume(self, key, force: bool = False):
+        if not (self.per_stage or force):
+            return
+        with self._lock:
+            profile = self._profiles.get(key)
+            if profile is None:
+                profile = self._profiles[key] = _new_profile(self.engine)
+        _start(profile)
+
+    def _pause(self, key, force: bool = False):
+        if self.per_stage or force:
+            _stop(self._profiles[key])
+
+    def _write_profiles(self, elapsed: float):
+        grouped: Dict[Tuple[str, str], List] = {}
+        with self._lock:
+            for (stage, _), profile in self._profiles.items():
+                grouped.setdefault(stage, []).append(profile)
+            seconds = dict(self._seconds)
+        for stage, parts in _load_parts(self.parts_dir, self.engine).items():
+            grouped.setdefault(stage, []).extend(parts)
+
+        summary = [f'剖析引擎: {self.engine}' + ('' if self.per_stage else '（不分阶段）'),
+                   f'运行耗时: {elapsed:.3f}s', '',
+                   f"{'阶段':<24}{'线程累计(s)':>14}  报告"]
+        for stage in sorted(set(grouped) | set(seconds)):
+            name = _stage_name(stage)
+            files = _write_stage(self.engine, grouped[stage], os.path.join(self.output_dir, name)) \
+                if stage in grouped else []
+            total = seconds.get(stage)
+            summary.append(f"{name:<24}{(f'{total:.3f}' if total is not None else '-'):>14}  "
+                           + ('、'.join(files) or '-'))
+        summary += ['', '线程累计为各线程在该阶段内的耗时之和；在子进程中执行的阶段（如解压）记为 -']
+        _write_text(os.path.join(self.output_dir, 'summary.txt'), '\n'.join(summary) + '\n')
+
+
+class MemoryProfiler:
+    """
+    内存剖析 - 单独一轮运行，不做 CPU 剖析
+
+    tracemalloc 跟踪整个运行，后台线程每 MEMORY_POLL 秒检查已跟踪内存，
+    创新高时快照，报告取最高点的分配情况
+    """
+
+    engine = 'memory'
+
+    def __init__(self, label: str, directory: str = DEFAULT_DIR):
+        self.output_dir = _output_dir(label, directory)
+        self._snapshot = None
+        self._snapshot_size = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        tracemalloc.start()
+        self._thread = threading.Thread(target=self._poll, name='memory-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        """停止跟踪并写出 memory.txt，返回报告目录"""
+        self._stop.set()
+        self._thread.join()
+        self._maybe_snapshot(force=True)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self._write_report(peak)
+        return self.output_dir
+
+    def _poll(self):
+        while not self._stop.wait(MEMORY_POLL):
+            self._maybe_snapshot()
+
+    def _maybe_snapshot(self, force: bool = False):
+        """已跟踪内存创新高（增长超过 SNAPSHOT_GROWTH）时快照"""
+        current = tracemalloc.get_traced_memory()[0]
+        grown = current >= SNAPSHOT_MIN_BYTES and current >= self._snapshot_size * SNAPSHOT_GROWTH
+        if not grown and not (force and self._snapshot is None):
+            return
+        self._snapshot_size = current
+        self._snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        ))
+
+    def _write_report(self, peak: int):
+        lines = [f'tracemalloc 峰值: {_format_size(peak)}',
+                 f'分配快照时已跟踪内存: {_format_size(self._snapshot_size)}（运行中的最高点，每 {MEMORY_POLL:g} 秒检查）',
+                 '', f'快照中占用最多的 {TOP_ALLOCATIONS} 个分配位置：']
+        if self._snapshot is not None:
+            for stat in self._snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+                frame = stat.traceback[0]
+                lines.append(f'{_format_size(stat.size):>10}  {stat.count:>8} 块  '
+                             f'{frame.filename}:{frame.lineno}')
+        lines.append('')
+        lines.append('（只统计主进程；解压进程池等子进程的内存不计入）')
+        _write_text(os.path.join(self.output_dir, 'memory.txt'), '\n'.join(lines) + '\n')
+
+
+@contextmanager
+def profiled(label: str, enabled: bool = True, directory: str = DEFAULT_DIR, engine: str = 'auto',
+             log: Callable[[str], None] = print) -> Iterator[Optional[Profiler]]:
+    """
+    在剖析下运行一段代码：启用时接入 metrics 的阶段计时，结束后写出报告
+
+    engine 为 'memory' 时只做内存剖析，不接入阶段计时
+
+    Yields:
+        Profiler 或 MemoryProfiler（未启用时为 None）
+    """
+    if not enabled:
+        yield None
+        return
+
+    memory = resolve_engine(engine) == 'memory'
+    profiler = MemoryProfiler(label, directory) if memory else Profiler(label, directory, engine)
+    log(f"剖析已启用（{profiler.engine}），报告将写入 {profiler.output_dir}")
+    if not memory:
+        metrics.REGISTRY.profiler = profiler
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        metrics.REGISTRY.profiler = None
+        log(f"剖析报告已写入: {profiler.stop()}")
+
+
+def child_profile() -> Optional[Tuple[str, str]]:
+    """正在剖析时返回传给子进程的 (部分结果目录, 引擎)，否则为 None"""
+    profiler = metrics.REGISTRY.profiler
+    return (profiler.parts_dir, profiler.engine) if profiler is not None else None
+
+
+def run_profiled(profile: Optional[Tuple[str, str]], site: str, stage: str, func: Callable, *args):
+    """
+    在子进程中执行 func(*args)：profile（见 child_profile）不为空时剖析本次调用，
+    结果写入部分结果目录，由主进程的 Profiler.stop() 合并到同名阶段
+    """
+    if profile is None:
+        return func(*args)
+    parts_dir, engine = profile
+    profile = _new_profile(engine)
+    _start(profile)
+    try:
+        return func(*args)
+    finally:
+        _stop(profile)
+        path = os.path.join(parts_dir, f'{site}.{stage}-{os.getpid()}-{next(_part_counter)}')
+        if engine == 'pyinstrument':
+            profile.last_session.save(path + '.pyisession')
+        else:
+            profile.dump_stats(path + '.prof')
+
+
+# ---------- 内部函数 ----------
+
+def _output_dir(label: str, directory: str) -> str:
+    return os.path.join(directory, f"{label}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+
+
+def _new_profile(engine: str):
+    if engine == 'pyinstrument':
+        # 关闭 async 支持才能在同一线程上交替启停多个采样器
+        return SamplingProfiler(interval=SAMPLE_INTERVAL, async_mode='disabled')
+    return cProfile.Profile()
+
+
+def _start(profile):
+    if isinstance(profile, cProfile.Profile):
+        profile.enable()
+    else:
+        profile.start()
+
+
+def _stop(profile):
+    if isinstance(profile, cProfile.Profile):
+        profile.disable()
+    else:
+        profile.stop()
+
+
+def _load_parts(parts_dir: str, engine: str) -> Dict[Tuple[str, str], List]:
+    """读取子进程写入的部分剖析结果"""
+    parts: Dict[Tuple[str, str], List] = {}
+    if not os.path.isdir(parts_dir):
+        return parts
+    for name in os.listdir(parts_dir):
+        stem, ext = os.path.splitext(name)
+        if ext != ('.pyisession' if engine == 'pyinstrument' else '.prof'):
+            continue
+        site, _, stage = stem.rsplit('-', 2)[0].partition('.')
+        path = os.path.join(parts_dir, name)
+        parts.setdefault((site, stage), []).append(Session.load(path) if ext == '.pyisession' else path)
+    return parts
+
+
+def _write_stage(engine: str, parts: List, base_path: str) -> List[str]:
+    """合并一个阶段的剖析结果并写出报告，返回写出的文件名"""
+    if engine == 'pyinstrument':
+        sessions = [part if isinstance(part, Session) else part.last_session for part in parts]
+        sessions = [session for session in sessions if session is not None]
+        if not sessions:
+            return []
+        session = sessions[0]
+        for other in sessions[1:]:
+            session = Session.combine(session, other)
+        _write_text(base_path + '.html', HTMLRenderer().render(session))
+        _write_text(base_path + '.speedscope.json', SpeedscopeRenderer().render(session))
+        _write_text(base_path + '.txt', ConsoleRenderer(unicode=True, color=False).render(session))
+        return [os.path.basename(base_path) + ext for ext in ('.html', '.speedscope.json', '.txt')]
+
+    stats = None
+    for part in parts:
+        try:
+            if stats is None:
+                stats = pstats.Stats(part)
+            else:
+                stats.add(part)
+        except TypeError:  # 从未记录到调用的剖析器
+            continue
+    if stats is None:
+        return []
+    stats.dump_stats(base_path + '.prof')
+    text = io.StringIO()
+    stats.stream = text
+    stats.sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+    _write_text(base_path + '.txt', text.getvalue())
+    return [os.path.basename(base_path) + ext for ext in ('.prof', '.txt')]
+
+
+def _stage_name(stage: Tuple[str, str]) -> str:
+    site, name = stage
+    return f'{site}.{name}' if site else name
+
+
+def _format_size(size: int) -> str:
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f'{size:.1f}{unit}' if unit != 'B' else f'{size}B'
+        size /= 1024
+    return f'{size:.1f}GB'
+
+
+def _write_text(path: str, text: str):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
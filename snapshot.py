@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+页面快照归档
+把抓取到的详情页原文以 WARC 风格的记录追加到压缩分段文件中（每条记录单独压缩，
+可按偏移量随机读取），并在 SQLite 索引中记录每条记录的分段与偏移；
+解析规则修改后据此多进程批量重新解析，无需重新爬取
+"""
+
+import gzip
+import os
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+
+DEFAULT_DIR = './snapshots'
+INDEX_NAME = 'index.db'
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+CHUNK_RECORDS = 256  # 每个解析任务处理的记录数
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    site        TEXT NOT NULL,
+    url         TEXT NOT NULL,
+    name        TEXT,
+    segment     TEXT NOT NULL,
+    offset      INTEGER NOT NULL,
+    length      INTEGER NOT NULL,
+    fetched_at  TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_records_site_url ON records (site, url);
+"""
+
+
+class SnapshotWriter:
+    """快照写入器 - 单一职责：追加记录并维护偏移索引（线程安全）"""
+
+    def __init__(self, site: str, directory: str = DEFAULT_DIR,
+                 segment_max_bytes: int = SEGMENT_MAX_BYTES):
+        self.site = site
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self._suffix = '.warc.zst' if ZSTD_AVAILABLE else '.warc.gz'
+        self._lock = threading.Lock()
+        self._segment: Optional[str] = None
+        self._file = None
+        os.makedirs(directory, exist_ok=True)
+        self._conn = _connect(directory)
+
+    def append(self, url: str, body: bytes, name: str = None,
+               content_type: str = 'text/html; charset=utf-8', truncated: bool = False):
+        """追加一条页面记录（truncated 表示只保存了读到正文结束为止的前缀）"""
+        fetched_at = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        data = _compress(self._suffix, _warc_record(url, body, name, content_type, fetched_at,
+                                                    truncated))
+
+        with self._lock:
+            if self._file is None or self._file.tell() + len(data) > self.segment_max_bytes:
+                self._rotate()
+            offset = self._file.tell()
+            self._file.write(data)
+            self._file.flush()
+            with self._conn:
+                self._conn.execute(
+                    """
+                    INSERT INTO records (site, url, name, segment, offset, length, fetched_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (self.site, url, name, self._segment, offset, len(data), fetched_at)
+                )
+
+    def close(self):
+        """关闭当前分段与索引"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._conn.close()
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        self._segment = f'{self.site}-{stamp}-{uuid.uuid4().hex[:8]}{self._suffix}'
+        self._file = open(os.path.join(self.directory, self._segment), 'ab')
+
+
+def latest_records(site: str, directory: str = DEFAULT_DIR) -> List[Dict]:
+    """每个 URL 最新的一条记录，按首次抓取顺序排列"""
+    if not os.path.exists(os.path.join(directory, INDEX_NAME)):
+        return []
+    conn = _connect(directory)
+    try:
+        rows = conn.execute(
+            """
+            SELECT r.* FROM records r
+            JOIN (SELECT MIN(id) AS first, MAX(id) AS last
+                  FROM records WHERE site = ? GROUP BY url) f ON r.id = f.last
+            ORDER BY f.first
+            """,
+            (site,)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+
+def read_record(directory: str, segment: str, offset: int, length: int) -> Tuple[Dict[str, str], bytes]:
+    """按偏移读取单条记录，返回 (WARC 头, 页面原文)"""
+    with open(os.path.join(directory, segment), 'rb') as f:
+        f.seek(offset)
+        data = f.read(length)
+    return _parse_record(_decompress(segment, data))
+
+
+def reparse(site: str, parse: Callable[[str], object], directory: str = DEFAULT_DIR,
+            workers: int = None, initializer: Callable = None,
+            initargs: tuple = ()) -> List[Tuple[Dict, object]]:
+    """
+    用 parse 重新解析站点的所有快照（每个 URL 取最新一条），多进程并行
+
+    Args:
+        site: 站点标识
+        parse: 解析函数，输入页面文本（须为模块级函数，以便传给子进程）
+        directory: 快照目录
+        workers: 进程数（<= 1 时在当前进程解析）
+        initializer: 子进程的初始化函数，用于恢复 parse 依赖的进程级设置（如解析后端）；
+            spawn 启动的子进程不继承主进程运行时的修改
+        initargs: initializer 的参数
+
+    Returns:
+        [(索引记录, 解析结果)]，顺序与首次抓取顺序一致
+    """
+    rows = latest_records(site, directory)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    # 同一分段的记录按偏移顺序分块，每块在一个进程中顺序读取
+    chunks = []
+    by_segment: Dict[str, List[int]] = {}
+    for i, row in enumerate(rows):
+        by_segment.setdefault(row['segment'], []).append(i)
+    for segment, indexes in by_segment.items():
+        indexes.sort(key=lambda i: rows[i]['offset'])
+        for start in range(0, len(indexes), CHUNK_RECORDS):
+            part = indexes[start:start + CHUNK_RECORDS]
+            chunks.append((part, segment, [(rows[i]['offset'], rows[i]['length']) for i in part]))
+
+    results: List[object] = [None] * len(rows)
+    if workers <= 1 or len(chunks) <= 1:
+        outputs = [_parse_chunk(directory, segment, spans, parse) for _, segment, spans in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), initializer=initializer,
+                                 initargs=initargs) as pool:
+            outputs = list(pool.map(
+                _parse_chunk,
+                [directory] * len(chunks),
+                [segment for _, segment, _ in chunks],
+                [spans for _, _, spans in chunks],
+                [parse] * len(chunks),
+            ))
+
+    for (indexes, _, _), output in zip(chunks, outputs):
+        for i, value in zip(indexes, output):
+            results[i] = value
+    return list(zip(rows, results))
+
+
+# ---------- 内部函数 ----------
+
+def _connect(directory: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(os.path.join(directory, INDEX_NAME), check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    with conn:
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(_SCHEMA)
+    return conn
+
+
+def _parse_chunk(directory: str, segment: str, spans: List[Tuple[int, int]],
+                 parse: Callable[[str], object]) -> List[object]:
+    """在子进程中顺序读取一个分段中的若干记录并解析"""
+    results = []
+    with open(os.path.join(directory, segment), 'rb') as f:
+        for offset, length in spans:
+            f.seek(offset)
+            _, body = _parse_record(_decompress(segment, f.read(length)))
+            results.append(parse(body.decode('utf-8', errors='replace')))
+    return results
+
+
+def _warc_record(url: str, body: bytes, name: Optional[str], content_type: str,
+                 fetched_at: str, truncated: bool = False) -> bytes:
+    headers = [
+        'WARC/1.1',
+        'WARC-Type: resource',
+        f'WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>',
+        f'WARC-Date: {fetched_at}',
+        f'WARC-Target-URI: {url}',
+        f'Content-Type: {content_type}',
+    ]
+    if name:
+        headers.append(f'X-Project-Name: {" ".join(name.split())}')
+    if truncated:
+        headers.append('WARC-Truncated: length')
+    headers.append(f'Content-Length: {len(body)}')
+    return ('\r\n'.join(headers) + '\r\n\r\n').encode('utf-8') + body + b'\r\n\r\n'
+
+
+def _parse_record(record: bytes) -> Tuple[Dict[str, str], bytes]:
+    head, _, rest = record.partition(b'\r\n\r\n')
+    headers = {}
+    for line in head.decode('utf-8').split('\r\n')[1:]:
+        key, _, value = line.partition(':')
+        headers[key.strip()] = value.strip()
+    length = int(headers.get('Content-Length', len(rest)))
+    return headers, rest[:length]
+
+
+def _compress(suffix: str, data: bytes) -> bytes:
+    # 每条记录是独立的 gzip 成员 / zstd 帧，拼接后仍是合法的压缩流
+    if suffix.endswith('.zst'):
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _decompress(segment: str, data: bytes) -> bytes:
+    if segment.endswith('.zst'):
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("读取 .warc.zst 快照需要 zstandard，请运行 'pip install zstandard' 安装")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
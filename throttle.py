@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自适应限流
+按主机维护 AIMD（加性增、乘性减）控制器：响应健康时逐步提高请求速率与并发数，
+遇到 429/5xx、超时或延迟突增时减半，并遵守服务器返回的 Retry-After
+"""
+
+import asyncio
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+MAX_RETRY_AFTER = 300.0  # 服务器要求的最长等待（秒），防止异常值卡死爬虫
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After（秒数或 HTTP 日期），返回需要等待的秒数"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        seconds = float(value)
+    else:
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        seconds = (when - datetime.now(timezone.utc)).total_seconds()
+    return min(max(0.0, seconds), MAX_RETRY_AFTER)
+
+
+class HostThrottle:
+    """单个主机的 AIMD 控制器 - 令牌桶速率 + 在途请求数上限（线程安全）"""
+
+    def __init__(self, host: str, rate: float, max_rate: float, min_rate: float,
+                 rate_step: float, burst: int, concurrency: int, max_concurrency: int,
+                 latency_spike: float):
+        self.host = host
+        self.rate = rate
+        self.max_rate = max(rate, max_rate)
+        self.min_rate = min(rate, min_rate)
+        self.rate_step = rate_step
+        self.limit = max(1, concurrency)
+        self.max_limit = max(self.limit, max_concurrency)
+        self.latency_spike = latency_spike
+        self.in_flight = 0
+        self.latency: Optional[float] = None  # 响应延迟的指数移动平均
+        self.decreases = 0
+
+        self._capacity = max(1, burst)
+        self._tokens = float(self._capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._healthy = 0
+        self._samples = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    # ---------- 获取名额 ----------
+
+    def acquire(self) -> float:
+        """阻塞直到拿到并发名额与令牌，返回请求开始时间"""
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+            delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return time.monotonic()
+
+    async def aacquire(self) -> float:
+        """acquire 的协程版本（不阻塞事件循环）"""
+        while True:
+            with self._cond:
+                if self.in_flight < self.limit:
+                    self.in_flight += 1
+                    delay = self._reserve()
+                    break
+            await asyncio.sleep(0.05)
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except BaseException:  # 等待期间被取消：归还名额
+                self.cancel()
+                raise
+        return time.monotonic()
+
+    def cancel(self):
+        """归还未发出请求的名额（不计入速率调整）"""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def _reserve(self) -> float:
+        """预约一个令牌（可透支，保证先到先得），返回需要等待的秒数"""
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= 1
+        delay = max(0.0, -self._tokens / self.rate)
+        return max(delay, self._blocked_until - now)
+
+    # ---------- 反馈 ----------
+
+    def release(self, started: float, status: int = None, retry_after: float = None,
+                error: bool = False):
+        """
+        归还名额并根据结果调整速率
+
+        Args:
+            started: acquire 返回的开始时间
+            status: HTTP 状态码（请求异常时为空）
+            retry_after: 服务器要求的等待秒数
+            error: 超时、连接错误等网络异常
+        """
+        now = time.monotonic()
+        latency = now - started
+        with self._cond:
+            self.in_flight -= 1
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+            overloaded = error or status == 429 or (status is not None and status >= 500)
+            spiked = (not overloaded and self._samples >= 5
+                      and latency > self.latency * self.latency_spike)
+
+            if overloaded or spiked:
+                self._decrease(now)
+            else:
+                self._healthy += 1
+                if self._healthy >= self.limit:  # 大约每轮并发请求全部健康时加一次
+                    self._healthy = 0
+                    self.rate = min(self.max_rate, self.rate + self.rate_step)
+                    self.limit = min(self.max_limit, self.limit + 1)
+
+            if not overloaded:
+                self._samples += 1
+                self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            self._cond.notify_all()
+
+    def _decrease(self, now: float):
+        # 同一批在途请求的连续失败只减一次（类似 TCP 每个 RTT 至多减半一次）
+        if now - self._last_decrease < max(1.0, self.latency or 0.0):
+            return
+        self._last_decrease = now
+        self._healthy = 0
+        self.decreases += 1
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.limit = max(1, self.limit // 2)
+
+    def retry_delay(self, attempt: int, base: float) -> float:
+        """第 attempt 次失败后的重试等待：带抖动的指数退避，且不早于 Retry-After"""
+        backoff = base * (2 ** attempt) * random.uniform(0.5, 1.0)
+        with self._cond:
+            blocked = self._blocked_until - time.monotonic()
+        return max(backoff, blocked, 0.0)
+
+
+class Throttle:
+    """按主机分组的自适应限流器 - 同一进程内所有会话、线程共享（可为单个主机单独设定预算）"""
+
+    def __init__(self, rate: float, max_rate: float = None, min_rate: float = 0.2,
+                 rate_step: float = 0.5, burst: int = 1, concurrency: int = 1,
+                 max_concurrency: int = 1, latency_spike: float = 3.0):
+        """
+        Args:
+            rate: 每个主机的初始请求速率（次/秒，<= 0 表示不限流）
+            max_rate: 速率上限
+            min_rate: 速率下限
+            rate_step: 每轮健康请求后速率的增量
+            burst: 令牌桶容量
+            concurrency: 每个主机的初始在途请求数
+            max_concurrency: 在途请求数上限
+            latency_spike: 延迟超过平均值的倍数即视为突增
+        """
+        self.enabled = rate > 0
+        self._options = dict(
+            rate=rate, max_rate=max_rate if max_rate is not None else rate,
+            min_rate=min_rate, rate_step=rate_step, burst=burst,
+            concurrency=concurrency, max_concurrency=max_concurrency,
+            latency_spike=latency_spike,
+        )
+        self._overrides: Dict[str, Dict] = {}  # 主机 -> 单独设定的参数
+        self._hosts: Dict[str, HostThrottle] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, host: str, **options):
+        """
+        为单个主机设定预算（未给出的参数沿用构造时的默认值），在该主机的首个请求之前调用
+
+        Args:
+            host: 主机名（可带端口），也可以传入该主机下的任意 URL
+            options: 与构造函数相同的参数；rate <= 0 表示该主机不限流
+        """
+        host = urlsplit(host).netloc or host
+        with self._lock:
+            merged = dict(self._options, **options)
+            if 'rate' in options and 'max_rate' not in options:
+                merged['max_rate'] = max(merged['max_rate'], merged['rate'])
+            self._overrides[host] = merged
+            self._hosts.pop(host, None)
+            self.enabled = self._options['rate'] > 0 or any(
+                override['rate'] > 0 for override in self._overrides.values())
+
+    def limited(self, url: str) -> bool:
+        """URL 所属主机是否限流"""
+        if not self.enabled:
+            return False
+        options = self._overrides.get(urlsplit(url).netloc, self._options)
+        return options['rate'] > 0
+
+    def host(self, url: str) -> HostThrottle:
+        """取得 URL 所属主机的控制器"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = HostThrottle(host, **self._overrides.get(host, self._options))
+            return self._hosts[host]
+
+    def retry_delay(self, url: str, attempt: int, base: float) -> float:
+        """重试等待秒数（不限流时仍使用指数退避）"""
+        if not self.limited(url):
+            return base * (2 ** attempt) * random.uniform(0.5, 1.0)
+        return self.host(url).retry_delay(attempt, base)
+
+
+class ThrottledAdapter(HTTPAdapter):
+    """经过 Throttle 的 requests 传输适配器：挂载到 Session 后所有请求自动限流并反馈结果"""
+
+    def __init__(self, throttle: Throttle, **kwargs):
+        self.throttle = throttle
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if not self.throttle.limited(request.url):
+            return super().send(request, **kwargs)
+
+        host = self.throttle.host(request.url)
+        started = host.acquire()
+        try:
+            response = super().send(request, **kwargs)
+        except requests.RequestException:
+            host.release(started, error=True)
+            raise
+        host.release(started, response.status_code,
+                     parse_retry_after(response.headers.get('Retry-After')))
+        return response
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+守护模式
+两个爬虫 --watch 共用的轮询循环：按固定间隔执行一轮增量检查，单轮出错只记录、不退出；
+收到 SIGTERM（如 systemd、docker stop）时等当前一轮结束后退出，Ctrl+C 立即中断
+"""
+
+import os
+import signal
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+
+DEFAULT_INTERVAL = 1800  # 两轮检查开始时间的间隔（秒）
+
+
+def run_forever(cycle: Callable[[], None], interval: float = DEFAULT_INTERVAL,
+                log: Callable[[str], None] = print,
+                error: Optional[Callable[[str], None]] = None) -> int:
+    """
+    反复执行 cycle，直到收到 SIGTERM
+
+    两轮开始时间相隔 interval 秒，一轮耗时超过间隔时下一轮立即开始
+
+    Args:
+        cycle: 一轮检查
+        interval: 间隔秒数
+        log: 输出进度信息
+        error: 输出单轮异常（在 except 块中调用，可传入 logger.exception；默认同 log）
+
+    Returns:
+        已执行的轮数
+    """
+    stop = threading.Event()
+    previous = _install_sigterm(stop, log)
+    count = 0
+    try:
+        while not stop.is_set():
+            count += 1
+            started = time.monotonic()
+            log(f"--- 第 {count} 轮检查（{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}）---")
+            try:
+                cycle()
+            except Exception as e:
+                (error or log)(f"第 {count} 轮检查出错: {e}")
+
+            remaining = interval - (time.monotonic() - started)
+            if remaining > 0 and not stop.is_set():
+                log(f"下一轮检查在 {remaining:.0f} 秒后")
+                stop.wait(remaining)
+    finally:
+        if previous is not None:
+            signal.signal(signal.SIGTERM, previous)
+    return count
+
+
+def _install_sigterm(stop: threading.Event, log: Callable[[str], None]):
+    """首个 SIGTERM 请求在本轮结束后退出，再次收到时立即中断；返回原处理函数"""
+    if threading.current_thread() is not threading.main_thread() or not hasattr(signal, 'SIGTERM'):
+        return None
+
+    pid = os.getpid()
+
+    def handler(signum, frame):
+        if os.getpid() != pid:
+            # fork 出的子进程继承了处理函数（进程池应在初始化时恢复默认处理）：按默认行为立即退出
+            signal.signal(signum, signal.SIG_DFL)
+            os.kill(os.getpid(), signum)
+            return
+        if stop.is_set():
+            raise KeyboardInterrupt
+        stop.set()
+        log("收到停止信号，本轮检查结束后退出（再次发送立即中断）")
+
+    return signal.signal(signal.SIGTERM, handler)
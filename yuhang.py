@@ -7,19 +7,44 @@
 
 import os
 import re
+import sys
 import json
+import queue
+import atexit
+import argparse
 import time
+import heapq
+import hashlib
+import functools
+import itertools
+import math
 import shutil
 import logging
+import logging.handlers
+import signal
 import zipfile
+import threading
 import webbrowser
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from pathlib import Path
+from urllib.parse import urlsplit
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, List, Dict, Optional, Set, Tuple, Iterable, Iterator
 
 import requests
+import urllib3
 from tqdm import tqdm
 
+import extraction
+import metrics
+import profiling
+import watch
+from crawl_state import CrawlState, STATUS_DONE, STATUS_FAILED, STATUS_NO_FILES
+from http_cache import CacheMiss, CachingAdapter, HttpCache
+from snapshot import SnapshotWriter, reparse as reparse_snapshots
+from throttle import Throttle, ThrottledAdapter
+
 try:
     import rarfile
     RARFILE_AVAILABLE = True
@@ -27,6 +52,9 @@ except ImportError:
     RARFILE_AVAILABLE = False
     print("警告: rarfile 未安装，将跳过 RAR 文件解压。运行 'pip install rarfile' 安装。")
 
+# 下载使用 verify=False，进程启动时关闭一次证书警告即可
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
 
 # ========== 配置管理 ==========
 
@@ -50,37 +78,192 @@ CONFIG = {
     },
     'encoding': 'utf-8',
     'timeout': 30,
+    'chunk_size': 64 * 1024,  # 流式下载分块大小，决定单个下载的内存上限
+    'detail_early_stop': True,      # 详情页边下载边扫描，读到正文结束即断开（保存的页面同样省去页脚）
+    'detail_chunk_size': 8 * 1024,  # 详情页的扫描分块大小
+    'detail_tail_bytes': 16 * 1024,  # 停止后剩余内容不超过该字节数时读完，以复用连接
     'max_retries': 3,
-    'retry_delay': 2,
+    'retry_delay': 2,         # 重试退避基数（秒），实际等待带抖动且不早于 Retry-After
+    'rate_limit': 2.0,        # 每个主机的初始请求速率（<= 0 表示不限流）
+    'rate_limit_max': 10.0,   # 自适应限流的速率上限
+    'max_concurrency': 4,     # 每个主机的在途请求数上限
+    'download_workers': 4,    # 文件下载线程数（失败的下载进入延迟队列，不占用线程等待）
+    'project_workers': 2,     # 同时处理的项目数
+    'breaker_threshold': 5,   # 同一主机连续失败多少次后熔断
+    'breaker_cooldown': 60,   # 熔断后暂停该主机下载的秒数
+    'probe_sizes': False,     # 下载前用 HEAD（或 Range: bytes=0-0）探测文件大小，用于排序、大小上限与总进度
+    'probe_workers': 4,       # 探测线程数
+    'download_order': 'longest',  # 下载顺序：'longest' 大文件优先（缩短总耗时）、'shortest' 小文件优先或 'fifo'
+    'max_file_mb': 0,         # 单个文件的大小上限（MB，0 表示不限），超出的文件不下载
+    'http_cache': True,                 # 缓存列表页与详情页（与杭州爬虫共用 http_cache.db）
+    'http_cache_db': './http_cache.db',
+    'http_cache_ttl': 7 * 24 * 3600,    # 详情页缓存的新鲜期（秒），过期后用 ETag/Last-Modified 校验
+    'http_cache_list_ttl': 0,           # 列表页的新鲜期（0 表示每次都请求，只为离线回放保存）
+    'http_cache_max_mb': 200,           # 缓存容量上限，超出后淘汰最近最少使用的页面
+    'offline': False,                   # 离线回放：只从缓存读取页面，不访问网络也不下载文件
+    'snapshots': True,                  # 详情页原文追加到 snapshot_dir 的压缩归档，供 --reparse 使用
+    'snapshot_dir': './snapshots',      # 与杭州爬虫共用
+    'reparse_workers': os.cpu_count() or 1,  # --reparse 的解析进程数
+    'metrics_export': True,             # 每次运行结束写出 <metrics_dir>/yuhang.prom 与 yuhang_summary.json
+    'metrics_dir': './metrics',
+    'profile': None,                    # 'auto'、'cprofile' 或 'pyinstrument' 时按阶段剖析，'memory' 时内存剖析（--profile）
+    'profile_dir': './profiles',        # 剖析报告目录（每次运行一个子目录）
+    'watch_interval': watch.DEFAULT_INTERVAL,  # 守护模式（--watch）两轮检查的间隔（秒）
+    'parser_backend': 're',             # 链接提取：'re'、'selectolax'、'lxml' 或 'auto'（见 extraction.py）
+    'state_db': './crawl_state.db',  # 增量爬取状态库（与杭州爬虫共用）
+    'incremental': True,             # 跳过已完成且文件仍在的项目
+    'revalidate': False,             # 增量模式下仍抓取详情页，并用条件请求校验已下载文件
+    'extract_workers': os.cpu_count() or 1,  # 解压进程数（0 表示在下载线程中直接解压）
+    'dedup': True,  # 相同内容只在 <projects>/.blobs 中存一份，项目目录中为硬链接
+    'log_dir': './logs',
+    'log_json': False,   # 日志文件改为每行一个 JSON 对象（.jsonl，--log-json）
+    'log_rate': 5,       # 控制台上同一处 INFO 日志每秒最多输出的条数（0 表示不限，日志文件不受影响）
 }
 
 
 # ========== 日志配置 ==========
 
-def setup_logging():
-    """配置日志系统"""
-    log_format = '%(asctime)s - %(levelname)s - %(message)s'
+class JsonLinesFormatter(logging.Formatter):
+    """日志文件的结构化格式：每行一个 JSON 对象"""
 
-    # 创建日志目录
-    log_dir = Path('./logs')
-    log_dir.mkdir(exist_ok=True)
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+            'process': record.process,
+            'where': f'{record.funcName}:{record.lineno}',
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
 
-    # 配置日志
-    log_file = log_dir / f'yuhang_crawler_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'
 
-    logging.basicConfig(
-        level=logging.INFO,
-        format=log_format,
-        handlers=[
-            logging.FileHandler(log_file, encoding='utf-8'),
-            logging.StreamHandler()
-        ]
-    )
+class ConsoleHandler(logging.Handler):
+    """
+    控制台输出：经 tqdm.write 输出，不打断进度条；
+    同一处（文件与行号）的 INFO 日志每秒最多 rate 条，超出的只计数，下一条输出时附上省略条数
+    """
+
+    def __init__(self, rate: int = 0):
+        super().__init__()
+        self.rate = rate
+        self._windows: Dict[Tuple[str, int], List] = {}  # 位置 -> [窗口开始时间, 已输出, 已省略]
+        self.suppressed = 0
+
+    def emit(self, record: logging.LogRecord):
+        note = ''
+        if self.rate > 0 and record.levelno <= logging.INFO:
+            key = (record.pathname, record.lineno)
+            window = self._windows.get(key)
+            if window is None or record.created - window[0] >= 1.0:
+                if window and window[2]:
+                    note = f"（此前省略 {window[2]} 条同类日志）"
+                self._windows[key] = [record.created, 1, 0]
+            elif window[1] < self.rate:
+                window[1] += 1
+            else:
+                window[2] += 1
+                self.suppressed += 1
+                return
+        try:
+            tqdm.write(self.format(record) + note, file=sys.stderr)
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        if self.suppressed:
+            tqdm.write(f"控制台共省略 {self.suppressed} 条同类日志，完整内容见日志文件", file=sys.stderr)
+            self.suppressed = 0
+        super().close()
+
+
+_log_lock = threading.Lock()
+_log_listeners: List[logging.handlers.QueueListener] = []
+_log_handlers: List[logging.Handler] = []
+_worker_log_queue = None
+
+# 解压进程池的启动方式：池在下载线程已经运行时才按需启动子进程，fork 会复制其他线程持有的锁
+_SPAWN = multiprocessing.get_context('spawn')
+
+
+def setup_logging(json_lines: bool = None) -> logging.Logger:
+    """
+    配置日志系统（幂等，由入口函数调用，导入模块时不创建日志文件）
+
+    各线程只把日志记录放入队列，由后台 QueueListener 线程写文件与控制台，
+    下载与解压线程不会因写日志相互等待。根日志器已有处理器时（如被其他程序导入）不做改动。
+
+    Args:
+        json_lines: 日志文件是否为 JSON Lines（默认取 CONFIG['log_json']）
+    """
+    with _log_lock:
+        root = logging.getLogger()
+        if _log_listeners or root.handlers:
+            return logger
+        if json_lines is None:
+            json_lines = CONFIG['log_json']
+
+        log_dir = Path(CONFIG['log_dir'])
+        log_dir.mkdir(parents=True, exist_ok=True)
+        suffix = 'jsonl' if json_lines else 'log'
+        log_file = log_dir / f'yuhang_crawler_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{suffix}'
+
+        log_format = '%(asctime)s - %(levelname)s - %(message)s'
+        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+        file_handler.setFormatter(JsonLinesFormatter() if json_lines else logging.Formatter(log_format))
+        console_handler = ConsoleHandler(CONFIG['log_rate'])
+        console_handler.setFormatter(logging.Formatter(log_format))
+        _log_handlers.extend([file_handler, console_handler])
+
+        log_queue = queue.SimpleQueue()
+        root.setLevel(logging.INFO)
+        root.addHandler(logging.handlers.QueueHandler(log_queue))
+        listener = logging.handlers.QueueListener(log_queue, *_log_handlers, respect_handler_level=True)
+        listener.start()
+        _log_listeners.append(listener)
+        # 先于 logging 模块自身的退出处理执行：写完队列中剩余的日志再关闭处理器
+        atexit.register(_stop_logging)
+    return logger
+
+
+def worker_log_queue():
+    """
+    解压子进程使用的跨进程日志队列（未经 setup_logging 配置时为 None，子进程沿用默认日志设置）
+
+    首次调用时为其启动一个 QueueListener，与主进程日志写入同一文件与控制台
+    """
+    global _worker_log_queue
+    with _log_lock:
+        if _worker_log_queue is None and _log_listeners:
+            _worker_log_queue = _SPAWN.Queue()
+            listener = logging.handlers.QueueListener(_worker_log_queue, *_log_handlers,
+                                                      respect_handler_level=True)
+            listener.start()
+            _log_listeners.append(listener)
+        return _worker_log_queue
+
+
+def _init_worker_logging(log_queue):
+    """解压子进程的初始化：日志经队列交给主进程写出（子进程中没有主进程的日志处理器）"""
+    if log_queue is None:
+        return
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(logging.INFO)
 
-    return logging.getLogger(__name__)
 
+def _stop_logging():
+    with _log_lock:
+        while _log_listeners:
+            _log_listeners.pop().stop()
 
-logger = setup_logging()
+
+logger = logging.getLogger(__name__)
+
+# 各阶段耗时、字节数与重试次数（与杭州爬虫共用注册表，按站点区分）
+METRICS = metrics.for_site('yuhang')
 
 
 # ========== 工具函数 ==========
@@ -119,62 +302,380 @@ def ensure_dir(path: Path) -> Path:
 def save_metadata(project_dir: Path, metadata: Dict):
     """保存项目元信息"""
     metadata_file = project_dir / 'metadata.json'
-    with open(metadata_file, 'w', encoding='utf-8') as f:
+    with METRICS.stage('export'), open(metadata_file, 'w', encoding='utf-8') as f:
         json.dump(metadata, f, ensure_ascii=False, indent=2)
 
 
+# ========== 内容寻址存储 ==========
+
+def blob_dir() -> Optional[Path]:
+    """去重存储目录（与项目目录同一文件系统，保证可以硬链接）；未开启去重时返回 None"""
+    if not CONFIG['dedup']:
+        return None
+    return Path(CONFIG['output_dirs']['projects']) / '.blobs'
+
+
+def store_blob(src: Path, sha256: str, blobs: Path) -> Path:
+    """
+    把文件收入内容寻址存储：内容已存在时丢弃 src，否则以硬链接入库
+
+    Returns:
+        存储中的文件路径
+    """
+    blob = blobs / sha256[:2] / sha256
+    blob.parent.mkdir(parents=True, exist_ok=True)
+
+    try:
+        os.link(src, blob)
+    except FileExistsError:
+        pass  # 相同内容已入库（可能由其他进程写入）
+    except OSError:
+        # 文件系统不支持硬链接：直接移动入库
+        if not blob.exists():
+            os.replace(src, blob)
+            return blob
+
+    src.unlink(missing_ok=True)
+    return blob
+
+
+def link_file(src: Path, dst: Path):
+    """
+    让 dst 指向与 src 相同的内容：优先硬链接，其次 reflink，最后复制
+
+    先链接到临时名再原子替换，已存在的 dst 不会出现半写状态。
+    """
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(f'.{dst.name}.link')
+    tmp.unlink(missing_ok=True)
+
+    try:
+        os.link(src, tmp)
+    except OSError:
+        if not _reflink(src, tmp):
+            shutil.copy2(src, tmp)
+
+    os.replace(tmp, dst)
+
+
+def _reflink(src: Path, dst: Path) -> bool:
+    """在支持的文件系统上（btrfs、XFS 等）创建写时复制副本"""
+    try:
+        import fcntl
+    except ImportError:
+        return False
+
+    ficlone = 0x40049409  # Linux FICLONE ioctl
+    try:
+        with open(src, 'rb') as s, open(dst, 'wb') as d:
+            fcntl.ioctl(d.fileno(), ficlone, s.fileno())
+        return True
+    except OSError:
+        dst.unlink(missing_ok=True)
+        return False
+
+
+def place_file(src: Path, dst: Path, sha256: str, blobs: Optional[Path]):
+    """把已写完的临时文件放到 dst：开启去重时经由内容寻址存储链接，否则直接重命名"""
+    if blobs is None:
+        os.replace(src, dst)
+        return
+    link_file(store_blob(src, sha256, blobs), dst)
+
+
 # ========== 网络请求函数 ==========
 
+_throttle: Optional[Throttle] = None
+
+
+def throttle_options() -> Dict:
+    """CONFIG 中的限流参数"""
+    return dict(
+        rate=CONFIG['rate_limit'],
+        max_rate=CONFIG['rate_limit_max'],
+        concurrency=1,
+        max_concurrency=CONFIG['max_concurrency'],
+    )
+
+
+def get_throttle() -> Throttle:
+    """进程内共享的自适应限流器（按主机调整速率与并发）"""
+    global _throttle
+    if _throttle is None:
+        _throttle = Throttle(**throttle_options())
+    return _throttle
+
+
+def use_throttle(throttle: Throttle):
+    """改用与其他站点共用的限流器（见 engine.py），需在创建 Session 之前调用"""
+    global _throttle
+    _throttle = throttle
+
+
 def create_session() -> requests.Session:
-    """创建并配置 requests Session"""
+    """创建并配置 requests Session（所有请求经过自适应限流与页面缓存）"""
     session = requests.Session()
     session.headers.update(CONFIG['headers'])
+    adapter = ThrottledAdapter(get_throttle())
+    if CONFIG['http_cache'] or CONFIG['offline']:
+        adapter = CachingAdapter(
+            HttpCache(CONFIG['http_cache_db'], CONFIG['http_cache_max_mb'] * 1024 * 1024),
+            adapter,
+            ttl=lambda url: CONFIG['http_cache_list_ttl'] if url.startswith(CONFIG['search_url'])
+            else CONFIG['http_cache_ttl'],
+            offline=CONFIG['offline'],
+        )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
     return session
 
 
-def download_with_retry(session: requests.Session, url: str,
-                       max_retries: int = None) -> Optional[requests.Response]:
+class FileTooLarge(Exception):
+    """文件超过 CONFIG['max_file_mb']，不下载也不重试"""
+
+
+def _max_file_bytes() -> int:
+    """单个文件的大小上限（字节，0 表示不限）"""
+    return int(CONFIG['max_file_mb'] * 1024 * 1024)
+
+
+def _too_large(file_name: str, size: int = None) -> FileTooLarge:
+    actual = f"大小 {size / 1024 / 1024:.2f} MB " if size else ''
+    return FileTooLarge(f"文件{actual}超过上限 {CONFIG['max_file_mb']} MB，跳过: {file_name}")
+
+
+def probe_file(session: requests.Session, url: str, referer: str = None) -> Dict:
     """
-    带重试机制的下载函数
+    探测文件大小与校验值，不下载文件内容
 
-    Args:
-        session: requests.Session 对象
-        url: 下载 URL
-        max_retries: 最大重试次数
+    先发送 HEAD；服务器不支持 HEAD 或未返回长度时改用 Range: bytes=0-0，
+    从 Content-Range 读取总长度。探测失败不影响之后的下载。
 
     Returns:
-        Response 对象或 None（失败时）
+        {'size': 字节数或 None, 'etag': ..., 'last_modified': ...}
     """
-    if max_retries is None:
-        max_retries = CONFIG['max_retries']
+    headers = {'Accept-Encoding': 'identity'}
+    if referer:
+        headers['Referer'] = referer
+    info = {'size': None, 'etag': None, 'last_modified': None}
 
-    for attempt in range(max_retries):
+    try:
+        response = session.head(url, headers=headers, timeout=CONFIG['timeout'], verify=False,
+                                 allow_redirects=True)
+        if response.ok:
+            info.update(etag=response.headers.get('ETag'),
+                        last_modified=response.headers.get('Last-Modified'))
+            length = response.headers.get('Content-Length')
+            if length and length.isdigit() and int(length) > 0:
+                info['size'] = int(length)
+                return info
+
+        response = session.get(url, headers={**headers, 'Range': 'bytes=0-0'},
+                               timeout=CONFIG['timeout'], verify=False, allow_redirects=True,
+                               stream=True)
+        with response:
+            if response.status_code == 206:
+                _, info['size'] = _parse_content_range(response.headers.get('Content-Range'))
+            elif response.ok and response.headers.get('Content-Length', '').isdigit():
+                # 服务器忽略 Range 返回整个文件：只读响应头，不读取内容
+                info['size'] = int(response.headers['Content-Length'])
+            if response.ok:
+                info['etag'] = info['etag'] or response.headers.get('ETag')
+                info['last_modified'] = info['last_modified'] or response.headers.get('Last-Modified')
+    except requests.RequestException as e:
+        logger.debug(f"探测文件大小失败: {url[:100]}..., 错误: {_describe_error(e)}")
+    return info
+
+
+def _describe_error(e: requests.RequestException) -> str:
+    """生成包含状态码与重定向链的错误描述"""
+    error_msg = str(e)
+    if getattr(e, 'response', None) is not None:
+        error_msg = f"{e.__class__.__name__}: {e.response.status_code} - {e.response.reason}"
+        if e.response.history:
+            redirect_chain = ' -> '.join([r.url for r in e.response.history])
+            error_msg += f" (重定向链: {redirect_chain} -> {e.response.url})"
+    return error_msg
+
+
+def _part_paths(save_path: Path) -> Tuple[Path, Path]:
+    """返回断点续传使用的 (.part 数据文件, .part.json 状态文件)"""
+    part_path = save_path.with_name(save_path.name + '.part')
+    return part_path, part_path.with_name(part_path.name + '.json')
+
+
+def _load_part_state(part_path: Path, state_path: Path, url: str) -> Dict:
+    """读取断点续传状态；状态缺失、损坏或属于其他 URL 时丢弃残留的 .part"""
+    if part_path.exists() and state_path.exists():
         try:
-            requests.packages.urllib3.disable_warnings()
-            response = session.get(url, timeout=CONFIG['timeout'], verify=False, allow_redirects=True)
+            state = json.loads(state_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            state = {}
+        if state.get('url') == url:
+            return state
+
+    part_path.unlink(missing_ok=True)
+    state_path.unlink(missing_ok=True)
+    return {}
+
+
+def _parse_content_range(value: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """解析 'bytes start-end/total'，返回 (start, total)"""
+    match = re.match(r'bytes\s+(\d+)-\d+/(\d+|\*)', value or '')
+    if not match:
+        return None, None
+    total = match.group(2)
+    return int(match.group(1)), (int(total) if total != '*' else None)
+
+
+def _hash_file(path: Path) -> 'hashlib._Hash':
+    """对已有文件内容计算 SHA-256（用于续传前补齐已下载部分的摘要）"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CONFIG['chunk_size']), b''):
+            digest.update(chunk)
+    return digest
+
+
+def _download_to_part(session: requests.Session, url: str, save_path: Path,
+                      extra_headers: Dict[str, str] = None, referer: str = None,
+                      probe: Dict = None, on_chunk: Callable[[int], None] = None) -> Dict:
+    """
+    执行一次（可续传的）下载尝试，边下载边计算 SHA-256
 
-            # 记录重定向信息
-            if response.history:
-                logger.debug(f"发生重定向: {url} -> {response.url}")
+    - 已有 .part 时发送 Range + If-Range，服务器返回 206 则追加写入
+    - 服务器忽略 Range（返回 200）、文件已变更或断点超出文件范围（416）时从头下载
+    - 以 ETag / Content-Length 校验续传的是同一个文件（响应缺少时沿用 probe 的探测结果）
+    - 条件请求命中 304 时保留现有文件
+    - 超过 CONFIG['max_file_mb'] 时抛出 FileTooLarge 并删除已下载部分
+    - on_chunk 在每写入一块后以字节数回调（用于总进度）
 
-            response.raise_for_status()
-            return response
-        except requests.RequestException as e:
-            # 记录更详细的错误信息
-            error_msg = str(e)
-            if hasattr(e, 'response') and e.response is not None:
-                error_msg = f"{e.__class__.__name__}: {e.response.status_code} - {e.response.reason}"
-                if e.response.history:
-                    redirect_chain = ' -> '.join([r.url for r in e.response.history])
-                    error_msg += f" (重定向链: {redirect_chain} -> {e.response.url})"
-
-            logger.warning(f"下载失败 (尝试 {attempt + 1}/{max_retries}): {url[:100]}..., 错误: {error_msg}")
-
-            if attempt < max_retries - 1:
-                time.sleep(CONFIG['retry_delay'] ** attempt)  # 指数退避
-            else:
-                logger.error(f"下载彻底失败: {url[:100]}...")
-                return None
+    Returns:
+        文件信息字典 (status, size, sha256, etag, last_modified)
+    """
+    part_path, state_path = _part_paths(save_path)
+    save_path.parent.mkdir(parents=True, exist_ok=True)
+    max_bytes = _max_file_bytes()
+
+    state = _load_part_state(part_path, state_path, url)
+    offset = part_path.stat().st_size if state else 0
+
+    # 禁用传输压缩，保证字节偏移与 Content-Length 对应磁盘上的文件
+    headers = {'Accept-Encoding': 'identity'}
+    if referer:
+        headers['Referer'] = referer
+    if offset:
+        headers['Range'] = f'bytes={offset}-'
+        validator = state.get('etag') or state.get('last_modified')
+        if validator:
+            headers['If-Range'] = validator
+    elif extra_headers:
+        headers.update(extra_headers)
+
+    response = session.get(url, headers=headers, timeout=CONFIG['timeout'], verify=False,
+                           allow_redirects=True, stream=True)
+    with response:
+        if response.status_code == 304:
+            # 增量模式：服务器确认文件未变更
+            return {
+                'status': 'not_modified',
+                'size': save_path.stat().st_size,
+                'sha256': None,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+            }
+
+        if response.status_code == 416 and offset and offset == state.get('length'):
+            # 上次已完整下载，只差最后的重命名
+            logger.info(f"断点文件已完整: {save_path.name}")
+            digest = _hash_file(part_path)
+            place_file(part_path, save_path, digest.hexdigest(), blob_dir())
+            state_path.unlink(missing_ok=True)
+            return _file_info(state, offset, digest)
+
+        if response.status_code == 416 and offset:
+            # 断点与服务器上的文件对不上（长度未知、文件已变更或 .part 过长），
+            # 原样重试只会再次得到 416：丢弃断点后从头下载
+            logger.warning(f"断点超出文件范围，重新下载: {save_path.name}")
+            part_path.unlink(missing_ok=True)
+            state_path.unlink(missing_ok=True)
+            return _download_to_part(session, url, save_path, referer=referer, probe=probe,
+                                     on_chunk=on_chunk)
+
+        response.raise_for_status()
+
+        if offset and response.status_code == 206:
+            start, total = _parse_content_range(response.headers.get('Content-Range'))
+            etag = response.headers.get('ETag')
+            if (start != offset
+                    or (state.get('length') and total != state['length'])
+                    or (state.get('etag') and etag and etag != state['etag'])):
+                # 不是同一个文件或偏移不一致，丢弃断点后从头下载
+                logger.warning(f"断点校验失败，重新下载: {save_path.name}")
+                part_path.unlink(missing_ok=True)
+                state_path.unlink(missing_ok=True)
+                return _download_to_part(session, url, save_path, referer=referer, probe=probe,
+                                         on_chunk=on_chunk)
+            mode = 'ab'
+            digest = _hash_file(part_path)
+            logger.info(f"断点续传: {save_path.name} 从 {offset} 字节继续")
+        else:
+            # 首次下载，或服务器不支持 Range / 文件已变更：完整重新获取
+            offset = 0
+            mode = 'wb'
+            digest = hashlib.sha256()
+            probe = probe or {}
+            state = {
+                'url': url,
+                'etag': response.headers.get('ETag') or probe.get('etag'),
+                'last_modified': response.headers.get('Last-Modified') or probe.get('last_modified'),
+                'length': int(response.headers.get('Content-Length', 0)) or probe.get('size'),
+            }
+            if max_bytes and state['length'] and state['length'] > max_bytes:
+                raise _too_large(save_path.name, state['length'])
+            state_path.write_text(json.dumps(state), encoding='utf-8')
+
+        too_large = False
+        with open(part_path, mode) as f, tqdm(
+            total=state.get('length'), initial=offset, desc=save_path.name,
+            unit='B', unit_scale=True, unit_divisor=1024, leave=False
+        ) as bar:
+            for chunk in response.iter_content(chunk_size=CONFIG['chunk_size']):
+                f.write(chunk)
+                digest.update(chunk)
+                bar.update(len(chunk))
+                METRICS.add_bytes('download', len(chunk))
+                if on_chunk:
+                    on_chunk(len(chunk))
+                if max_bytes and bar.n > max_bytes:
+                    too_large = True  # 未声明长度的响应超过上限
+                    break
+
+    if too_large:
+        part_path.unlink(missing_ok=True)
+        state_path.unlink(missing_ok=True)
+        raise _too_large(save_path.name)
+
+    size = part_path.stat().st_size
+    if state.get('length') and size != state['length']:
+        # 保留 .part，下次尝试从当前位置续传
+        raise requests.RequestException(f"下载不完整: {size}/{state['length']} 字节", response=None)
+
+    # 经由内容寻址存储放到目标位置（相同内容只保留一份）
+    place_file(part_path, save_path, digest.hexdigest(), blob_dir())
+    state_path.unlink(missing_ok=True)
+    return _file_info(state, size, digest)
+
+
+def _file_info(state: Dict, size: int, digest: 'hashlib._Hash') -> Dict:
+    """组装下载完成后的文件信息"""
+    return {
+        'status': 'downloaded',
+        'size': size,
+        'sha256': digest.hexdigest(),
+        'etag': state.get('etag'),
+        'last_modified': state.get('last_modified'),
+    }
 
 
 # ========== 数据解析函数 ==========
@@ -203,13 +704,16 @@ def fetch_page_data(session: requests.Session, page: int) -> Optional[str]:
         f"&sortfield=,compaltedate:0"
     )
 
-    try:
-        response = session.post(post_url, data=data, timeout=CONFIG['timeout'])
-        response.raise_for_status()
-        return response.content.decode('utf-8')
-    except Exception as e:
-        logger.error(f"获取第 {page} 页数据失败: {e}")
-        return None
+    with METRICS.stage('listing') as span:
+        try:
+            response = session.post(post_url, data=data, timeout=CONFIG['timeout'])
+            response.raise_for_status()
+            METRICS.add_bytes('listing', len(response.content))
+            return response.content.decode('utf-8')
+        except Exception as e:
+            logger.error(f"获取第 {page} 页数据失败: {e}")
+            span.fail()
+            return None
 
 
 def parse_project_list(html_content: str) -> List[Tuple[str, str]]:
@@ -222,188 +726,685 @@ def parse_project_list(html_content: str) -> List[Tuple[str, str]]:
     Returns:
         [(项目名称, 项目 URL)] 列表
     """
-    pattern = r'<a title=\"([\d\D]*?)\" target=\"([\d\D]*?)\" href=\"([\d\D]*?)\">'
-    matches = re.finditer(pattern, html_content, re.MULTILINE)
+    return [(name, url) for name, url, _ in parse_project_rows(html_content)]
+
+
+def parse_project_rows(html_content: str) -> List[Tuple[str, str, Optional[str]]]:
+    """
+    解析 HTML 内容，提取项目名称、URL 及所在行的发布日期
 
-    projects = []
-    for match in matches:
-        project_name = match.group(1).strip()
-        project_url = match.group(3).strip()
-        projects.append((project_name, project_url))
+    Args:
+        html_content: HTML 内容
 
-    return projects
+    Returns:
+        [(项目名称, 项目 URL, 发布日期 YYYY-MM-DD 或 None)] 列表
+    """
+    return extraction.yuhang_project_rows(html_content)
 
 
-def fetch_project_list(session: requests.Session, pages: List[int]) -> List[Tuple[str, str]]:
+def iter_project_list(session: requests.Session, pages: Iterable[int]) -> Iterator[Tuple[str, str]]:
     """
-    获取多个页面的项目列表
+    逐页获取并产出项目：每解析完一页立即交给调用方，第一个项目无需等待整个列表
 
     Args:
         session: requests.Session 对象
-        pages: 页码列表
+        pages: 页码序列
 
-    Returns:
-        [(项目名称, 项目 URL)] 列表
+    Yields:
+        (项目名称, 项目 URL)
     """
-    all_projects = []
-
-    for page in tqdm(pages, desc="获取项目列表"):
+    for page in pages:
         logger.info(f"正在获取第 {page} 页...")
         html_content = fetch_page_data(session, page)
 
         if html_content:
-            projects = parse_project_list(html_content)
-            all_projects.extend(projects)
+            with METRICS.stage('parse'):
+                projects = parse_project_list(html_content)
             logger.info(f"第 {page} 页找到 {len(projects)} 个项目")
+            yield from projects
         else:
             logger.warning(f"第 {page} 页获取失败")
 
-    return all_projects
+
+class ProjectListing:
+    """
+    按页产出列表项目，支持高水位提前停止与不设结束页的翻页
+
+    列表按发布日期倒序（compaltedate:0）。开启 stop_at_known 时，一旦某页
+    全部为已知项目，处理完该页后即停止翻页；end_page 为 None 时一直翻到站点没有更多页面为止。
+    已知项目以状态库为准：已完成或无文件的项目为已知，失败的项目不算；
+    状态库中没有记录的项目等于上次的最新项目或早于其发布日期时视为已知（高水位只用于判断停止翻页）。
+    提前停止翻页后，状态库中此前失败、本次未翻到的项目直接重新产出，不必翻到它们所在的页。
+    """
+
+    WATERMARK_KEY = 'yuhang.watermark'
+
+    def __init__(self, session: requests.Session, state: Optional[CrawlState],
+                 start_page: int = 1, end_page: Optional[int] = None, stop_at_known: bool = False,
+                 known: Optional[Set[str]] = None):
+        self.session = session
+        self.state = state
+        self.known = known if known is not None else set()  # 已确认完成的项目 URL（守护模式下跨轮共享）
+        self.start_page = start_page
+        self.end_page = end_page
+        self.stop_at_known = stop_at_known and state is not None
+        self.watermark = self._load_watermark()
+        self.newest: Optional[Dict] = None
+        self.pages_fetched = 0
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        pages = itertools.count(self.start_page) if self.end_page is None \
+            else range(self.start_page, self.end_page + 1)
+        previous_urls = None
+        seen: Set[str] = set()
+
+        for page in pages:
+            logger.info(f"正在获取第 {page} 页...")
+            html_content = fetch_page_data(self.session, page)
+            self.pages_fetched += 1
+
+            if not html_content:
+                logger.warning(f"第 {page} 页获取失败")
+                if self.end_page is None:
+                    break
+                continue
+
+            rows = parse_project_rows(html_content)
+            urls = [url for _, url, _ in rows]
+            if not rows or urls == previous_urls:
+                # 超出最后一页时站点返回空页或重复最后一页
+                logger.info(f"第 {page} 页没有新项目，列表已到末尾")
+                break
+            previous_urls = urls
+
+            if page == self.start_page and self.newest is None:
+                name, url, posted = rows[0]
+                self.newest = {'url': url, 'name': name, 'date': posted}
+
+            # 须在产出前判断：产出后项目随即被处理并写入状态库
+            all_known = self.stop_at_known and all(self._is_known(url, posted) for _, url, posted in rows)
+
+            logger.info(f"第 {page} 页找到 {len(rows)} 个项目")
+            seen.update(urls)
+            yield from ((name, url) for name, url, _ in rows)
+
+            if all_known:
+                logger.info(f"第 {page} 页均为已知项目，停止翻页")
+                yield from self._failed_projects(seen)
+                break
+
+    def _failed_projects(self, seen: Set[str]) -> Iterator[Tuple[str, str]]:
+        """此前失败、本次未翻到的项目（名称取自状态库）"""
+        failed = [project for project in self.state.projects_with_status('yuhang', STATUS_FAILED)
+                  if project['url'] not in seen and project['name']]
+        if failed:
+            logger.info(f"重试 {len(failed)} 个此前失败的项目")
+        for project in failed:
+            yield project['name'], project['url']
+
+    def commit(self):
+        """本次列表完整处理后保存新的高水位（仅从第 1 页开始时才代表站点最新项目）"""
+        if self.state is None or self.newest is None or self.start_page != 1:
+            return
+        self.state.set_value(self.WATERMARK_KEY, json.dumps(self.newest, ensure_ascii=False))
+
+    def _load_watermark(self) -> Dict:
+        if self.state is None:
+            return {}
+        value = self.state.get_value(self.WATERMARK_KEY)
+        try:
+            return json.loads(value) if value else {}
+        except ValueError:
+            return {}
+
+    def _is_known(self, url: str, posted: Optional[str]) -> bool:
+        if url in self.known:
+            return True
+        project = self.state.get_project(url)
+        if project:
+            if project['status'] in (STATUS_DONE, STATUS_NO_FILES):
+                self.known.add(url)
+                return True
+            return False
+        if url == self.watermark.get('url'):
+            return True
+        return bool(posted and self.watermark.get('date') and posted < self.watermark['date'])
 
 
 # ========== 文件下载函数 ==========
 
-def extract_file_urls(session: requests.Session, project_url: str) -> List[Tuple[str, str]]:
+def extract_file_urls(session: requests.Session, project_url: str,
+                      snapshots: SnapshotWriter = None, project_name: str = None
+                      ) -> Optional[List[Tuple[str, str]]]:
     """
     从项目页面提取文件下载链接
 
+    详情页流式读取，读到正文结束标记后即关闭连接，不再下载页脚等无关内容；
+    写入页面缓存与快照归档的同样是读到正文结束为止的前缀，--reparse 与离线回放仍能看到完整正文
+
     Args:
         session: requests.Session 对象
         project_url: 项目页面 URL
+        snapshots: 详情页原文归档（为空时不归档）
+        project_name: 项目名称（写入归档记录）
 
     Returns:
-        [(文件 URL, 文件后缀)] 列表
+        [(文件 URL, 文件后缀)] 列表；页面获取失败时为 None（区别于页面中没有文件）
     """
-    try:
-        response = session.get(project_url, timeout=CONFIG['timeout'])
-        response.raise_for_status()
-        html_content = response.content.decode('utf-8')
-    except Exception as e:
-        logger.error(f"获取项目页面失败: {project_url}, 错误: {e}")
-        return []
-
-    # 修复：匹配完整的下载链接（包含文件扩展名）
-    pattern = r'<a href=\"(\/module\/download[^\"]*?\.(zip|rar|pdf))\"'
-    matches = re.finditer(pattern, html_content, re.MULTILINE | re.IGNORECASE)
+    adapter = session.get_adapter(project_url)
+    caching = isinstance(adapter, CachingAdapter)
+    with METRICS.stage('detail') as span:
+        try:
+            response = session.get(project_url, timeout=CONFIG['timeout'], stream=True)
+            try:
+                response.raise_for_status()
+                # 来自页面缓存的响应此前已保存、归档过
+                persist = response.headers.get('X-Cache') is None and (caching or snapshots is not None)
+                stop = ()
+                if CONFIG['detail_early_stop']:
+                    stop = extraction.PERSIST_DETAIL_STOP if persist else extraction.YUHANG_DETAIL_STOP
+                body, truncated = extraction.read_until(
+                    response.iter_content(CONFIG['detail_chunk_size']), stop,
+                    CONFIG['detail_tail_bytes'], extraction.body_length(response.headers)
+                )
+            finally:
+                response.close()
+        except Exception as e:
+            logger.error(f"获取项目页面失败: {project_url}, 错误: {e}")
+            span.fail()
+            return None
+        METRICS.add_bytes('detail', len(body))
 
-    file_urls = []
-    for match in matches:
-        file_path = match.group(1)  # 完整路径（已包含扩展名）
-        file_suffix = match.group(2).lower()  # 文件后缀
-        file_url = f"{CONFIG['base_url']}{file_path}"
-        file_urls.append((file_url, file_suffix))
+    if persist:
+        # 读到正文结束即停止时保存的是省去页脚的前缀，快照中标记为截断
+        if caching:
+            adapter.store(response, body)
+        if snapshots is not None:
+            snapshots.append(project_url, body, project_name, truncated=truncated)
 
-    return file_urls
+    with METRICS.stage('parse'):
+        html_content = extraction.decode_page(body, response.headers.get('Content-Type'))
+        return parse_file_urls(html_content, CONFIG['base_url'])
 
 
-def download_file(session: requests.Session, url: str, save_path: Path, referer: str = None) -> bool:
+def parse_file_urls(html_content: str, base_url: str) -> List[Tuple[str, str]]:
     """
-    下载单个文件
+    解析项目页面中的文件下载链接
 
     Args:
-        session: requests.Session 对象
-        url: 文件 URL
-        save_path: 保存路径
-        referer: 引用页面URL（用于设置Referer头）
+        html_content: 项目页面 HTML
+        base_url: 站点根地址（显式传入，供 --reparse 的子进程使用）
 
     Returns:
-        是否下载成功
+        [(文件 URL, 文件后缀)] 列表
     """
-    # 为下载设置临时headers
-    original_referer = session.headers.get('Referer')
-    if referer:
-        session.headers['Referer'] = referer
+    return [(f"{base_url}{file_path}", file_suffix)
+            for file_path, file_suffix in extraction.yuhang_file_links(html_content)]
 
-    try:
-        response = download_with_retry(session, url)
 
-        if response:
-            try:
-                save_path.parent.mkdir(parents=True, exist_ok=True)
-                with open(save_path, 'wb') as f:
-                    f.write(response.content)
-                logger.info(f"下载成功: {save_path.name}")
-                return True
-            except Exception as e:
-                logger.error(f"保存文件失败: {save_path}, 错误: {e}")
-                return False
+class DownloadStage:
+    """
+    下载阶段：线程池 + 延迟重试队列 + 按文件大小排序
+
+    失败的下载按带抖动的到期时间重新入队，工作线程在等待期间继续下载其他文件；
+    同一主机连续失败达到阈值时熔断，在冷却时间内暂停该主机的所有下载。
+    启用 CONFIG['probe_sizes'] 时先探测文件大小：到期的任务按 CONFIG['download_order']
+    取出（大文件优先可避免末尾的大文件拖长总耗时），超过大小上限的文件直接跳过，
+    总进度条据此估算剩余时间。
+    每个任务的 Future 结果为 {'info': 文件信息或 None, 'attempts': 尝试次数, 'error': 最后的错误}。
+    """
+
+    def __init__(self, session: requests.Session, workers: int = None):
+        if workers is None:
+            workers = CONFIG['download_workers']
+        self._session = session
+        self._cond = threading.Condition()
+        self._delayed: List[Tuple[float, int, Dict]] = []  # (到期时间, 序号, 任务) 小顶堆
+        self._ready: List[Tuple[float, int, Dict]] = []    # (排序键, 序号, 任务) 小顶堆
+        self._seq = itertools.count()
+        self._breakers: Dict[str, Dict] = {}
+        self._closed = False
+        self._bar: Optional[tqdm] = None
+        self._bar_lock = threading.Lock()
+        self._prober = ThreadPoolExecutor(max_workers=max(1, CONFIG['probe_workers']),
+                                          thread_name_prefix='probe') \
+            if CONFIG['probe_sizes'] else None
+        self._threads = [
+            threading.Thread(target=self._run, name=f'download-{i}', daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, url: str, save_path: Path, referer: str = None,
+               headers: Dict[str, str] = None) -> Future:
+        """提交一个下载任务（条件请求的任务多半返回 304，不做探测）"""
+        job = {
+            'url': url, 'save_path': save_path, 'referer': referer, 'headers': headers,
+            'host': urlsplit(url).netloc, 'attempts': 0, 'error': None, 'future': Future(),
+            'probe': None, 'size': None, 'counted': 0, 'transferred': 0,
+        }
+        if self._prober is not None and not headers:
+            self._prober.submit(self._probe, job)
         else:
-            return False
-    finally:
-        # 恢复原始Referer
-        if original_referer:
-            session.headers['Referer'] = original_referer
-        elif 'Referer' in session.headers:
-            del session.headers['Referer']
+            self._schedule(job, time.monotonic())
+        return job['future']
+
+    def close(self):
+        """等待队列中的任务（包括待探测、待重试的任务）全部完成并停止工作线程"""
+        if self._prober is not None:
+            self._prober.shutdown(wait=True)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        if self._bar is not None:
+            self._bar.close()
+
+    def _probe(self, job: Dict):
+        try:
+            with METRICS.stage('probe') as span:
+                job['probe'] = probe_file(self._session, job['url'], job['referer'])
+                job['size'] = job['probe']['size']
+                if job['size'] is None:
+                    span.fail()
+            max_bytes = _max_file_bytes()
+            if max_bytes and job['size'] and job['size'] > max_bytes:
+                job['error'] = str(_too_large(job['save_path'].name, job['size']))
+                logger.warning(job['error'])
+                job['future'].set_result({'info': None, 'attempts': 0, 'error': job['error']})
+                return
+            if job['size']:
+                job['counted'] = job['size']
+                self._add_total(job['size'])
+        except Exception as e:
+            logger.debug(f"探测失败，直接下载: {job['url'][:100]}..., 错误: {e}")
+        self._schedule(job, time.monotonic())
+
+    def _schedule(self, job: Dict, due: float):
+        with self._cond:
+            breaker = self._breakers.get(job['host'])
+            if breaker:
+                due = max(due, breaker['open_until'])
+            heapq.heappush(self._delayed, (due, next(self._seq), job))
+            self._cond.notify()
+
+    def _priority(self, job: Dict) -> float:
+        """排序键：大小未知的文件视为无穷大（大文件优先时先下载，小文件优先时最后下载）"""
+        size = job['size'] if job['size'] is not None else math.inf
+        order = CONFIG['download_order']
+        if order == 'longest':
+            return -size
+        if order == 'shortest':
+            return size
+        return 0.0
+
+    def _next_job(self) -> Optional[Dict]:
+        """已到期的任务按排序键取出；没有到期任务且已关闭时返回 None"""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, seq, job = heapq.heappop(self._delayed)
+                    heapq.heappush(self._ready, (self._priority(job), seq, job))
+                while self._ready:
+                    _, seq, job = heapq.heappop(self._ready)
+                    # 入队后主机才熔断的任务推迟到冷却结束
+                    open_until = self._breakers.get(job['host'], {}).get('open_until', 0.0)
+                    if open_until > now:
+                        heapq.heappush(self._delayed, (open_until, seq, job))
+                        continue
+                    return job
+                if self._delayed:
+                    timeout = self._delayed[0][0] - now
+                elif self._closed:
+                    return None
+                else:
+                    timeout = None
+                self._cond.wait(timeout)
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            self._attempt(job)
+
+    def _attempt(self, job: Dict):
+        url, save_path = job['url'], job['save_path']
+        job['attempts'] += 1
+        max_retries = CONFIG['max_retries']
+
+        def on_chunk(size: int):
+            job['transferred'] += size
+            self._advance(size)
+
+        try:
+            with METRICS.stage('download'):
+                info = _download_to_part(self._session, url, save_path, job['headers'],
+                                         job['referer'], job['probe'], on_chunk)
+        except CacheMiss as e:
+            logger.warning(str(e))
+            job['error'] = str(e)
+            info = None
+        except FileTooLarge as e:
+            logger.warning(str(e))
+            job['error'] = str(e)
+            info = None
+        except requests.RequestException as e:
+            job['error'] = _describe_error(e)
+            logger.warning(f"下载失败 (尝试 {job['attempts']}/{max_retries}): {url[:100]}..., 错误: {job['error']}")
+            self._record_failure(job['host'])
+
+            if job['attempts'] < max_retries:
+                METRICS.add_retry('download')
+                delay = get_throttle().retry_delay(url, job['attempts'] - 1, CONFIG['retry_delay'])
+                self._schedule(job, time.monotonic() + delay)
+                return
+            logger.error(f"下载彻底失败: {url[:100]}...")
+            info = None
+        except Exception as e:
+            logger.error(f"保存文件失败: {save_path}, 错误: {e}")
+            job['error'] = str(e)
+            info = None
+        else:
+            self._record_success(job['host'])
+            if info['status'] == 'not_modified':
+                logger.info(f"文件未变更，跳过: {save_path.name}")
+            else:
+                logger.info(f"下载成功: {save_path.name}")
+
+        # 以实际传输的字节数校正总量（探测值与实际不符、续传或失败时）
+        self._add_total(job['transferred'] - job['counted'])
+        job['counted'] = job['transferred']
+        job['future'].set_result({'info': info, 'attempts': job['attempts'], 'error': job['error']})
+
+    def _add_total(self, size: int):
+        with self._bar_lock:
+            bar = self._progress()
+            bar.total += size
+            bar.refresh()
+
+    def _advance(self, size: int):
+        with self._bar_lock:
+            bar = self._progress()
+            if bar.n + size > bar.total:  # 未探测到大小的文件边下载边计入总量
+                bar.total = bar.n + size
+            bar.update(size)
+
+    def _progress(self) -> tqdm:
+        """所有文件的总字节进度条（有下载时才创建）"""
+        if self._bar is None:
+            self._bar = tqdm(total=0, desc='下载总量', unit='B', unit_scale=True, unit_divisor=1024)
+        return self._bar
+
+    def _record_failure(self, host: str):
+        with self._cond:
+            breaker = self._breakers.setdefault(host, {'failures': 0, 'open_until': 0.0})
+            breaker['failures'] += 1
+            # 达到阈值后熔断；冷却结束后的试探请求再次失败会立即重新熔断
+            if breaker['failures'] >= CONFIG['breaker_threshold']:
+                breaker['open_until'] = time.monotonic() + CONFIG['breaker_cooldown']
+                logger.warning(f"主机 {host} 连续失败 {breaker['failures']} 次，暂停下载 {CONFIG['breaker_cooldown']} 秒")
+
+    def _record_success(self, host: str):
+        with self._cond:
+            self._breakers.pop(host, None)
 
 
 # ========== 文件解压函数 ==========
 
-def extract_archive(archive_path: Path, extract_to: Path) -> bool:
+def extract_archive(archive_path: Path, extract_to: Path, blobs: Path = None) -> Dict:
     """
     解压压缩文件（支持 ZIP 和 RAR）
 
     Args:
         archive_path: 压缩文件路径
         extract_to: 解压目标目录
+        blobs: 内容寻址存储目录（为空时不去重；在解压子进程中调用时需显式传入）
 
     Returns:
-        是否解压成功
+        解压结果 {'extracted': 是否成功, 'failed_members': [{'name', 'error'}], ...}
     """
     ensure_dir(extract_to)
 
     try:
         if zipfile.is_zipfile(archive_path):
-            # 解压 ZIP 文件
-            with zipfile.ZipFile(archive_path, 'r') as zf:
-                # 检查是否有密码保护
-                try:
-                    zf.testzip()
-                except RuntimeError as e:
-                    if 'password' in str(e).lower():
-                        logger.warning(f"ZIP 文件有密码保护，跳过: {archive_path.name}")
-                        return False
-                    raise
-
-                # 解压所有文件
-                for member in zf.namelist():
-                    try:
-                        zf.extract(member, extract_to)
-                    except Exception as e:
-                        logger.error(f"解压文件失败: {member}, 错误: {e}")
-
-                logger.info(f"ZIP 解压成功: {archive_path.name}")
-                return True
+            return _extract_zip(archive_path, extract_to, blobs)
 
         elif RARFILE_AVAILABLE and rarfile.is_rarfile(archive_path):
             # 解压 RAR 文件
             try:
                 with rarfile.RarFile(archive_path, 'r') as rf:
                     rf.extractall(extract_to)
+                    if blobs is not None:
+                        _dedup_extracted(extract_to, rf.namelist(), blobs)
                 logger.info(f"RAR 解压成功: {archive_path.name}")
-                return True
+                return {'extracted': True, 'failed_members': []}
             except rarfile.PasswordRequired:
                 logger.warning(f"RAR 文件有密码保护，跳过: {archive_path.name}")
-                return False
+                return {'extracted': False, 'error': '有密码保护', 'failed_members': []}
             except Exception as e:
                 logger.error(f"RAR 解压失败: {archive_path.name}, 错误: {e}")
-                return False
+                return {'extracted': False, 'error': str(e), 'failed_members': []}
 
         else:
-            # 不是压缩文件，直接复制
-            shutil.copy2(archive_path, extract_to / archive_path.name)
+            # 不是压缩文件，直接链接（或复制）
+            link_file(archive_path, extract_to / archive_path.name)
             logger.info(f"非压缩文件已复制: {archive_path.name}")
-            return True
+            return {'extracted': True, 'failed_members': []}
 
     except Exception as e:
         logger.error(f"处理文件失败: {archive_path.name}, 错误: {e}")
-        return False
+        return {'extracted': False, 'error': str(e), 'failed_members': []}
+
+
+def _extract_zip(archive_path: Path, extract_to: Path, blobs: Optional[Path]) -> Dict:
+    """
+    单遍解压 ZIP：由成员标志位判断加密，流式写出时由 zipfile 校验 CRC，
+    同时计算 SHA-256 以便收入内容寻址存储
+
+    不再调用 testzip()，避免为了校验把每个成员完整解压两遍。
+    """
+    with zipfile.ZipFile(archive_path, 'r') as zf:
+        members = zf.infolist()
+
+        # 标志位 bit 0 表示成员已加密
+        if any(info.flag_bits & 0x1 for info in members):
+            logger.warning(f"ZIP 文件有密码保护，跳过: {archive_path.name}")
+            return {'extracted': False, 'error': '有密码保护', 'failed_members': []}
+
+        failed = []
+        for info in members:
+            target = _safe_member_path(extract_to, info.filename)
+            if target is None:
+                continue
+            if info.is_dir():
+                target.mkdir(parents=True, exist_ok=True)
+                continue
+
+            tmp = target.with_name(f'.{target.name}.tmp')
+            try:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                digest = hashlib.sha256()
+                # 读到成员末尾时 ZipExtFile 会校验 CRC，损坏时抛出 BadZipFile
+                with zf.open(info) as src, open(tmp, 'wb') as dst:
+                    for chunk in iter(lambda: src.read(CONFIG['chunk_size']), b''):
+                        dst.write(chunk)
+                        digest.update(chunk)
+                place_file(tmp, target, digest.hexdigest(), blobs)
+            except Exception as e:
+                logger.error(f"解压文件失败: {info.filename}, 错误: {e}")
+                tmp.unlink(missing_ok=True)
+                failed.append({'name': info.filename, 'error': str(e)})
+
+    logger.info(f"ZIP 解压成功: {archive_path.name}"
+                + (f"（{len(failed)} 个成员失败）" if failed else ""))
+    return {'extracted': True, 'members': len(members), 'failed_members': failed}
+
+
+def _dedup_extracted(extract_to: Path, names: List[str], blobs: Path):
+    """把已解压出的文件收入内容寻址存储（用于无法流式解压的 RAR）"""
+    for name in names:
+        path = extract_to / name
+        if path.is_file() and not path.is_symlink():
+            tmp = path.with_name(f'.{path.name}.tmp')
+            os.replace(path, tmp)
+            place_file(tmp, path, _hash_file(tmp).hexdigest(), blobs)
+
+
+def _safe_member_path(extract_to: Path, member_name: str) -> Optional[Path]:
+    """与 ZipFile.extract 相同的规则清理成员路径，防止写出目标目录之外"""
+    name = member_name.replace('\\', '/')
+    parts = [p for p in name.split('/') if p not in ('', '.', '..')]
+    if parts and re.match(r'^[A-Za-z]:$', parts[0]):
+        parts = parts[1:]  # 去掉 Windows 盘符
+    parts = [sanitize_filename(p) or '_' for p in parts]
+    return extract_to.joinpath(*parts) if parts else None
+
+
+def _timed_extract(archive_path: Path, extract_to: Path, blobs: Optional[Path],
+                   profile: Optional[Tuple[str, str]] = None) -> Tuple[Dict, float]:
+    """在解压进程中执行 extract_archive 并返回 (结果, 耗时)；profile 见 profiling.child_profile"""
+    started = time.perf_counter()
+    result = profiling.run_profiled(profile, 'yuhang', 'extract',
+                                    extract_archive, archive_path, extract_to, blobs)
+    return result, time.perf_counter() - started
+
+
+def _init_extract_worker(log_queue):
+    """
+    解压子进程的初始化
+
+    终端的 Ctrl+C 会发给整个前台进程组：子进程忽略 SIGINT，由主进程等已提交的解压完成后关闭进程池；
+    SIGTERM 恢复默认处理（立即退出），不沿用主进程守护模式"本轮结束后退出"的处理函数，
+    进程池损坏、主进程无法正常关闭它们时，子进程仍可被终止
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    _init_worker_logging(log_queue)
+
+
+class ExtractionStage:
+    """
+    解压阶段：用进程池并行解压已下载的压缩包
+
+    下载线程只负责提交任务，CPU 密集的解压在独立进程中进行，
+    因此下一个文件的下载与当前压缩包的解压相互重叠。
+    项目的 metadata.json 在其所有压缩包解压完成后写入。
+    """
+
+    def __init__(self, workers: int = None):
+        if workers is None:
+            workers = CONFIG['extract_workers']
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=_SPAWN,
+            initializer=_init_extract_worker, initargs=(worker_log_queue(),)
+        ) if workers > 0 else None
+        self._lock = threading.Lock()
+        self._pending: List[Future] = []
+
+    def submit(self, archive_path: Path, extract_to: Path) -> Future:
+        """提交一个解压任务"""
+        # 子进程看不到运行时修改的 CONFIG，去重目录显式传入
+        blobs = blob_dir()
+        future = Future()
+        if self._pool is None:
+            with METRICS.stage('extract') as span:
+                result = extract_archive(archive_path, extract_to, blobs)
+                if not result.get('extracted'):
+                    span.fail()
+            future.set_result(result)
+        else:
+            # 耗时在子进程中测量，完成后在主进程汇总（排队时间只计入在途数）
+            METRICS.enter('extract')
+            self._pool.submit(
+                _timed_extract, archive_path, extract_to, blobs, profiling.child_profile()
+            ).add_done_callback(functools.partial(self._relay, future))
+
+        with self._lock:
+            self._pending = [f for f in self._pending if not f.done()]
+            self._pending.append(future)
+        return future
+
+    @staticmethod
+    def _relay(future: Future, done: Future):
+        try:
+            result, seconds = done.result()
+        except Exception as e:
+            METRICS.exit('extract', 0.0, error=True)
+            future.set_exception(e)
+            return
+        METRICS.exit('extract', seconds, error=not result.get('extracted'))
+        future.set_result(result)
+
+    def save_when_done(self, project_dir: Path, metadata: Dict,
+                       jobs: List[Tuple[Dict, Future]], on_saved: Callable[[Dict], None] = None):
+        """
+        所有解压任务完成后，把解压结果（含失败成员）写入文件条目并保存 metadata.json
+
+        Args:
+            on_saved: 保存后以 metadata 调用（如按解压结果记录项目状态）；wait() 会等它执行完
+        """
+        if not jobs:
+            self._save(project_dir, metadata, on_saved)
+            return
+
+        saved = Future()
+        with self._lock:
+            self._pending.append(saved)
+        remaining = [len(jobs)]
+
+        def on_done(entry: Dict, future: Future):
+            try:
+                entry.update(future.result())
+            except Exception as e:
+                logger.error(f"解压任务异常: {entry['filename']}, 错误: {e}")
+                entry.update({'extracted': False, 'error': str(e)})
+
+            with self._lock:
+                remaining[0] -= 1
+                finished = remaining[0] == 0
+            if finished:
+                try:
+                    self._save(project_dir, metadata, on_saved)
+                finally:
+                    saved.set_result(None)
+
+        for entry, future in jobs:
+            future.add_done_callback(lambda f, entry=entry: on_done(entry, f))
+
+    @staticmethod
+    def _save(project_dir: Path, metadata: Dict, on_saved: Optional[Callable[[Dict], None]]):
+        save_metadata(project_dir, metadata)
+        if on_saved is not None:
+            try:
+                on_saved(metadata)
+            except Exception as e:
+                logger.error(f"记录项目状态失败: {metadata['project_name']}, 错误: {e}")
+
+    def wait(self):
+        """等待已提交的解压任务全部完成（进程池继续可用）"""
+        with self._lock:
+            pending = [f for f in self._pending if not f.done()]
+        if pending:
+            logger.info(f"等待 {len(pending)} 个解压任务完成...")
+            wait(pending)
+
+    def close(self):
+        """等待所有解压任务完成并关闭进程池"""
+        self.wait()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
 
 
 # ========== 项目处理函数 ==========
 
 def process_project(session: requests.Session, project_name: str,
-                   project_url: str, base_dir: Path) -> bool:
+                   project_url: str, base_dir: Path, state: CrawlState = None,
+                   extractor: ExtractionStage = None, downloader: DownloadStage = None,
+                   snapshots: SnapshotWriter = None) -> bool:
     """
     处理单个项目：下载文件、解压、整理
 
@@ -412,6 +1413,10 @@ def process_project(session: requests.Session, project_name: str,
         project_name: 项目名称
         project_url: 项目 URL
         base_dir: 基础目录
+        state: 增量爬取状态库（为空时不做增量判断）
+        extractor: 解压阶段（为空时在当前线程直接解压）
+        downloader: 下载阶段（为空时为本项目临时创建一个，处理完即关闭）
+        snapshots: 详情页原文归档（为空时不归档）
 
     Returns:
         是否处理成功
@@ -422,14 +1427,16 @@ def process_project(session: requests.Session, project_name: str,
         logger.warning(f"项目名称无效，跳过: {project_name}")
         return False
 
-    # 创建项目目录结构
+    incremental = state is not None and CONFIG['incremental']
+    if incremental and not CONFIG['revalidate'] and state.is_project_complete(project_url):
+        logger.info(f"项目 [{clean_name}] 已完成，跳过")
+        return True
+
+    # 项目目录结构
     project_dir = base_dir / clean_name
     raw_dir = project_dir / 'raw'
     docs_dir = project_dir / 'documents'
 
-    ensure_dir(raw_dir)
-    ensure_dir(docs_dir)
-
     # 保存元信息
     metadata = {
         'project_name': project_name,
@@ -439,111 +1446,190 @@ def process_project(session: requests.Session, project_name: str,
     }
 
     # 提取文件链接
-    file_urls = extract_file_urls(session, project_url)
+    file_urls = extract_file_urls(session, project_url, snapshots, project_name)
+
+    if file_urls is None:
+        # 页面获取失败记为失败（而不是无文件），下次运行重试
+        if state is not None:
+            state.mark_project(project_url, 'yuhang', STATUS_FAILED, name=project_name)
+        return False
 
     if not file_urls:
         logger.warning(f"项目无可下载文件: {project_name}")
+        if state is not None:
+            state.mark_project(project_url, 'yuhang', STATUS_NO_FILES, name=project_name)
         return False
 
     logger.info(f"项目 [{clean_name}] 找到 {len(file_urls)} 个文件")
 
-    # 下载并处理文件
-    success_count = 0
+    if CONFIG['offline']:
+        # 离线回放只验证解析结果，不下载文件也不改写 metadata.json
+        return True
+
+    ensure_dir(raw_dir)
+    ensure_dir(docs_dir)
+
+    # 单独调用时为本项目临时创建下载阶段：重试与熔断只有 DownloadStage 一套实现
+    owned_downloader = downloader is None
+    if owned_downloader:
+        downloader = DownloadStage(session)
+
+    # 先把项目的所有文件交给下载阶段，再按顺序处理结果
+    downloads = []
     for idx, (file_url, file_suffix) in enumerate(file_urls, 1):
         # 生成文件名
         file_name = f"{clean_name}_{idx}.{file_suffix}"
         file_path = raw_dir / file_name
 
-        # 下载文件（传入项目URL作为Referer）
-        if download_file(session, file_url, file_path, referer=project_url):
-            # 记录文件信息
-            metadata['files'].append({
+        # 增量模式：已下载的文件使用条件请求，未变更时服务器返回 304
+        headers = state.conditional_headers(file_url, project_url, str(file_path)) if incremental else None
+
+        # 其他项目已下载过同一文件时直接链接，否则下载（传入项目URL作为Referer）
+        info = None if headers else _reuse_blob(state, file_url, file_path)
+        if info is not None:
+            result = {'info': info, 'attempts': 0, 'error': None}
+        else:
+            result = downloader.submit(file_url, file_path, referer=project_url, headers=headers)
+        downloads.append((file_name, file_url, file_suffix, file_path, result))
+
+    # 下载并处理文件
+    success_count = 0
+    extract_jobs = []
+    for file_name, file_url, file_suffix, file_path, result in downloads:
+        if isinstance(result, Future):
+            result = result.result()
+        info = result['info']
+        if state is not None:
+            _record_file_state(state, file_url, project_url, file_path, info)
+
+        if not info:
+            metadata.setdefault('failed_files', []).append({
                 'filename': file_name,
                 'url': file_url,
-                'suffix': file_suffix,
-                'size': file_path.stat().st_size
+                'attempts': result['attempts'],
+                'error': result['error'],
             })
-
-            # 解压文件
-            if file_suffix in ['zip', 'rar']:
-                extract_archive(file_path, docs_dir)
+            continue
+
+        # 记录文件信息
+        file_entry = {
+            'filename': file_name,
+            'url': file_url,
+            'suffix': file_suffix,
+            'size': info['size'],
+            'sha256': info['sha256'] or _stored_sha256(state, file_url, project_url),
+            'attempts': result['attempts'],
+        }
+        metadata['files'].append(file_entry)
+        success_count += 1
+
+        if info['status'] == 'not_modified':
+            continue
+
+        # 解压文件（交给解压阶段，不阻塞下一个文件的下载）
+        if file_suffix in ['zip', 'rar']:
+            if extractor is not None:
+                extract_jobs.append((file_entry, extractor.submit(file_path, docs_dir)))
             else:
-                # 非压缩文件直接复制到 documents
-                shutil.copy2(file_path, docs_dir / file_name)
+                file_entry.update(extract_archive(file_path, docs_dir, blob_dir()))
+        else:
+            # 非压缩文件链接到 documents（不再重复存储一份）
+            link_file(file_path, docs_dir / file_name)
 
-            success_count += 1
+    if owned_downloader:
+        downloader.close()
 
-    # 保存元信息
+    # 保存元信息；项目状态在解压全部完成后按结果记录，解压失败的项目下次重试
     metadata['success_count'] = success_count
     metadata['total_count'] = len(file_urls)
-    save_metadata(project_dir, metadata)
+    on_saved = None
+    if state is not None:
+        def on_saved(saved: Dict):
+            state.mark_project(project_url, 'yuhang', _project_status(saved), name=project_name)
+
+    if extractor is not None:
+        extractor.save_when_done(project_dir, metadata, extract_jobs, on_saved)
+    else:
+        save_metadata(project_dir, metadata)
+        if on_saved is not None:
+            on_saved(metadata)
 
     logger.info(f"项目 [{clean_name}] 处理完成: {success_count}/{len(file_urls)} 个文件成功")
 
     return success_count > 0
 
 
-# ========== 主流程函数 ==========
+def _project_status(metadata: Dict) -> str:
+    """全部文件下载成功且压缩包均已解压时为完成，否则为失败"""
+    extracted = all(entry.get('extracted', True) for entry in metadata['files'])
+    done = metadata['success_count'] == metadata['total_count'] and extracted
+    return STATUS_DONE if done else STATUS_FAILED
 
-def auto_mode(start_page: int = 1, end_page: int = 5):
-    """
-    自动模式：批量下载指定页码范围的所有项目
 
-    Args:
-        start_page: 起始页码
-        end_page: 结束页码
-    """
-    logger.info(f"=== 自动模式启动 ===")
-    logger.info(f"页码范围: {start_page} - {end_page}")
+def _record_file_state(state: CrawlState, file_url: str, project_url: str,
+                       file_path: Path, info: Optional[Dict]):
+    """把单个文件的下载结果写入增量状态库"""
+    if not info:
+        state.mark_file(file_url, project_url, STATUS_FAILED, path=str(file_path))
+        return
 
-    # 创建输出目录
-    base_dir = Path(CONFIG['output_dirs']['projects'])
-    ensure_dir(base_dir)
+    state.mark_file(
+        file_url, project_url, STATUS_DONE, path=str(file_path), size=info['size'],
+        etag=info['etag'], last_modified=info['last_modified'], sha256=info['sha256']
+    )
 
-    # 创建 Session
-    session = create_session()
 
-    # 获取项目列表
-    pages = list(range(start_page, end_page + 1))
-    projects = fetch_project_list(session, pages)
+def _reuse_blob(state: Optional[CrawlState], file_url: str, file_path: Path) -> Optional[Dict]:
+    """同一 URL 的内容已在去重存储中时，直接链接到本项目，无需重新下载"""
+    blobs = blob_dir()
+    record = state.get_file(file_url) if state is not None and CONFIG['incremental'] else None
+    if blobs is None or not record or record['status'] != STATUS_DONE or not record['sha256']:
+        return None
 
-    if not projects:
-        logger.warning("未找到任何项目")
-        return
+    blob = blobs / record['sha256'][:2] / record['sha256']
+    if not blob.exists():
+        return None
 
-    logger.info(f"共找到 {len(projects)} 个项目，开始处理...")
+    link_file(blob, file_path)
+    logger.info(f"已存在相同文件，直接链接: {file_path.name}")
+    return {
+        'status': 'linked',
+        'size': record['size'],
+        'sha256': record['sha256'],
+        'etag': record['etag'],
+        'last_modified': record['last_modified'],
+    }
 
-    # 处理每个项目
-    success_count = 0
-    no_files_count = 0
-    failed_count = 0
 
-    for project_name, project_url in tqdm(projects, desc="处理项目"):
-        try:
-            result = process_project(session, project_name, project_url, base_dir)
-            if result:
-                success_count += 1
-            elif result is False:
-                failed_count += 1
-        except Exception as e:
-            logger.error(f"处理项目失败: {project_name}, 错误: {e}")
-            failed_count += 1
+def _stored_sha256(state: Optional[CrawlState], file_url: str, project_url: str) -> Optional[str]:
+    """未重新下载的文件沿用状态库中记录的摘要"""
+    record = state.get_file(file_url, project_url) if state is not None else None
+    return record['sha256'] if record else None
 
-    # 统计无文件项目
-    no_files_count = len(projects) - success_count - failed_count
 
-    logger.info(f"=== 处理完成 ===")
-    logger.info(f"总计: {len(projects)} 个项目")
-    logger.info(f"  ✓ 成功下载: {success_count} 个")
-    logger.info(f"  ✗ 下载失败: {failed_count} 个")
-    logger.info(f"  ⊘ 无可用文件: {no_files_count} 个")
-    logger.info(f"  成功率: {success_count/len(projects)*100:.1f}%")
+# ========== 主流程函数 ==========
+
+def auto_mode(start_page: int = 1, end_page: Optional[int] = 5, incremental: bool = False):
+    """
+    自动模式：批量下载指定页码范围的所有项目
+
+    Args:
+        start_page: 起始页码
+        end_page: 结束页码（None 表示一直翻到站点没有更多页面）
+        incremental: 遇到全部为已知项目的一页即停止翻页
+    """
+    setup_logging()
+    logger.info(f"=== {'增量' if incremental else '自动'}模式启动 ===")
+    logger.info(f"页码范围: {start_page} - {end_page if end_page is not None else '末页'}")
+
+    crawl_pages(start_page=start_page, end_page=end_page, stop_at_known=incremental)
 
 
 def manual_mode():
     """
     手动模式：指定页码下载
     """
+    setup_logging()
     logger.info("=== 手动模式启动 ===")
 
     try:
@@ -553,53 +1639,286 @@ def manual_mode():
         logger.error("页码输入无效")
         return
 
+    crawl_pages(pages)
+
+
+class CrawlContext:
+    """
+    一次爬取所需的 Session、增量状态库、下载/解压阶段与快照归档
+
+    单次运行结束即关闭；守护模式在各轮之间复用，连接池、限流状态、解压进程池保持温热，
+    已确认完成的项目记在内存中，下一轮不必再查询状态库
+    """
+
+    def __init__(self):
+        self.session = create_session()
+        self.state = CrawlState(CONFIG['state_db'])
+        self.extractor = ExtractionStage()
+        self.downloader = DownloadStage(self.session)
+        self.snapshots = SnapshotWriter('yuhang', CONFIG['snapshot_dir']) \
+            if CONFIG['snapshots'] and not CONFIG['offline'] else None
+        self.known: Set[str] = set()
+        self.stopping = threading.Event()
+
+    def stop(self):
+        """请求停止爬取：不再开始新项目，已开始的项目处理完后 crawl_pages 返回（可从其他线程调用）"""
+        self.stopping.set()
+
+    def close(self):
+        self.downloader.close()
+        self.extractor.close()
+        self.state.close()
+        self.session.close()
+        if self.snapshots is not None:
+            self.snapshots.close()
+
+
+def crawl_pages(pages: Iterable[int] = None, start_page: int = 1,
+                end_page: Optional[int] = None, stop_at_known: bool = False,
+                context: Optional[CrawlContext] = None):
+    """
+    流式处理指定页码的项目：列表页逐页解析，项目一产出就开始下载
+
+    Args:
+        pages: 页码序列（给定时逐页处理，忽略其余参数）
+        start_page: 起始页码
+        end_page: 结束页码（None 表示一直翻到站点没有更多页面）
+        stop_at_known: 遇到全部为已知项目的一页即停止翻页
+        context: 复用的爬取上下文（为空时本次新建并在结束时关闭）
+    """
+    with profiling.profiled('yuhang', CONFIG['profile'] is not None, CONFIG['profile_dir'],
+                            CONFIG['profile'] or 'auto', logger.info):
+        _crawl_pages(pages, start_page, end_page, stop_at_known, context)
+
+
+def _crawl_pages(pages: Optional[Iterable[int]], start_page: int,
+                 end_page: Optional[int], stop_at_known: bool, context: Optional[CrawlContext]):
+    """crawl_pages 的实现（--profile 时整个过程在剖析下运行）"""
     # 创建输出目录
     base_dir = Path(CONFIG['output_dirs']['projects'])
     ensure_dir(base_dir)
 
-    # 创建 Session
-    session = create_session()
-
-    # 获取项目列表
-    projects = fetch_project_list(session, pages)
-
-    if not projects:
-        logger.warning("未找到任何项目")
-        return
+    extraction.use_backend(CONFIG['parser_backend'])
+    METRICS.start_run()
 
-    logger.info(f"共找到 {len(projects)} 个项目，开始处理...")
+    # Session、增量状态库与下载/解压阶段
+    owned = context is None
+    if owned:
+        context = CrawlContext()
+    session, state = context.session, context.state
+    extractor, downloader, snapshots = context.extractor, context.downloader, context.snapshots
 
     # 处理每个项目
+    total = 0
     success_count = 0
-    no_files_count = 0
     failed_count = 0
 
-    for project_name, project_url in tqdm(projects, desc="处理项目"):
-        try:
-            result = process_project(session, project_name, project_url, base_dir)
+    listing = None
+    if pages is None:
+        listing = ProjectListing(session, state, start_page, end_page, stop_at_known, context.known)
+
+    # 离线回放重新解析所有项目，且不改写状态库
+    project_state = None if CONFIG['offline'] else state
+
+    def collect(done: Iterable[Future]):
+        nonlocal success_count, failed_count
+        for future in done:
+            project_name = running.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"处理项目失败: {project_name}, 错误: {e}")
+                failed_count += 1
+                continue
             if result:
                 success_count += 1
             elif result is False:
                 failed_count += 1
-        except Exception as e:
-            logger.error(f"处理项目失败: {project_name}, 错误: {e}")
-            failed_count += 1
+
+    workers = max(1, CONFIG['project_workers'])
+    running: Dict[Future, str] = {}
+    try:
+        # 多个项目同时处理：某个文件等待重试时，其他项目的下载照常进行
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            projects = iter_project_list(session, pages) if listing is None else listing
+            for project_name, project_url in tqdm(projects, desc="处理项目"):
+                if context.stopping.is_set():
+                    logger.warning("已请求停止，不再处理新项目")
+                    break
+                total += 1
+                future = pool.submit(process_project, session, project_name, project_url,
+                                     base_dir, project_state, extractor, downloader, snapshots)
+                running[future] = project_name
+                # 限制在途项目数，列表不会远远跑在处理前面
+                if len(running) >= workers * 2:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    collect(done)
+            collect(wait(running).done)
+        # 中途停止时列表没有处理完，不更新高水位
+        if listing is not None and not CONFIG['offline'] and not context.stopping.is_set():
+            listing.commit()
+            logger.info(f"列表共请求 {listing.pages_fetched} 页")
+    finally:
+        if owned:
+            context.close()
+        else:
+            extractor.wait()
 
     # 统计无文件项目
-    no_files_count = len(projects) - success_count - failed_count
+    no_files_count = total - success_count - failed_count
+
+    if CONFIG['metrics_export']:
+        prom_path, json_path = METRICS.write(CONFIG['metrics_dir'], {
+            'projects': total, 'succeeded': success_count,
+            'failed': failed_count, 'no_files': no_files_count,
+        })
+        logger.info(f"运行指标已写入: {prom_path}, {json_path}")
+
+    if not total:
+        logger.warning("未找到任何项目")
+        return
 
     logger.info(f"=== 处理完成 ===")
-    logger.info(f"总计: {len(projects)} 个项目")
+    logger.info(f"总计: {total} 个项目")
     logger.info(f"  ✓ 成功下载: {success_count} 个")
     logger.info(f"  ✗ 下载失败: {failed_count} 个")
     logger.info(f"  ⊘ 无可用文件: {no_files_count} 个")
-    logger.info(f"  成功率: {success_count/len(projects)*100:.1f}%")
+    logger.info(f"  成功率: {success_count/total*100:.1f}%")
+
+
+def watch_mode(interval: float = None):
+    """
+    守护模式：不需要交互，每隔 interval 秒从第 1 页检查新项目，遇到全部为已知项目的一页即停止翻页
+
+    爬取上下文（连接池、状态库、下载线程与解压进程池）在各轮之间复用，
+    没有新项目时每轮只请求一个列表页；收到 SIGTERM 时在本轮结束后退出
+    """
+    setup_logging()
+    if interval is None:
+        interval = CONFIG['watch_interval']
+    logger.info(f"=== 守护模式启动：每 {interval:g} 秒检查一次新项目 ===")
+
+    context = CrawlContext()
+    try:
+        watch.run_forever(
+            lambda: crawl_pages(start_page=1, end_page=None, stop_at_known=True, context=context),
+            interval, logger.info, logger.exception
+        )
+    finally:
+        context.close()
+    logger.info("=== 守护模式已停止 ===")
+
+
+def reparse_mode():
+    """
+    重新解析模式：用当前的解析规则从详情页快照重建各项目 metadata.json 的文件列表
+
+    不访问网络。已下载的文件沿用状态库中的大小与摘要，以及原 metadata.json 中的解压结果；
+    新解析出但尚未下载的文件记入 failed_files，下次正常运行时会被下载。
+    """
+    setup_logging()
+    logger.info("=== 重新解析模式启动 ===")
+    extraction.use_backend(CONFIG['parser_backend'])
+    parse = functools.partial(parse_file_urls, base_url=CONFIG['base_url'])
+    records = reparse_snapshots('yuhang', parse, CONFIG['snapshot_dir'], CONFIG['reparse_workers'],
+                                extraction.use_backend, (CONFIG['parser_backend'],))
+    if not records:
+        logger.warning(f"{CONFIG['snapshot_dir']} 中没有找到页面快照，请先正常运行一次")
+        return
+
+    base_dir = Path(CONFIG['output_dirs']['projects'])
+    state = CrawlState(CONFIG['state_db'])
+    changed = 0
+    try:
+        for record, file_urls in records:
+            if _rebuild_metadata(base_dir, record['name'] or '', record['url'], file_urls, state):
+                changed += 1
+    finally:
+        state.close()
+
+    logger.info(f"=== 重新解析完成 ===")
+    logger.info(f"共解析 {len(records)} 个快照，{changed} 个项目的文件列表发生变化")
+
+
+def _rebuild_metadata(base_dir: Path, project_name: str, project_url: str,
+                      file_urls: List[Tuple[str, str]], state: CrawlState) -> bool:
+    """按重新解析的文件链接重写 metadata.json，返回文件列表是否变化"""
+    clean_name = sanitize_filename(project_name)
+    if not clean_name:
+        return False
+
+    project_dir = base_dir / clean_name
+    metadata_path = project_dir / 'metadata.json'
+    previous = {}
+    if metadata_path.exists():
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    previous_entries = {entry['url']: entry for entry in previous.get('files', [])}
+    previous_urls = set(previous_entries) | {entry['url'] for entry in previous.get('failed_files', [])}
+
+    metadata = {
+        'project_name': project_name,
+        'project_url': project_url,
+        'download_time': previous.get('download_time'),
+        'reparse_time': datetime.now().isoformat(),
+        'files': [],
+    }
+    for idx, (file_url, file_suffix) in enumerate(file_urls, 1):
+        file_name = f"{clean_name}_{idx}.{file_suffix}"
+        file_path = project_dir / 'raw' / file_name
+        record = state.get_file(file_url, project_url)
+        if not file_path.exists() or not record or record['status'] != STATUS_DONE:
+            metadata.setdefault('failed_files', []).append({
+                'filename': file_name, 'url': file_url, 'attempts': 0, 'error': '尚未下载',
+            })
+            continue
+
+        entry = dict(previous_entries.get(file_url, {}))
+        entry.update({
+            'filename': file_name,
+            'url': file_url,
+            'suffix': file_suffix,
+            'size': record['size'],
+            'sha256': record['sha256'],
+        })
+        metadata['files'].append(entry)
+
+    metadata['success_count'] = len(metadata['files'])
+    metadata['total_count'] = len(file_urls)
+    ensure_dir(project_dir)
+    save_metadata(project_dir, metadata)
+    return {url for url, _ in file_urls} != previous_urls
 
 
 # ========== 主程序入口 ==========
 
 def main():
     """主程序入口"""
+    parser = argparse.ArgumentParser(description='余杭区规划局文件爬虫')
+    parser.add_argument('--reparse', action='store_true',
+                        help='从详情页快照重新解析并重建 metadata.json，不访问网络')
+    parser.add_argument('--profile', nargs='?', const='auto', choices=profiling.ENGINES,
+                        help='按阶段剖析本次运行（默认 auto：安装了 pyinstrument 时采样剖析，否则 cProfile；'
+                             'memory：单独一轮内存剖析），报告写入 ./profiles')
+    parser.add_argument('--log-json', action='store_true',
+                        help='日志文件改为 JSON Lines 格式（每行一个 JSON 对象）')
+    parser.add_argument('--watch', nargs='?', type=float, const=CONFIG['watch_interval'], metavar='SECONDS',
+                        help=f"守护模式：不需要交互，每隔 SECONDS 秒（默认 {CONFIG['watch_interval']}）检查新项目")
+    args = parser.parse_args()
+    CONFIG['profile'] = args.profile
+    setup_logging(json_lines=args.log_json or None)
+
+    if args.reparse:
+        reparse_mode()
+        return
+
+    if args.watch is not None:
+        try:
+            watch_mode(args.watch)
+        except KeyboardInterrupt:
+            logger.warning("守护模式被中断")
+        return
+
     print("=" * 50)
     print("       余杭区规划局文件爬虫")
     print("=" * 50)
@@ -608,14 +1927,17 @@ def main():
     print()
     print("  1. 自动模式（批量下载 1-5 页）")
     print("  2. 手动模式（指定页码）")
+    print("  3. 增量模式（从第 1 页翻到已下载过的项目为止）")
     print()
 
-    mode = input("请选择模式 (1/2): ").strip()
+    mode = input("请选择模式 (1/2/3): ").strip()
 
     if mode == "1":
         auto_mode(start_page=1, end_page=5)
     elif mode == "2":
         manual_mode()
+    elif mode == "3":
+        auto_mode(start_page=1, end_page=None, incremental=True)
     else:
         print("输入无效，退出程序")
         return
@@ -626,4 +1948,5 @@ def main():
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # PyInstaller 打包后使用解压进程池所需
     main()